@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Headless batch evaluation of the vision pipeline over recorded videos.
+
+Runs the same face detection -> best-face pick -> landmarks (-> head pose)
+chain as VisionTracker, but for throughput:
+  - frames are decoded in windows and inferred in batches (models reshaped
+    to --batch), through an AsyncInferQueue with --jobs requests in flight
+  - decoding the next window overlaps inference of the current one
+  - video files are spread across --workers processes
+
+Output is one compressed .npz, one array per column, one row per frame:
+  file_id, frame, t_ms, face_ok, track_id, n_faces (MULTI_FACE_TRACKING),
+  conf, score, x0, y0, x1, y1,
+  landmarks (N x 10, frame pixels), cx, cy (target center), ipd_px,
+  dist_raw_cm (no filtering),
+  dist_cm (VisionTracker's EMA chain replayed), yaw, pitch, roll (NaN unless
+  --head-pose), plus per-file `files`, `fps`, `frame_size` and a JSON `meta` string.
+
+With --detections FLOOR every detector row with conf >= FLOOR is kept too, with
+landmarks run on each of them, for vision_sweep.py to replay any face pick:
+  det_count (per frame), det (rows x 7, raw detector rows), det_cx, det_cy,
+  det_ipd (per row, measured like cx, cy, ipd_px).
+
+Filter / threshold changes can be tried with --set NAME=value (TUNABLE_PARAMS).
+If the camera profile has a lens model, cx, cy and ipd_px are undistorted the
+same way VisionTracker does it; bbox and landmarks stay in frame pixels.
+
+Usage:
+    python batch_eval.py recordings/ --out eval.npz --workers 4 --batch 8
+    python batch_eval.py a.mp4 b.mp4 --head-pose --set FACE_CONF_THRESH=0.5
+    python batch_eval.py recordings/ --out cache.npz --detections 0.2
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from roarm import engine
+from roarm.engine import (
+    FD_XML, LM_XML, CAM_FPS, MIRROR_VIEW, TRACK_RESET_FILTERS_SEC, CAMERA_PROFILE, LENS_UNDISTORT,
+    MULTI_FACE_TRACKING, MultiFaceTracker, params, pick_best_face, face_roi, to_blob, ema, radial_gain, load_camera_profile, LensModel, cv2, ov,
+)
+
+HP_XML = r"models/head-pose-estimation-adas-0001.xml"
+HP_OUTPUTS = ("angle_y_fc", "angle_p_fc", "angle_r_fc")    # yaw, pitch, roll in degrees
+VIDEO_EXTS = (".mp4", ".avi", ".mkv", ".mov", ".webm")
+N_LANDMARKS = 5
+
+# ============================================================
+# INFERENCE
+# ============================================================
+
+class BatchPipeline:
+    def __init__(self, fd_xml, lm_xml, hp_xml, device, batch, jobs, threads, mirror):
+        self.batch = batch
+        self.mirror = mirror
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if threads > 0:
+            config["INFERENCE_NUM_THREADS"] = threads
+
+        def compile_batched(xml, size):
+            model = core.read_model(xml)
+            model.reshape([batch, 3, size, size])
+            comp = core.compile_model(model, device, config)
+            queue = ov.AsyncInferQueue(comp, jobs)
+            queue.set_callback(self._on_done)
+            return comp, queue
+
+        self.fd_comp, self.fd_queue = compile_batched(fd_xml, 300)
+        self.lm_comp, self.lm_queue = compile_batched(lm_xml, 48)
+        self.hp_comp = self.hp_queue = None
+        if hp_xml:
+            self.hp_comp, self.hp_queue = compile_batched(hp_xml, 60)
+            self.hp_outputs = [self.hp_comp.output(name) for name in HP_OUTPUTS]
+
+    @staticmethod
+    def _on_done(request, userdata):
+        results, key, outputs = userdata
+        if outputs is None:
+            results[key] = request.get_output_tensor(0).data.copy()
+        else:
+            results[key] = np.stack([request.get_tensor(o).data.reshape(-1) for o in outputs], axis=1)
+
+    def _submit(self, queue, comp, blobs, results, outputs=None):
+        """Pads the blobs up to whole batches and starts them; results[k] holds batch k when done."""
+        for k, i in enumerate(range(0, len(blobs), self.batch)):
+            chunk = blobs[i:i + self.batch]
+            arr = np.zeros((self.batch,) + chunk[0].shape, dtype=np.float32)
+            arr[:len(chunk)] = chunk
+            queue.start_async({comp.input(0): arr}, (results, k, outputs))
+
+    @staticmethod
+    def _unbatch(results, n):
+        return np.concatenate([results[k] for k in range(len(results))])[:n]
+
+    def read_window(self, cap, n):
+        frames = []
+        while len(frames) < n:
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                break
+            frames.append(cv2.flip(frame, 1) if self.mirror else frame)
+        return frames
+
+    def submit_detections(self, frames):
+        results = {}
+        if frames:
+            self._submit(self.fd_queue, self.fd_comp, [to_blob(f, (300, 300)) for f in frames], results)
+        return results
+
+    def detections_per_frame(self, results, n):
+        """Splits DetectionOutput rows (image_id first) back to frames."""
+        per_frame = [[] for _ in range(n)]
+        for k in range(len(results)):
+            rows = results[k].reshape(-1, 7)
+            rows = rows[rows[:, 0] >= 0]
+            for image_id in np.unique(rows[:, 0]).astype(int):
+                frame_idx = k * self.batch + image_id
+                if frame_idx < n:
+                    per_frame[frame_idx] = rows[rows[:, 0] == image_id]
+        return per_frame
+
+# ============================================================
+# PER-VIDEO EVALUATION
+# ============================================================
+
+_pipeline = None
+_lens = None
+_det_floor = None
+
+def init_worker(cfg):
+    global _pipeline, _lens, _det_floor
+    _det_floor = cfg["detections"]
+    profile = load_camera_profile(cfg["camera_profile"])
+    _lens = LensModel.from_profile(profile) if LENS_UNDISTORT else None
+    if cfg["overrides"]:
+        params.update(cfg["overrides"], source="batch_eval")
+    _pipeline = BatchPipeline(cfg["fd"], cfg["lm"], cfg["hp"], cfg["device"], cfg["batch"],
+                              cfg["jobs"], cfg["threads"], cfg["mirror"])
+
+def empty_columns(n):
+    nan = np.full(n, np.nan, dtype=np.float32)
+    return {
+        "frame": np.arange(n, dtype=np.int32),
+        "t_ms": np.zeros(n, dtype=np.float32),
+        "face_ok": np.zeros(n, dtype=bool),
+        "track_id": np.full(n, -1, dtype=np.int32), "n_faces": np.zeros(n, dtype=np.int16),
+        "conf": nan.copy(), "score": nan.copy(),
+        "x0": np.full(n, -1, dtype=np.int16), "y0": np.full(n, -1, dtype=np.int16),
+        "x1": np.full(n, -1, dtype=np.int16), "y1": np.full(n, -1, dtype=np.int16),
+        "landmarks": np.full((n, 2 * N_LANDMARKS), -1, dtype=np.int16),
+        "cx": nan.copy(), "cy": nan.copy(),
+        "ipd_px": nan.copy(), "dist_raw_cm": nan.copy(), "dist_cm": nan.copy(),
+        "yaw": nan.copy(), "pitch": nan.copy(), "roll": nan.copy(),
+    }
+
+def landmark_points(pipe, crops, rois):
+    """Landmarks for the crops, in frame pixels with VisionTracker's int truncation -> (px, py), each (k, N_LANDMARKS)."""
+    lm_results = {}
+    pipe._submit(pipe.lm_queue, pipe.lm_comp, [to_blob(c, (48, 48)) for c in crops], lm_results)
+    pipe.lm_queue.wait_all()
+    roi = np.array(rois, dtype=np.float64)
+    pts_norm = pipe._unbatch(lm_results, len(crops)).reshape(len(crops), -1, 2)[:, :N_LANDMARKS]
+    fw = (roi[:, 2] - roi[:, 0])[:, None]
+    fh = (roi[:, 3] - roi[:, 1])[:, None]
+    px = (pts_norm[..., 0] * fw + roi[:, 0:1]).astype(np.int32)
+    py = (pts_norm[..., 1] * fh + roi[:, 1:2]).astype(np.int32)
+    return px, py
+
+def face_geometry(bx0, by0, bx1, by1, px, py, W, H, mirror):
+    """Target center and IPD per face as VisionTracker measures them (undistorted when the profile has a lens)."""
+    if _lens is not None:
+        corners = np.stack([np.stack([bx0, by0], -1), np.stack([bx1, by0], -1),
+                            np.stack([bx0, by1], -1), np.stack([bx1, by1], -1)], axis=1)
+        und_c = _lens.undistort_points(corners, W, H, mirror).reshape(-1, 4, 2)
+        und_l = _lens.undistort_points(np.stack([px[:, :2], py[:, :2]], -1), W, H, mirror).reshape(-1, 2, 2)
+        cx = 0.5 * (und_c[..., 0].min(1) + und_c[..., 0].max(1))
+        cy = 0.5 * (und_c[..., 1].min(1) + und_c[..., 1].max(1))
+        ipd = np.hypot(und_l[:, 1, 0] - und_l[:, 0, 0], und_l[:, 1, 1] - und_l[:, 0, 1])
+    else:
+        cx = 0.5 * (bx0 + bx1)
+        cy = 0.5 * (by0 + by1)
+        ipd = np.hypot(px[:, 1] - px[:, 0], py[:, 1] - py[:, 0])
+    return cx, cy, ipd
+
+def candidate_rows(pipe, frames, detections, W, H):
+    """
+    Every detection at or above the --detections floor, with landmarks run on it.
+    Returns (per-frame counts, rows (k, 7), cx, cy, ipd).
+    """
+    counts = np.zeros(len(frames), dtype=np.int16)
+    rows, rois, crop_idx = [], [], []
+    for i, dets in enumerate(detections):
+        d = np.asarray(dets, dtype=np.float32).reshape(-1, 7)
+        d = d[d[:, 2] >= _det_floor]
+        boxes = np.clip((d[:, 3:7] * (W, H, W, H)).astype(np.int32), 0, (W - 1, H - 1, W - 1, H - 1))
+        for row, box in zip(d, boxes.tolist()):
+            roi = face_roi(box, W, H)
+            if box[2] <= box[0] or box[3] <= box[1] or roi[2] <= roi[0] or roi[3] <= roi[1]:
+                continue
+            rows.append(row)
+            rois.append(roi)
+            crop_idx.append(i)
+            counts[i] += 1
+    if not rows:
+        nothing = np.zeros(0, dtype=np.float32)
+        return counts, np.zeros((0, 7), dtype=np.float32), nothing, nothing, nothing
+
+    rows = np.array(rows, dtype=np.float32)
+    px, py = landmark_points(pipe, [frames[i][r[1]:r[3], r[0]:r[2]] for i, r in zip(crop_idx, rois)], rois)
+    boxes = np.clip(rows[:, 3:7] * (W, H, W, H), 0, (W - 1, H - 1, W - 1, H - 1)).astype(np.int32).astype(np.float64)
+    cx, cy, ipd = face_geometry(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3], px, py, W, H, pipe.mirror)
+    return counts, rows, cx.astype(np.float32), cy.astype(np.float32), ipd.astype(np.float32)
+
+def replay_distance(cols, W, H, f_pixels, p):
+    """VisionTracker's IPD -> distance EMA chain, including the long-loss filter reset."""
+    geometry = engine.DIST_RADIAL_GEOMETRY
+    cx_s = cy_s = ipd_s = raw_dist_s = dist_s = None
+    missing_since = None
+    for i in range(cols["frame"].size):
+        t = cols["t_ms"][i] / 1000.0
+        if not cols["face_ok"][i]:
+            if missing_since is None:
+                missing_since = t
+            if t - missing_since > TRACK_RESET_FILTERS_SEC:
+                cx_s = cy_s = ipd_s = raw_dist_s = dist_s = None
+            continue
+        missing_since = None
+        if math.isnan(cols["cx"][i]):
+            continue
+        cx_s = ema(cx_s, float(cols["cx"][i]), p.ema_target_cx)
+        cy_s = ema(cy_s, float(cols["cy"][i]), p.ema_target_cy)
+        ipd_now = cols["ipd_px"][i]
+        if math.isnan(ipd_now):
+            continue
+        ipd_s = ema(ipd_s, float(ipd_now), p.ema_ipd)
+        if ipd_s > 1.0:
+            raw_dist_cm = p.dist_scale * ((f_pixels * p.ipd_real_cm) / ipd_s)
+            if geometry or p.dist_radial_k:
+                raw_dist_cm *= radial_gain(cx_s, cy_s, W, H, f_pixels, p.dist_radial_k, geometry)
+            raw_dist_s = ema(raw_dist_s, raw_dist_cm, p.ema_dist)
+            dist_s = ema(dist_s, raw_dist_s + p.dist_estimate_offset_cm, p.ema_dist)
+            cols["dist_cm"][i] = dist_s
+
+def evaluate_video(path, window_batches=4):
+    pipe = _pipeline
+    p = params.snapshot
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"cannot open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or CAM_FPS
+    window = pipe.batch * window_batches
+
+    chunks, det_chunks = [], []
+    prev_bbox = None
+    faces = MultiFaceTracker() if MULTI_FACE_TRACKING else None
+    missing_since = None
+    n_done = 0
+    f_pixels = None
+    W = H = 0
+
+    frames = pipe.read_window(cap, window)
+    det_results = pipe.submit_detections(frames)
+    while frames:
+        next_frames = pipe.read_window(cap, window)    # decode while the detector runs
+        pipe.fd_queue.wait_all()
+        detections = pipe.detections_per_frame(det_results, len(frames))
+
+        n = len(frames)
+        H, W = frames[0].shape[:2]
+        if f_pixels is None:
+            f_pixels = (W / 2.0) / math.tan(math.radians(p.fov_deg) / 2.0)
+        cols = empty_columns(n)
+        cols["frame"] += n_done
+        cols["t_ms"][:] = 1000.0 * cols["frame"] / fps
+
+        # the pick depends on the previous frame's pick, so this part is sequential
+        rois, crop_idx = [], []
+        for i, dets in enumerate(detections):
+            t = cols["t_ms"][i] / 1000.0
+            if faces is not None:
+                best = faces.update(dets, W, H, p, t)
+                cols["track_id"][i] = -1 if faces.locked_id is None else faces.locked_id
+                cols["n_faces"][i] = faces.matched.sum()
+            else:
+                best = pick_best_face(dets, W, H, p, prev_bbox) if len(dets) else None
+            roi = face_roi(best[:4], W, H) if best is not None else None
+            if roi is None or roi[2] <= roi[0] or roi[3] <= roi[1]:
+                if missing_since is None:
+                    missing_since = t
+                if t - missing_since > TRACK_RESET_FILTERS_SEC:
+                    prev_bbox = None
+                continue
+            missing_since = None
+            prev_bbox = best[:4]
+            cols["face_ok"][i] = True
+            cols["x0"][i], cols["y0"][i], cols["x1"][i], cols["y1"][i] = best[:4]
+            cols["conf"][i], cols["score"][i] = best[4], best[5]
+            rois.append(roi)
+            crop_idx.append(i)
+
+        det_results = pipe.submit_detections(next_frames)
+        if _det_floor is not None:
+            det_chunks.append(candidate_rows(pipe, frames, detections, W, H))
+
+        if rois:
+            crops = [frames[i][r[1]:r[3], r[0]:r[2]] for i, r in zip(crop_idx, rois)]
+            hp_results = {}
+            if pipe.hp_queue is not None:
+                pipe._submit(pipe.hp_queue, pipe.hp_comp, [to_blob(c, (60, 60)) for c in crops],
+                             hp_results, pipe.hp_outputs)
+            px, py = landmark_points(pipe, crops, rois)
+            if pipe.hp_queue is not None:
+                pipe.hp_queue.wait_all()
+
+            idx = np.array(crop_idx)
+            cols["landmarks"][idx, 0::2] = px
+            cols["landmarks"][idx, 1::2] = py
+            bx0, by0 = cols["x0"][idx].astype(np.float64), cols["y0"][idx].astype(np.float64)
+            bx1, by1 = cols["x1"][idx].astype(np.float64), cols["y1"][idx].astype(np.float64)
+            cx, cy, ipd = face_geometry(bx0, by0, bx1, by1, px, py, W, H, pipe.mirror)
+            cols["cx"][idx], cols["cy"][idx] = cx, cy
+            cols["ipd_px"][idx] = ipd
+            gain = radial_gain(cx, cy, W, H, f_pixels, p.dist_radial_k, engine.DIST_RADIAL_GEOMETRY)
+            with np.errstate(divide="ignore"):
+                cols["dist_raw_cm"][idx] = np.where(ipd > 1.0, gain * p.dist_scale * f_pixels * p.ipd_real_cm / ipd,
+                                                    np.nan)
+            if hp_results:
+                angles = pipe._unbatch(hp_results, len(crops))
+                cols["yaw"][idx], cols["pitch"][idx], cols["roll"][idx] = angles.T
+
+        chunks.append(cols)
+        n_done += n
+        frames = next_frames
+
+    cap.release()
+    if not chunks:
+        return path, empty_columns(0), fps, (0, 0), None
+    cols = {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]}
+    replay_distance(cols, W, H, f_pixels, p)
+    dets = None
+    if det_chunks:
+        dets = {name: np.concatenate([c[k] for c in det_chunks])
+                for k, name in enumerate(("det_count", "det", "det_cx", "det_cy", "det_ipd"))}
+    return path, cols, fps, (W, H), dets
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                videos += [os.path.join(root, n) for n in names if n.lower().endswith(VIDEO_EXTS)]
+        else:
+            videos.append(path)
+    return sorted(videos)
+
+def parse_overrides(items):
+    overrides = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--set expects NAME=value, got {item!r}")
+        overrides[name] = value
+    params.validate(overrides)    # fail before spawning workers
+    return overrides
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vision evaluation over recorded videos")
+    parser.add_argument("inputs", nargs="+", help="video files and/or folders")
+    parser.add_argument("--out", default="batch_eval.npz")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--batch", type=int, default=8, help="frames / crops per inference")
+    parser.add_argument("--jobs", type=int, default=2, help="async infer requests per model")
+    parser.add_argument("--threads", type=int, default=0, help="inference threads per worker (0 = auto)")
+    parser.add_argument("--device", default="CPU")
+    parser.add_argument("--fd", default=FD_XML)
+    parser.add_argument("--lm", default=LM_XML)
+    parser.add_argument("--camera-profile", default=CAMERA_PROFILE, help="dist_calib.py profile for the distance model")
+    parser.add_argument("--head-pose", action="store_true")
+    parser.add_argument("--hp", default=HP_XML)
+    parser.add_argument("--mirror", action=argparse.BooleanOptionalAction, default=MIRROR_VIEW,
+                        help="flip frames like the live loop does")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=value")
+    parser.add_argument("--detections", type=float, default=None, metavar="FLOOR",
+                        help="also keep every detection with conf >= FLOOR, with landmarks (for vision_sweep.py)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        raise SystemExit("no videos found")
+    cfg = {"fd": args.fd, "lm": args.lm, "hp": args.hp if args.head_pose else None,
+           "device": args.device, "batch": args.batch, "jobs": args.jobs, "threads": args.threads,
+           "mirror": args.mirror, "camera_profile": args.camera_profile, "detections": args.detections,
+           "overrides": parse_overrides(args.overrides)}
+
+    print(f"[EVAL] {len(videos)} videos on {args.workers} workers, batch {args.batch}, {args.jobs} jobs each")
+    t0 = time.time()
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(cfg,)) as pool:
+        futures = [pool.submit(evaluate_video, v) for v in videos]
+        for fut in as_completed(futures):
+            path, cols, fps, size, dets = fut.result()
+            results[path] = (cols, fps, size, dets)
+            rate = cols["face_ok"].mean() if cols["frame"].size else 0.0
+            print(f"[EVAL] {path}: {cols['frame'].size} frames, face {100.0 * rate:.1f}%")
+    elapsed = time.time() - t0
+
+    columns = {}
+    for k in empty_columns(0):
+        columns[k] = np.concatenate([results[v][0][k] for v in videos])
+    columns["file_id"] = np.concatenate([np.full(results[v][0]["frame"].size, i, dtype=np.int16)
+                                         for i, v in enumerate(videos)])
+    if args.detections is not None:
+        for k in ("det_count", "det", "det_cx", "det_cy", "det_ipd"):
+            columns[k] = np.concatenate([results[v][3][k] for v in videos if results[v][3] is not None])
+    load_camera_profile(cfg["camera_profile"])
+    if cfg["overrides"]:
+        params.update(cfg["overrides"], source="batch_eval")
+    meta = {"settings": {k: v for k, v in vars(args).items() if k != "inputs"}, "params": params.as_dict()}
+    np.savez_compressed(args.out, files=np.array(videos), fps=np.array([results[v][1] for v in videos]),
+                        frame_size=np.array([results[v][2] for v in videos], dtype=np.int32),
+                        meta=np.array(json.dumps(meta)), **columns)
+
+    n = columns["frame"].size
+    print(f"[EVAL] {n} frames in {elapsed:.1f}s ({n / max(elapsed, 1e-9):.0f} frames/s), "
+          f"face {100.0 * columns['face_ok'].mean() if n else 0.0:.1f}%  -> {args.out}")
+
+if __name__ == "__main__":
+    main()
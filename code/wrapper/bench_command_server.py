@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the asyncio command server in roarm/engine.py.
+
+Starts the server on a free localhost port, then runs N concurrent clients
+that each send jog commands and wait for the ACK. The server only ACKs after
+SystemState has been updated, so ACK round-trip time is an upper bound on
+command-to-state latency.
+
+Usage:
+    python bench_command_server.py --clients 1 10 50 200 --commands 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from roarm import engine
+
+JOG_COMMANDS = ["LEFT", "RIGHT", "UP", "DOWN", "FORWARD", "BACKWARD", "STOP"]
+
+def start_server():
+    ready = threading.Event()
+    info = {}
+
+    def on_ready(server):
+        info["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+
+    t = threading.Thread(target=engine.command_server_thread, args=("127.0.0.1", 0, on_ready), daemon=True)
+    t.start()
+    if not ready.wait(5.0):
+        raise RuntimeError("command server did not start")
+    return info["port"]
+
+async def run_client(port, n_commands, rtts):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    greeting = await reader.readline()
+    if not greeting.startswith(b"ACK:CONNECTED"):
+        raise RuntimeError(f"unexpected greeting {greeting!r}")
+
+    for i in range(n_commands):
+        cmd = JOG_COMMANDS[i % len(JOG_COMMANDS)]
+        t0 = time.perf_counter()
+        writer.write((cmd + "\n").encode())
+        await writer.drain()
+        reply = await reader.readline()
+        rtts.append(time.perf_counter() - t0)
+        if reply.strip() != f"ACK:{cmd}".encode():
+            raise RuntimeError(f"unexpected reply {reply!r}")
+
+    writer.close()
+    await writer.wait_closed()
+
+async def run_round(port, n_clients, n_commands):
+    rtts = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[run_client(port, n_commands, rtts) for _ in range(n_clients)])
+    elapsed = time.perf_counter() - t0
+    return np.array(rtts), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Command server latency benchmark")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--commands", type=int, default=200, help="commands per client")
+    args = parser.parse_args()
+
+    engine.PRINT_TCP_RAW = False
+    engine.PRINT_TCP_ACK = False
+
+    out = sys.stdout
+    # the server logs every command; keep the benchmark output readable
+    sys.stdout = open(os.devnull, "w")
+    try:
+        port = start_server()
+        results = []
+        for n in args.clients:
+            rtts, elapsed = asyncio.run(run_round(port, n, args.commands))
+            results.append((n, rtts, elapsed))
+        time.sleep(0.2)  # let the server log the last disconnects
+    finally:
+        sys.stdout.close()
+        sys.stdout = out
+
+    print(f"{'clients':>8} {'cmds/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for n, rtts, elapsed in results:
+        p50, p95, p99 = 1000.0 * np.percentile(rtts, [50, 95, 99])
+        print(f"{n:8d} {rtts.size / elapsed:10.0f} {p50:8.2f} {p95:8.2f} {p99:8.2f} {1000.0 * rtts.max():8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MultiFaceTracker check + benchmark.
+
+1) linear_assignment() against brute force over all permutations on random
+   rectangular cost matrices.
+2) Booth scene: one user near the aim point plus passers-by walking across
+   the frame behind (and over) them, detector jitter and missed detections.
+   Counts how often the followed face changes to someone else, for the
+   tracker and for the old single-face pick (pick_best_face with prev_bbox).
+3) Per-frame update() cost for 1..32 faces, with crossing tracks so the
+   Hungarian path is exercised.
+
+Usage:
+    python bench_face_tracker.py
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+from roarm.engine import MultiFaceTracker, linear_assignment, pick_best_face, params
+
+W, H = 640, 480
+FPS = 30.0
+
+# ============================================================
+# ASSIGNMENT
+# ============================================================
+
+def check_assignment(trials=500, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(trials):
+        n, m = (int(k) for k in rng.integers(1, 7, size=2))
+        cost = rng.random((n, m))
+        rows, cols = linear_assignment(cost)
+        if n <= m:
+            best = min(cost[range(n), list(perm)].sum() for perm in itertools.permutations(range(m), n))
+        else:
+            best = min(cost[list(perm), range(m)].sum() for perm in itertools.permutations(range(n), m))
+        if len(rows) != min(n, m) or abs(cost[rows, cols].sum() - best) > 1e-9:
+            raise AssertionError(f"suboptimal assignment for\n{cost}")
+    print(f"[CHECK] linear_assignment optimal on {trials} random matrices up to 6x6")
+
+# ============================================================
+# SCENE
+# ============================================================
+
+def booth_scene(n_passers, frames, seed):
+    """
+    Per frame: list of (truth_id, box). truth 0 is the user (big, near the aim
+    point, swaying); the rest walk across at various depths and speeds.
+    """
+    rng = np.random.default_rng(seed)
+    walkers = []
+    for k in range(n_passers):
+        size = rng.uniform(50, 150)
+        speed = rng.uniform(60, 250) * rng.choice([-1, 1])
+        walkers.append((k + 1, size, speed, rng.uniform(0, frames / FPS), rng.uniform(80, 300)))
+
+    scene = []
+    for f in range(frames):
+        t = f / FPS
+        cx = 0.5 * W + 40 * np.sin(0.7 * t)
+        cy = 0.4 * H + 15 * np.sin(1.3 * t)
+        faces = [(0, (cx - 90, cy - 110, cx + 90, cy + 110))]
+        for wid, size, speed, t0, y in walkers:
+            span = W + 2 * size
+            x = (-size + speed * (t - t0)) % span - size if speed > 0 else W + size - (-speed * (t - t0)) % span
+            faces.append((wid, (x, y, x + size, y + 1.2 * size)))
+        scene.append(faces)
+    return scene
+
+def to_detections(faces, rng, miss_rate):
+    rows = []
+    for _, (x0, y0, x1, y1) in faces:
+        if rng.random() < miss_rate:
+            continue
+        j = rng.normal(0.0, 3.0, size=4)
+        x0, x1 = np.clip([x0 + j[0], x1 + j[2]], 0, W - 1)
+        y0, y1 = np.clip([y0 + j[1], y1 + j[3]], 0, H - 1)
+        rows.append([0, 1, rng.uniform(0.7, 0.99), x0 / W, y0 / H, x1 / W, y1 / H])
+    return np.array(rows, dtype=np.float32).reshape(-1, 7)
+
+def truth_of(box, faces):
+    if box is None:
+        return None
+    best, best_d = None, 1e9
+    for tid, (x0, y0, x1, y1) in faces:
+        d = abs(box[0] - x0) + abs(box[1] - y0) + abs(box[2] - x1) + abs(box[3] - y1)
+        if d < best_d:
+            best, best_d = tid, d
+    return best
+
+def count_switches(scene, pick, seed):
+    rng = np.random.default_rng(seed)
+    followed, switches, away = None, 0, 0
+    for faces in scene:
+        box = pick(to_detections(faces, rng, miss_rate=0.08))
+        tid = truth_of(box, faces)
+        if tid is None:
+            continue
+        if followed is not None and tid != followed:
+            switches += 1
+        followed = tid
+        away += tid != 0
+    return switches, away
+
+def compare_switches(n_passers=8, seconds=120, seed=2):
+    p = params.snapshot
+    scene = booth_scene(n_passers, int(seconds * FPS), seed)
+
+    prev = [None]
+    def single(det):
+        best = pick_best_face(det, W, H, p, prev[0])
+        prev[0] = best[:4] if best is not None else prev[0]
+        return best
+
+    tracker = MultiFaceTracker()
+    frame = [0]
+    def multi(det):
+        frame[0] += 1
+        return tracker.update(det, W, H, p, frame[0] / FPS)
+
+    for name, pick in (("pick_best_face", single), ("MultiFaceTracker", multi)):
+        switches, away = count_switches(scene, pick, seed + 1)
+        print(f"[SCENE] {name:17s} {seconds}s, {n_passers} passers-by: {switches:4d} target switches, "
+              f"{100.0 * away / len(scene):5.1f}% of frames on someone else")
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def bench(n_faces, frames=600, seed=3):
+    p = params.snapshot
+    scene = booth_scene(n_faces - 1, frames, seed)
+    rng = np.random.default_rng(seed)
+    dets = [to_detections(f, rng, miss_rate=0.05) for f in scene]
+    tracker = MultiFaceTracker()
+
+    t0 = time.perf_counter()
+    for k, d in enumerate(dets):
+        tracker.update(d, W, H, p, k / FPS)
+    us = 1e6 * (time.perf_counter() - t0) / frames
+    print(f"[BENCH] {n_faces:3d} faces: {us:8.1f} us/frame")
+
+def main():
+    check_assignment()
+    compare_switches()
+    for n in (1, 5, 10, 20, 32):
+        bench(n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FrameGovernor benchmark: a synthetic frame loop with the main loop's stage
+layout (detection, landmarks on frames with a face, fixed control work,
+preview + HUD), fed by a 30 fps camera, goes through three phases:
+
+    normal   inference at its usual cost
+    throttled  detection + landmarks --slowdown times slower (thermal / NPU contention)
+    recovered  back to normal
+
+Run once with the governor off and once on; per phase it reports frames/s,
+frame work time, the share of frames over budget and the levels used, so
+you can see it shed under overload and restore once headroom returns.
+
+Usage:
+    python bench_governor.py
+    python bench_governor.py --detect-ms 14 --landmarks-ms 5 --preview-ms 9 --slowdown 3
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from roarm import engine
+from roarm.engine import FrameGovernor
+
+FPS = 30.0
+
+def busy(ms):
+    end = time.perf_counter() + ms / 1000.0
+    while time.perf_counter() < end:
+        pass
+
+def run(args, enabled):
+    engine.GOVERNOR_ENABLE = enabled
+    engine.GOVERNOR_BUDGET_MS = 1000.0 / FPS
+    gov = FrameGovernor()
+    phases = (("normal", args.phase_sec, 1.0), ("throttled", 2 * args.phase_sec, args.slowdown),
+              ("recovered", 2 * args.phase_sec, 1.0))
+    out = []
+    period = 1.0 / FPS
+    t_frame = time.monotonic()
+    for name, seconds, slow in phases:
+        work, levels = [], []
+        frames = 0
+        t_end = time.monotonic() + seconds
+        while time.monotonic() < t_end:
+            # camera: the next frame is ready one period after the last, or now if we are behind
+            t_frame = max(t_frame + period, time.monotonic() - period)
+            delay = t_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            t_work = time.perf_counter()
+            if gov.due("detect"):
+                t0 = time.perf_counter()
+                busy(args.detect_ms * slow)
+                gov.record("detect", 1000.0 * (time.perf_counter() - t0))
+                if gov.due("landmarks"):
+                    t0 = time.perf_counter()
+                    busy(args.landmarks_ms * slow)
+                    gov.record("landmarks", 1000.0 * (time.perf_counter() - t0))
+            busy(args.fixed_ms)
+            if gov.due("preview"):
+                t0 = time.perf_counter()
+                busy(args.preview_ms)
+                gov.record("preview", 1000.0 * (time.perf_counter() - t0))
+            frame_ms = 1000.0 * (time.perf_counter() - t_work)
+            gov.end_frame(frame_ms)
+
+            frames += 1
+            work.append(frame_ms)
+            levels.append(gov.level)
+        out.append((name, frames / seconds, np.array(work), np.array(levels)))
+    return out
+
+def report(label, phases, budget_ms):
+    print(f"[BENCH] governor {label}")
+    for name, fps, work, levels in phases:
+        used = ", ".join(f"{lv}:{np.mean(levels == lv):.0%}" for lv in np.unique(levels))
+        print(f"[BENCH]   {name:10s} {fps:5.1f} frames/s  work p50 {np.percentile(work, 50):5.1f} ms  "
+              f"over budget {np.mean(work > budget_ms):5.1%}  levels {used}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame budget governor under a simulated slowdown")
+    parser.add_argument("--detect-ms", type=float, default=12.0)
+    parser.add_argument("--landmarks-ms", type=float, default=4.0)
+    parser.add_argument("--preview-ms", type=float, default=7.0, help="HUD + imshow + waitKey")
+    parser.add_argument("--fixed-ms", type=float, default=3.0, help="control, telemetry, logging")
+    parser.add_argument("--slowdown", type=float, default=2.5, help="inference cost factor while throttled")
+    parser.add_argument("--phase-sec", type=float, default=4.0)
+    args = parser.parse_args()
+
+    budget = 1000.0 / FPS
+    print(f"[BENCH] {FPS:.0f} fps camera, budget {budget:.1f} ms; detect {args.detect_ms:g} + landmarks "
+          f"{args.landmarks_ms:g} + preview {args.preview_ms:g} + fixed {args.fixed_ms:g} ms, "
+          f"inference x{args.slowdown:g} while throttled")
+    report("off", run(args, False), budget)
+    report("on", run(args, True), budget)
+
+if __name__ == "__main__":
+    main()
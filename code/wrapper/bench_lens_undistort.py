@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LensModel check + benchmark.
+
+1) Round trip: distorts random ideal points with the fisheye forward model and
+   requires undistort_exact() (Newton) to get them back, then measures how far
+   the bilinear LUT lookup is from the exact inverse over the whole frame.
+2) Times the per-frame work VisionTracker does (4 bbox corners + aim point +
+   5 landmarks in one undistort_points call) against the exact Newton solve,
+   cv2.fisheye.undistortPoints and a full-frame cv2.remap, where cv2 is
+   installed. Also reports the one-off LUT build time.
+
+Usage:
+    python bench_lens_undistort.py
+    python bench_lens_undistort.py --fov 145 --size 640x480
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from roarm.engine import LensModel, cv2
+
+# ============================================================
+# TEST LENS
+# ============================================================
+
+def test_lens(W, H, fov_deg):
+    """Equidistant lens that spans fov_deg across the frame width, with mild higher-order terms."""
+    f = (0.5 * W) / math.radians(0.5 * fov_deg)
+    K = [[f, 0.0, 0.5 * W + 3.7], [0.0, f * 1.01, 0.5 * H - 2.2], [0.0, 0.0, 1.0]]
+    return LensModel(K, [0.021, -0.012, 0.004, -0.0006], (W, H))
+
+def distort(lens, x, y, W, H, mirror=False):
+    """Forward model: ideal pixel (virtual pinhole centered in the frame) -> frame pixel."""
+    K = lens.camera_matrix(W, H, mirror)
+    fx, fy, cx, cy = K[0, 0], K[1, 1], K[0, 2], K[1, 2]
+    k1, k2, k3, k4 = lens.D
+    a = (x - 0.5 * W) / fx
+    b = (y - 0.5 * H) / fy
+    r = np.hypot(a, b)
+    theta = np.arctan(r)
+    t2 = theta * theta
+    theta_d = theta * (1.0 + k1 * t2 + k2 * t2 ** 2 + k3 * t2 ** 3 + k4 * t2 ** 4)
+    scale = np.where(r > 1e-12, theta_d / np.maximum(r, 1e-12), 1.0)
+    return cx + fx * a * scale, cy + fy * b * scale
+
+# ============================================================
+# ACCURACY
+# ============================================================
+
+def check_accuracy(lens, W, H):
+    rng = np.random.default_rng(3)
+    for mirror in (False, True):
+        # ideal points that land inside the frame
+        x = rng.uniform(-0.5 * W, 1.5 * W, 200000)
+        y = rng.uniform(-0.5 * H, 1.5 * H, 200000)
+        u, v = distort(lens, x, y, W, H, mirror)
+        inside = (u >= 0) & (u <= W - 1) & (v >= 0) & (v <= H - 1)
+        x, y, u, v = x[inside], y[inside], u[inside], v[inside]
+        ux, uy = lens.undistort_exact(u, v, W, H, mirror)
+        err = np.hypot(ux - x, uy - y)
+        if err.max() > 1e-6:
+            raise AssertionError(f"Newton inverse off by {err.max():.2e} px (mirror={mirror})")
+
+        lut = lens.undistort_points(np.column_stack([u, v]), W, H, mirror)
+        lut_err = np.hypot(lut[:, 0] - x, lut[:, 1] - y)
+        r = np.hypot(u - 0.5 * W, v - 0.5 * H) / (0.5 * W)
+        print(f"[CHECK] mirror={mirror!s:5}  Newton round trip max {err.max():.1e} px   "
+              f"LUT error median {np.median(lut_err):.4f} px  p99 {np.percentile(lut_err, 99):.4f} px  "
+              f"max {lut_err.max():.4f} px (center {lut_err[r < 0.5].max():.4f}, edge {lut_err[r >= 0.5].max():.4f})")
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def timed(fn, reps):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return 1e6 * (time.perf_counter() - t0) / reps
+
+def bench(lens, W, H, reps):
+    lens._luts.clear()
+    t0 = time.perf_counter()
+    lens.lut(W, H)
+    t_build = 1e3 * (time.perf_counter() - t0)
+    print(f"[BENCH] LUT build {W}x{H}: {t_build:.1f} ms once, {lens.lut(W, H).nbytes / 1e6:.1f} MB")
+
+    rng = np.random.default_rng(4)
+    pts = [tuple(p) for p in rng.uniform((0, 0), (W - 1, H - 1), size=(10, 2))]
+    u = np.array([p[0] for p in pts])
+    v = np.array([p[1] for p in pts])
+
+    rows = [("LUT undistort_points, 10 pts", timed(lambda: lens.undistort_points(pts, W, H), reps)),
+            ("Newton undistort_exact, 10 pts", timed(lambda: lens.undistort_exact(u, v, W, H), reps))]
+
+    try:
+        cv2.remap
+    except ImportError:
+        print("[BENCH] cv2 not installed, skipping the OpenCV rows")
+    else:
+        K = lens.camera_matrix(W, H)
+        D = lens.D.reshape(4, 1)
+        cv_pts = np.array(pts, dtype=np.float64).reshape(1, -1, 2)
+        rows.append(("cv2.fisheye.undistortPoints, 10 pts",
+                     timed(lambda: cv2.fisheye.undistortPoints(cv_pts, K, D, P=K), reps)))
+        frame = rng.integers(0, 255, size=(H, W, 3), dtype=np.uint8)
+        lens.preview_maps(W, H)
+        rows.append(("cv2.remap full frame (preview)", timed(lambda: lens.remap(frame), max(10, reps // 100))))
+
+    for name, us in rows:
+        print(f"[BENCH] {name:38s} {us:10.1f} us/frame")
+
+def main():
+    parser = argparse.ArgumentParser(description="LensModel accuracy and per-frame cost")
+    parser.add_argument("--fov", type=float, default=145.0)
+    parser.add_argument("--size", default="640x480")
+    parser.add_argument("--reps", type=int, default=20000)
+    args = parser.parse_args()
+    W, H = (int(x) for x in args.size.lower().split("x"))
+
+    lens = test_lens(W, H, args.fov)
+    check_accuracy(lens, W, H)
+    bench(lens, W, H, args.reps)
+
+if __name__ == "__main__":
+    main()
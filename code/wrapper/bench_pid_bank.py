@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PIDBank check + benchmark.
+
+1) Steps PIDBank and a list of PIDAxis objects with the same random errors,
+   measurements and dt values (including saturation, tiny dt and resets) and
+   requires the outputs and internal state to match bit for bit.
+2) Times scalar PIDAxis vs PIDBank for the 3-axis controller and for large
+   banks of independent controllers.
+
+Usage:
+    python bench_pid_bank.py
+"""
+
+import time
+
+import numpy as np
+
+from roarm.engine import PIDAxis, PIDBank, RoArmController
+
+# ============================================================
+# EQUIVALENCE
+# ============================================================
+
+def random_axes(rng, n):
+    axes = []
+    for _ in range(n):
+        out = rng.uniform(5.0, 300.0)
+        lim = rng.uniform(1.0, 40.0)
+        axes.append(PIDAxis(rng.uniform(0.0, 400.0), rng.uniform(0.0, 20.0), rng.uniform(0.0, 40.0),
+                            -out, out, -lim, lim, rng.uniform(0.05, 1.0)))
+    return axes
+
+def check_equivalence(n=64, steps=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    axes = random_axes(rng, n)
+    axes += [PIDAxis(a.kp, a.ki, a.kd, a.out_min, a.out_max, a.i_min, a.i_max, a.d_alpha)
+             for a in (RoArmController().pid_x, RoArmController().pid_y)]
+    bank = PIDBank.from_axes(axes)
+
+    for k in range(steps):
+        # big errors now and then to hit saturation and the anti-windup branch
+        scale = 50.0 if k % 97 < 5 else 1.0
+        err = rng.normal(0.0, scale, size=len(axes))
+        meas = rng.normal(0.0, scale, size=len(axes))
+        dt = rng.choice([1e-6, 1e-3, 0.033, 0.05, 0.08])
+
+        if k % 1000 == 999:
+            mask = rng.random(len(axes)) < 0.3
+            bank.reset(mask)
+            for a, m in zip(axes, mask):
+                if m:
+                    a.reset()
+
+        out_bank = bank.update(err, meas, dt)
+        out_ref = np.array([a.update(float(e), float(m), float(dt)) for a, e, m in zip(axes, err, meas)])
+
+        if not np.array_equal(out_bank, out_ref):
+            raise AssertionError(f"output mismatch at step {k}")
+        if not np.array_equal(bank.integral, [a.integral for a in axes]):
+            raise AssertionError(f"integral mismatch at step {k}")
+        if not np.array_equal(bank.d_filt, [a.d_filt for a in axes]):
+            raise AssertionError(f"d_filt mismatch at step {k}")
+
+    print(f"[CHECK] PIDBank == PIDAxis bit for bit over {steps} steps x {len(axes)} controllers")
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def bench(n, steps):
+    rng = np.random.default_rng(2)
+    axes = random_axes(rng, n)
+    bank = PIDBank.from_axes(axes)
+    err = rng.normal(size=(steps, n))
+    meas = rng.normal(size=(steps, n))
+
+    t0 = time.perf_counter()
+    for k in range(steps):
+        for i, a in enumerate(axes):
+            a.update(err[k, i], meas[k, i], 0.05)
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for k in range(steps):
+        bank.update(err[k], meas[k], 0.05)
+    t_bank = time.perf_counter() - t0
+
+    updates = n * steps
+    print(f"[BENCH] n={n:6d}  PIDAxis {1e9 * t_scalar / updates:8.1f} ns/update   "
+          f"PIDBank {1e9 * t_bank / updates:8.1f} ns/update   speedup {t_scalar / t_bank:6.1f}x")
+
+def main():
+    check_equivalence()
+    bench(3, 20000)
+    bench(100, 2000)
+    bench(10000, 50)
+    bench(100000, 10)
+
+if __name__ == "__main__":
+    main()
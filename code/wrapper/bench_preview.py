@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Preview check + benchmark.
+
+1) HudText stamps exactly the pixels cv2.putText(..., LINE_8) draws, for the
+   HUD lines over random backgrounds (on OpenCV 5, which anti-aliases Hershey
+   text regardless of lineType, HudText only calls putText).
+2) Cost per frame of the HUD text: putText every frame vs cached lines, with
+   values that change at the usual rates (XYZ / latency per command, FPS once
+   a second, the rest rarely).
+3) What the control loop pays: drawing the overlays + HUD inline vs handing the
+   frame to the preview thread (PreviewRenderer.submit).
+
+Usage:
+    python bench_preview.py
+    python bench_preview.py --frames 2000
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from roarm import engine
+from roarm.engine import HudState, HudText, Measurement, PreviewRenderer, params
+
+W, H = 640, 480
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+def hud_lines(i):
+    """The HUD lines of frame i: (name, text, org, scale, color, thickness)."""
+    return [
+        ("mode", "MODE: AUTO", (10, 30), 0.8, (0, 255, 0), 2),
+        ("xyz", f"XYZ: {140 + (i // 2) % 40}, {-150 + (i // 2) % 7}, 234", (10, 90), 0.6, (255, 255, 255), 2),
+        ("fps", f"FPS: {29.5 + (i // 30) % 3 * 0.2:.1f}", (10, 120), 0.6, (255, 255, 0), 2),
+        ("track", "TRACK: ON", (10, 150), 0.6, (0, 255, 0), 2),
+        ("status", "STATUS: AUTO TRACKING", (10, 180), 0.55, (200, 200, 200), 2),
+        ("aim", "AIM: 0.50, 0.40", (10, 210), 0.55, (200, 200, 200), 2),
+        ("dist", f"DIST: {35 + (i // 3) % 10 * 0.1:.1f} cm (raw {34.6:.1f})", (10, 240), 0.6, (0, 255, 255), 2),
+        ("latency", f"LAT: {40 + (i // 2) % 5} ms (p95 60)", (10, 270), 0.55, (255, 200, 0), 2),
+    ]
+
+def check(rng, n=200):
+    hud = HudText()
+    differing = 0
+    for i in range(n):
+        bg = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+        a, b = bg.copy(), bg.copy()
+        for name, text, org, scale, color, thickness in hud_lines(i * 7):
+            cv2.putText(a, text, org, FONT, scale, color, thickness, cv2.LINE_8)
+            hud.draw(b, name, text, org, scale, color, thickness)
+        differing += int((a != b).any(axis=2).sum())
+    if differing:
+        raise AssertionError(f"{differing} pixels differ from putText")
+    mode = "stamped" if hud.stamp else "putText only"
+    print(f"[CHECK] HUD text over {n} random frames: identical to putText (OpenCV {cv2.__version__}, {mode})")
+
+def bench_text(frames):
+    frame = np.zeros((H, W, 3), dtype=np.uint8)
+    hud = HudText()
+    t0 = time.perf_counter()
+    for i in range(frames):
+        for name, text, org, scale, color, thickness in hud_lines(i):
+            cv2.putText(frame, text, org, FONT, scale, color, thickness)
+    t1 = time.perf_counter()
+    for i in range(frames):
+        for name, text, org, scale, color, thickness in hud_lines(i):
+            hud.draw(frame, name, text, org, scale, color, thickness)
+    t2 = time.perf_counter()
+    print(f"[BENCH] HUD text per frame: putText {1000 * (t1 - t0) / frames:.3f} ms -> "
+          f"cached {1000 * (t2 - t1) / frames:.3f} ms")
+
+def bench_handoff(frames, rng):
+    params.reset()
+    p = params.snapshot
+    renderer = PreviewRenderer()
+    renderer.thread = object()          # submit() only; nothing is shown
+    frame = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+    meas = Measurement(face_ok=True, bbox=(200, 120, 360, 330), view_cx=280.0, view_cy=225.0, dist_cm=36.2,
+                       raw_dist_cm=35.9)
+    tracks = [(1, (200, 120, 360, 330), True, True), (2, (450, 100, 560, 240), True, False)]
+
+    def state(i):
+        return HudState(meas=meas, tracks=tracks, p=p, mode="AUTO", locked=False, paused=False, gyro_cmd="STOP",
+                        xyz=(140.0 + i % 40, -150.0, 234.0), fps=29.7, shed=0, tracking=True, status="AUTO TRACKING",
+                        latency=f"LAT: {40 + i % 5} ms (p95 60)", t_capture=0.0)
+
+    inline = PreviewRenderer()
+    t0 = time.perf_counter()
+    for i in range(frames):
+        inline.draw(frame.copy(), state(i))
+    t1 = time.perf_counter()
+    for i in range(frames):
+        renderer.submit(frame, state(i))
+    t2 = time.perf_counter()
+    print(f"[BENCH] control loop per frame: draw inline {1000 * (t1 - t0) / frames:.3f} ms -> "
+          f"hand to preview thread {1000 * (t2 - t1) / frames:.3f} ms (imshow + waitKey not counted)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached HUD and off-thread preview costs")
+    parser.add_argument("--frames", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine.SHOW_PREVIEW = False
+    rng = np.random.default_rng(1)
+    check(rng)
+    bench_text(args.frames)
+    bench_handoff(args.frames, rng)
+
+if __name__ == "__main__":
+    main()
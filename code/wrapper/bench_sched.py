@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scheduling profile check + benchmark: control-loop jitter with and without
+SCHED_PROFILE["control"], idle and under a CPU stress load.
+
+1) Fallback: sched_thread() with impossible settings (cores that do not
+   exist, an out-of-range priority) and in a child process that dropped root
+   must return and leave the thread running at the default, never raise.
+2) Jitter: a fixed-rate loop at --hz with --work-us of work per tick runs in
+   a fresh thread, with scheduling left default or set from the profile, while
+   the machine is idle or while --stress processes spin on every core.
+   Reports how late each tick wakes up.
+
+Usage:
+    python bench_sched.py
+    python bench_sched.py --seconds 20 --cpus 3 --fifo 50
+    sudo python bench_sched.py --stress 16        # SCHED_FIFO needs CAP_SYS_NICE / rtprio
+"""
+
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+from roarm import engine
+from roarm.engine import sched_thread
+
+# ============================================================
+# LOAD
+# ============================================================
+
+def spin(stop):
+    while not stop.is_set():
+        for _ in range(10000):
+            pass
+
+def busy(us):
+    end = time.perf_counter() + us / 1e6
+    while time.perf_counter() < end:
+        pass
+
+class Stress:
+    """n processes that keep every core busy at normal priority."""
+    def __init__(self, n):
+        ctx = multiprocessing.get_context("spawn")
+        self.stop = ctx.Event()
+        self.procs = [ctx.Process(target=spin, args=(self.stop,), daemon=True) for _ in range(n)]
+
+    def __enter__(self):
+        for p in self.procs:
+            p.start()
+        time.sleep(0.5)
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        for p in self.procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+
+# ============================================================
+# CHECK
+# ============================================================
+
+def in_thread(fn):
+    out = []
+    th = threading.Thread(target=lambda: out.append(fn()))
+    th.start()
+    th.join()
+    return out[0]
+
+def unprivileged_child(conn):
+    try:
+        os.setgid(65534)
+        os.setuid(65534)
+    except OSError:
+        pass                            # not root to begin with: already unprivileged
+    engine.SCHED_ENABLE = True
+    engine.SCHED_PROFILE = {"control": {"cpus": (0,), "fifo": 50, "nice": -10}}
+    summary = sched_thread("control")
+    conn.send((summary, os.sched_getscheduler(0) == os.SCHED_OTHER, os.getpriority(os.PRIO_PROCESS, 0)))
+
+def check_fallback():
+    engine.SCHED_ENABLE = True
+    engine.SCHED_PROFILE = {"control": {"cpus": (4096,), "fifo": 1000, "nice": 0}}
+    summary = in_thread(lambda: sched_thread("control"))
+    if "SCHED_FIFO" in summary or "cpus" in summary:
+        raise AssertionError(f"impossible settings reported as applied: {summary}")
+
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=unprivileged_child, args=(child,))
+    p.start()
+    summary, other, nice = parent.recv()
+    p.join()
+    if not other or nice < 0:
+        raise AssertionError(f"unprivileged thread got real-time or raised priority: {summary}")
+    print(f"[CHECK] sched_thread() falls back without raising; unprivileged: {summary}")
+
+# ============================================================
+# JITTER
+# ============================================================
+
+def control_loop(seconds, hz, work_us, spec):
+    """Fixed-rate loop in a fresh thread; returns (lateness_ms array, what sched_thread applied)."""
+    out = {}
+
+    def body():
+        engine.SCHED_ENABLE = spec is not None
+        engine.SCHED_PROFILE = {"control": spec or {}}
+        out["sched"] = sched_thread("control")
+        period = 1.0 / hz
+        late = []
+        t_next = time.monotonic() + period
+        t_end = time.monotonic() + seconds
+        while t_next < t_end:
+            delay = t_next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            late.append(1000.0 * (time.monotonic() - t_next))
+            busy(work_us)
+            t_next += period
+        out["late"] = np.array(late)
+
+    th = threading.Thread(target=body, name="control")
+    th.start()
+    th.join()
+    return out["late"], out["sched"]
+
+def report(name, late, sched):
+    p50, p99, worst = np.percentile(late, [50, 99, 100])
+    print(f"[BENCH] {name:24s} p50 {p50:7.3f}  p99 {p99:7.3f}  max {worst:7.3f} ms   ({sched})")
+    return p99
+
+def main():
+    parser = argparse.ArgumentParser(description="Control-loop jitter with and without the scheduling profile")
+    parser.add_argument("--seconds", type=float, default=8.0, help="per run")
+    parser.add_argument("--hz", type=float, default=100.0)
+    parser.add_argument("--work-us", type=float, default=500.0, help="work per tick")
+    parser.add_argument("--stress", type=int, default=2 * (os.cpu_count() or 1), help="spinning processes")
+    parser.add_argument("--cpus", type=lambda s: tuple(int(c) for c in s.split(",")), default=None,
+                        help="control cores, e.g. 3 or 2,3 (default: SCHED_PROFILE, cores that exist)")
+    parser.add_argument("--fifo", type=int, default=None)
+    parser.add_argument("--nice", type=int, default=None)
+    args = parser.parse_args()
+
+    spec = dict(engine.SCHED_PROFILE.get("control", {}))
+    for key in ("cpus", "fifo", "nice"):
+        if getattr(args, key) is not None:
+            spec[key] = getattr(args, key)
+    if args.cpus is None and "cpus" in spec:
+        spec["cpus"] = tuple(c for c in spec["cpus"] if c < (os.cpu_count() or 1)) or None
+
+    check_fallback()
+    engine._sched_reported.clear()
+
+    print(f"[BENCH] {args.hz:.0f} Hz loop, {args.work_us:g} us work per tick, {args.seconds:g}s per run, "
+          f"{os.cpu_count()} cores, control spec {spec}")
+    results = {}
+    for stressed in (False, True):
+        for profiled in (False, True):
+            name = f"{'stress' if stressed else 'idle'} / {'profile' if profiled else 'default'}"
+            if stressed:
+                with Stress(args.stress):
+                    late, sched = control_loop(args.seconds, args.hz, args.work_us, spec if profiled else None)
+            else:
+                late, sched = control_loop(args.seconds, args.hz, args.work_us, spec if profiled else None)
+            results[name] = report(name, late, sched)
+    print(f"[BENCH] p99 under {args.stress} stress processes: default {results['stress / default']:.2f} ms -> "
+          f"profile {results['stress / profile']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Profile override check + import / startup time per platform profile.
+
+1) Overrides: in a fresh interpreter per profile, --set style overrides
+   (parsed by roarm.__main__) of the server ports, logger limits, dump path,
+   TCP buffer and latency window must reach the command server, metrics
+   server, logger, parser and LatencyStats; and no engine function may take a
+   setting as a default argument (those are frozen at import, before any
+   profile is applied).
+2) Timing: every row runs in a fresh interpreter and reports:
+  engine     import roarm.engine (numpy + stdlib; cv2/openvino/serial deferred)
+  heavy      the deferred modules that profile actually uses (cv2, openvino,
+             plus serial unless TEST_MODE), imported the way boot would
+  server     apply profile -> command server accepting connections
+The "tools" row is what pid_tuner.py and the bench scripts pay. Modules not
+installed on this machine are reported as missing instead of timed.
+
+Usage:
+    python bench_startup.py --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+CHECK = r"""
+import ast, inspect, json, os, socket, sys, tempfile, threading, time
+from roarm import engine, profiles
+from roarm.__main__ import parse_override
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+dump = os.path.join(tempfile.mkdtemp(), "dump.jsonl")
+port, metrics_port = free_port(), free_port()
+overrides = dict(parse_override(text) for text in (
+    f"SOCKET_HOST=127.0.0.1", f"SOCKET_PORT={port}", f"METRICS_PORT={metrics_port}", f"LOG_DUMP_PATH={dump}",
+    "LOG_RING_SIZE=7", "LOG_QUEUE_MAX=3", "LOG_RATE_LIMITS={'CHECK': 1}", "TCP_MAX_PENDING_BYTES=11",
+    "LATENCY_STATS_WINDOW=5", "PRINT_TCP_ACK=False"))
+profiles.apply_profile(sys.argv[1], **overrides)
+errors = []
+
+threading.Thread(target=engine.command_server_thread, daemon=True).start()
+engine.start_metrics_server()
+for name, p in (("SOCKET_PORT", port), ("METRICS_PORT", metrics_port)):
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", p), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    else:
+        errors.append(f"nothing listening on {name}={p}")
+
+dropped = engine.log.dropped_rate
+for i in range(10):
+    engine.log.info("CHECK", f"record {i}")
+if engine.log.ring.maxlen != 7:
+    errors.append(f"log ring holds {engine.log.ring.maxlen}, LOG_RING_SIZE=7")
+if engine.log.dropped_rate - dropped != 9:
+    errors.append(f"LOG_RATE_LIMITS not applied: {engine.log.dropped_rate - dropped} of 10 dropped, expected 9")
+engine.log.dump()
+if not os.path.exists(dump):
+    errors.append(f"log.dump() did not write LOG_DUMP_PATH={dump}")
+if engine.CommandStreamParser().max_pending != 11:
+    errors.append("CommandStreamParser ignores TCP_MAX_PENDING_BYTES")
+if engine.LatencyStats().samples["total"].maxlen != 5:
+    errors.append("LatencyStats ignores LATENCY_STATS_WINDOW")
+
+settings = {k for k in vars(engine) if k.isupper()}
+for node in ast.walk(ast.parse(inspect.getsource(engine))):
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        for d in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            names = sorted({n.id for n in ast.walk(d) if isinstance(n, ast.Name) and n.id in settings})
+            if names:
+                errors.append(f"{node.name}() line {node.lineno} takes {', '.join(names)} as a default")
+
+print(json.dumps(errors))
+"""
+
+PROBE = r"""
+import json, sys, threading, time
+t0 = time.perf_counter()
+from roarm import engine, profiles, lazy
+t_engine = time.perf_counter() - t0
+
+profile = sys.argv[1]
+heavy, missing = {}, []
+t_server = None
+if profile != "tools":
+    profiles.apply_profile(profile, METRICS_ENABLE=False)
+    wanted = [engine.cv2, engine.ov] + ([] if engine.TEST_MODE else [engine.serial])
+    for m in wanted:
+        try:
+            heavy.update(lazy.preload(m))
+        except ImportError:
+            missing.append(m._name)
+
+    ready = threading.Event()
+    t1 = time.perf_counter()
+    threading.Thread(target=engine.command_server_thread, args=("127.0.0.1", 0, lambda s: ready.set()),
+                     daemon=True).start()
+    ready.wait(5.0)
+    t_server = time.perf_counter() - t1
+
+print(json.dumps({"engine": t_engine, "heavy": heavy, "missing": missing, "server": t_server}))
+"""
+
+def probe(profile):
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", PROBE, profile], cwd=here,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def check(profiles):
+    here = os.path.dirname(os.path.abspath(__file__))
+    for profile in profiles:
+        out = subprocess.run([sys.executable, "-c", CHECK, profile], cwd=here,
+                             capture_output=True, text=True, check=True).stdout
+        errors = json.loads(out.strip().splitlines()[-1])
+        if errors:
+            raise AssertionError(f"profile {profile}: " + "; ".join(errors))
+    print(f"[CHECK] --set overrides reach the servers, logger, parser and latency stats ({', '.join(profiles)})")
+
+def main():
+    from roarm import PROFILES
+
+    parser = argparse.ArgumentParser(description="Import and startup time per profile")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check(sorted(PROFILES))
+
+    print(f"{'profile':>10} {'engine ms':>10} {'heavy ms':>10} {'server ms':>10}  heavy modules")
+    for profile in ["tools"] + sorted(PROFILES):
+        runs = [probe(profile) for _ in range(args.repeat)]
+        engine_ms = 1000.0 * np.median([r["engine"] for r in runs])
+        heavy_ms = 1000.0 * np.median([sum(r["heavy"].values()) for r in runs])
+        server = [r["server"] for r in runs if r["server"] is not None]
+        server_ms = f"{1000.0 * np.median(server):10.1f}" if server else f"{'-':>10}"
+        mods = ", ".join(f"{name} {1000.0 * np.median([r['heavy'][name] for r in runs]):.0f}"
+                         for name in runs[0]["heavy"])
+        if runs[0]["missing"]:
+            mods += ("; " if mods else "") + "missing: " + ", ".join(runs[0]["missing"])
+        print(f"{profile:>10} {engine_ms:10.1f} {heavy_ms:10.1f} {server_ms}  {mods}")
+
+if __name__ == "__main__":
+    main()
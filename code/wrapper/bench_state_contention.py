@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SystemState contention benchmark.
+
+A flooding client thread pushes commands as fast as it can while a control
+loop thread ticks at ~1 kHz doing what main() does with the shared state:
+read the control fields and call set_status a few times. Runs twice:
+
+  locked:    the previous SystemState (every read and write under state.lock)
+  snapshot:  the current SystemState (lock-free snapshot reads, copy-on-write)
+
+and reports how long the lock was held, how long the control loop waited on
+it, and the per-tick cost of the state access.
+
+Usage:
+    python bench_state_contention.py --seconds 3
+"""
+
+import argparse
+import contextlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from roarm import engine
+
+FLOOD_COMMANDS = ["LEFT", "RIGHT", "UP", "DOWN", "STOP", "LOCK", "UNLOCK", "PING"]
+
+class TimedLock:
+    """threading.Lock that records wait and hold times per acquiring thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = {}
+        self.holds = {}
+        self._t_acquired = 0.0
+
+    def __enter__(self):
+        t0 = time.perf_counter()
+        self._lock.acquire()
+        self._t_acquired = time.perf_counter()
+        self.waits.setdefault(threading.current_thread().name, []).append(self._t_acquired - t0)
+        return self
+
+    def __exit__(self, *exc):
+        held = time.perf_counter() - self._t_acquired
+        self.holds.setdefault(threading.current_thread().name, []).append(held)
+        self._lock.release()
+
+# ============================================================
+# PREVIOUS DESIGN (reference)
+# ============================================================
+
+class LockedState:
+    def __init__(self):
+        self.mode = "AUTO"
+        self.locked = False
+        self.paused = False
+        self.gyro_cmd = "STOP"
+        self.last_cmd_time = 0.0
+        self.system_ready = True
+        self.status_text = "BOOTING"
+        self.last_tcp_rx_time = 0.0
+        self.lock = TimedLock()
+
+def locked_handle(st, cmd):
+    with st.lock:
+        st.last_tcp_rx_time = time.time()
+    if cmd == "PING":
+        return
+    with st.lock:
+        if cmd == "LOCK":
+            st.locked = True
+        elif cmd == "UNLOCK":
+            st.locked = False
+        else:
+            st.gyro_cmd = cmd
+            st.last_cmd_time = time.time()
+
+def locked_tick(st, statuses):
+    with st.lock:
+        fields = (st.mode, st.locked, st.paused, st.gyro_cmd, st.last_cmd_time, st.system_ready, st.status_text)
+    for msg in statuses:
+        with st.lock:
+            if st.status_text != msg:
+                st.status_text = msg
+    return fields
+
+# ============================================================
+# CURRENT DESIGN
+# ============================================================
+
+def snapshot_handle(_st, cmd):
+    engine.handle_socket_command(cmd)
+
+def snapshot_tick(_st, statuses):
+    snap = engine.state.snapshot
+    fields = (snap.mode, snap.locked, snap.paused, snap.gyro_cmd, snap.last_cmd_time,
+              snap.system_ready, snap.status_text)
+    for msg in statuses:
+        engine.set_status(msg)
+    return fields
+
+# ============================================================
+# RUNNER
+# ============================================================
+
+def run(name, st, handle, tick, seconds):
+    stop = threading.Event()
+    n_cmds = [0]
+
+    def flood():
+        i = 0
+        while not stop.is_set():
+            handle(st, FLOOD_COMMANDS[i % len(FLOOD_COMMANDS)])
+            i += 1
+        n_cmds[0] = i
+
+    tick_costs = []
+
+    def control():
+        statuses = ["AUTO TRACKING", "AUTO TRACKING", "AUTO TRACKING"]
+        next_t = time.perf_counter()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            tick(st, statuses)
+            tick_costs.append(time.perf_counter() - t0)
+            next_t += 0.001
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    flood_t = threading.Thread(target=flood, name="flood")
+    control_t = threading.Thread(target=control, name="control")
+    flood_t.start()
+    control_t.start()
+    time.sleep(seconds)
+    stop.set()
+    flood_t.join()
+    control_t.join()
+
+    lock = st.lock
+    holds = np.array(sum(lock.holds.values(), [])) if lock.holds else np.zeros(1)
+    ctrl_waits = np.array(lock.waits.get("control", [0.0]))
+    costs = np.array(tick_costs)
+
+    return [
+        f"[{name}]",
+        f"    flood: {n_cmds[0] / seconds:10.0f} cmds/s   control ticks: {costs.size}",
+        f"    lock held: {1000.0 * holds.sum() / seconds:7.1f} ms per s  ({holds.size} acquisitions, "
+        f"p99 {1e6 * np.percentile(holds, 99):.1f} us)",
+        f"    control lock wait: total {1000.0 * ctrl_waits.sum():7.1f} ms   "
+        f"max {1e6 * ctrl_waits.max():8.1f} us",
+        f"    control state access per tick: p50 {1e6 * np.percentile(costs, 50):6.1f} us   "
+        f"p99 {1e6 * np.percentile(costs, 99):7.1f} us   max {1e6 * costs.max():8.1f} us",
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="SystemState lock contention benchmark")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    engine.PRINT_TCP_RAW = False
+    engine.PRINT_TCP_ACK = False
+    engine.state.lock = TimedLock()
+    engine.state.update(system_ready=True)
+
+    # the engine logs every handled command; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = run("locked", LockedState(), locked_handle, locked_tick, args.seconds)
+        report += run("snapshot", engine.state, snapshot_handle, snapshot_tick, args.seconds)
+    print("\n".join(report))
+
+if __name__ == "__main__":
+    main()
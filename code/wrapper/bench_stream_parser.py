@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CommandStreamParser fuzz check + benchmark.
+
+1) Fuzz: random command streams (LF, CRLF, bare tokens, junk, blank lines)
+   are split into random recv() chunks and fed to CommandStreamParser and to
+   the old string-concatenation parser. Both must yield the same commands.
+2) Throughput: thousands of commands per second in bursty chunks, old vs new.
+3) Flood: megabytes without a newline must keep the pending buffer bounded.
+
+Usage:
+    python bench_stream_parser.py
+"""
+
+import random
+import time
+
+from roarm.engine import VALID_COMMANDS, TCP_MAX_PENDING_BYTES, CommandStreamParser
+
+TOKENS = sorted(VALID_COMMANDS) + ["left", " UP ", "JUNK", "LEF", "T", "", "  "]
+SEPARATORS = ["\n", "\r\n", "\r", "\n\n", ""]
+
+# ============================================================
+# REFERENCE (previous string-based parser)
+# ============================================================
+
+class StringParser:
+    def __init__(self):
+        self.recv_buffer = ""
+
+    def feed(self, data):
+        cmds = []
+        self.recv_buffer += data.decode("utf-8", errors="ignore")
+        recv_buffer = self.recv_buffer.replace("\r", "\n")
+        while "\n" in recv_buffer:
+            line, recv_buffer = recv_buffer.split("\n", 1)
+            line = line.strip()
+            if line:
+                cmds.append(line)
+        stripped = recv_buffer.strip().upper()
+        if stripped in VALID_COMMANDS:
+            cmds.append(stripped)
+            recv_buffer = ""
+        self.recv_buffer = recv_buffer
+        return cmds
+
+# ============================================================
+# FUZZ
+# ============================================================
+
+def random_stream(rng, n_tokens):
+    parts = []
+    for _ in range(n_tokens):
+        parts.append(rng.choice(TOKENS))
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts).encode("ascii")
+
+def random_chunks(rng, data):
+    chunks = []
+    i = 0
+    while i < len(data):
+        n = rng.randint(1, 64)
+        chunks.append(data[i:i + n])
+        i += n
+    return chunks
+
+def fuzz(iterations=3000, seed=7):
+    rng = random.Random(seed)
+    for it in range(iterations):
+        chunks = random_chunks(rng, random_stream(rng, rng.randint(1, 60)))
+        new, old = CommandStreamParser(), StringParser()
+        got, want = [], []
+        for chunk in chunks:
+            got += [c.strip().upper() for c in new.feed(chunk)]
+            want += [c.strip().upper() for c in old.feed(chunk)]
+        if got != want:
+            raise AssertionError(f"iteration {it}: {chunks!r}\nnew {got}\nold {want}")
+    print(f"[FUZZ] {iterations} random streams: CommandStreamParser matches the old parser")
+
+# ============================================================
+# BENCHMARKS
+# ============================================================
+
+def throughput(parser_cls, chunks):
+    parser = parser_cls()
+    n = 0
+    t0 = time.perf_counter()
+    for chunk in chunks:
+        n += len(parser.feed(chunk))
+    return n, time.perf_counter() - t0
+
+def bench_throughput(n_cmds=200000, chunk=1024):
+    rng = random.Random(3)
+    data = "".join(rng.choice(sorted(VALID_COMMANDS)) + "\r\n" for _ in range(n_cmds)).encode()
+    chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+    for name, cls in (("string", StringParser), ("bytearray", CommandStreamParser)):
+        n, elapsed = throughput(cls, chunks)
+        print(f"[BENCH] {name:9s} {n} cmds in {elapsed * 1000:7.1f} ms  -> {n / elapsed:10.0f} cmds/s")
+
+def bench_burst(burst_bytes=64 * 1024):
+    # one client dumps a large burst that arrives in a single read
+    data = b"LEFT\n" * (burst_bytes // 5)
+    for name, cls in (("string", StringParser), ("bytearray", CommandStreamParser)):
+        n, elapsed = throughput(cls, [data])
+        print(f"[BENCH] {name:9s} {burst_bytes // 1024} KiB burst, {n} cmds in {elapsed * 1000:7.1f} ms")
+
+def bench_flood(total_bytes=8 * 1024 * 1024, chunk=1024):
+    parser = CommandStreamParser()
+    junk = b"X" * chunk
+    peak = 0
+    t0 = time.perf_counter()
+    for _ in range(total_bytes // chunk):
+        parser.feed(junk)
+        peak = max(peak, len(parser.pending))
+    cmds = parser.feed(b"\nLOCK\n")
+    elapsed = time.perf_counter() - t0
+    assert cmds == ["LOCK"], cmds
+    assert peak <= TCP_MAX_PENDING_BYTES + chunk
+    print(f"[BENCH] flood {total_bytes // (1024 * 1024)} MiB without newline: peak pending {peak} B, "
+          f"{elapsed * 1000:.1f} ms, recovered on next line")
+
+def main():
+    fuzz()
+    bench_throughput()
+    bench_burst()
+    bench_flood()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TickLog check + benchmark.
+
+1) Writes ticks with known values through TickLog (small chunks, so rollover
+   is exercised), reads them back with open_ticks() and compares field by field.
+2) Times record() on the control thread (p50 / p99 / max) and reports how
+   many ticks per second the writer thread sustains.
+
+Usage:
+    python bench_ticklog.py
+    python bench_ticklog.py --ticks 200000
+"""
+
+import argparse
+import math
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from roarm import engine
+from roarm.engine import Measurement, RoArmController, open_ticks, params, ticklog
+
+def run(n, seed=1):
+    rng = np.random.default_rng(seed)
+    controller = RoArmController()
+    p = params.snapshot
+    expected = []
+    cost = np.empty(n)
+
+    ticklog.start()
+    t0 = time.perf_counter()
+    for i in range(n):
+        face = bool(rng.random() < 0.9)
+        t = i / 50.0                                   # 50 Hz control ticks
+        meas = Measurement(face_ok=face, t_capture=t, t_infer_done=t + 0.01,
+                           dist_cm=float(rng.normal(40, 5)) if face else None,
+                           ex=float(rng.normal(0, 0.1)) if face else None, ey=0.0 if face else None,
+                           ed_cm=1.0 if face else None, track_id=7 if face else None, n_faces=int(face))
+        if face:
+            controller.update_from_measurement(meas, 0.02)
+        t_written = t + 0.02 if i % 4 == 0 else None
+
+        a = time.perf_counter()
+        ticklog.record(t + 0.03, 0.02, meas, controller, p, "AUTO", face, False, False, face, t_written)
+        cost[i] = time.perf_counter() - a
+        expected.append((meas.dist_cm, t_written, face, controller.x_cmd, controller.pid_state()[0][1]))
+    t_loop = time.perf_counter() - t0
+    ticklog.close()
+    return expected, cost, t_loop
+
+def check(expected, run_dir):
+    _, chunks = open_ticks(run_dir)
+    ticks = np.concatenate(chunks)
+    if ticks.size != len(expected):
+        raise AssertionError(f"{ticks.size} ticks read back, {len(expected)} written")
+    for i, (dist, t_written, face, x_cmd, integral_y) in enumerate(expected):
+        row = ticks[i]
+        same = (bool(row["face_ok"]) == face
+                and (math.isnan(row["dist_cm"]) if dist is None else np.float32(dist) == row["dist_cm"])
+                and (not row["sent"] if t_written is None else row["t_written"] == t_written)
+                and np.float32(x_cmd) == row["cmd"][0]
+                and np.float32(integral_y) == row["integral"][1])
+        if not same:
+            raise AssertionError(f"tick {i} differs: {row}")
+    print(f"[CHECK] {ticks.size} ticks in {len(chunks)} chunks read back identical")
+
+def main():
+    parser = argparse.ArgumentParser(description="TickLog round trip and per-tick cost")
+    parser.add_argument("--ticks", type=int, default=50000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ticklog_")
+    engine.TICKLOG_DIR = tmp
+    engine.TICKLOG_CHUNK_ROWS = max(1000, args.ticks // 3)
+    try:
+        params.reset()
+        expected, cost, t_loop = run(args.ticks)
+        check(expected, ticklog.dir)
+        p50, p99, worst = np.percentile(cost, [50, 99, 100]) * 1e6
+        print(f"[BENCH] record(): p50 {p50:.1f} us  p99 {p99:.1f} us  max {worst:.1f} us  "
+              f"({engine.TICK_DTYPE.itemsize} bytes/tick, {ticklog.dropped} dropped)")
+        print(f"[BENCH] {args.ticks / t_loop:,.0f} ticks/s through the log with the writer keeping up")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+VisionProcess check + benchmark: control-loop jitter with vision in a thread
+vs in the child process.
+
+The vision side is synthetic, so no camera or models are needed: a 30 fps
+frame source and a tracker whose process() spends --infer-ms of GIL-holding
+Python work per frame (the pre/post-processing part of inference) and
+--spike-ms every --spike-every frames. The main process runs a fixed-rate
+loop at --hz standing in for control + telemetry, and measures how late each
+tick wakes up, inside and outside inference spikes.
+
+1) Round trip: every Measurement field and the frame come back through the
+   ring unchanged and in order.
+2) Jitter: vision in a thread of this process (GIL shared) vs VisionProcess.
+
+Usage:
+    python bench_vision_process.py
+    python bench_vision_process.py --seconds 20 --infer-ms 12 --spike-ms 120
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from roarm import engine
+from roarm.engine import Measurement, VisionProcess
+
+FPS = 30.0
+W, H = 640, 480
+
+# ============================================================
+# SYNTHETIC VISION
+# ============================================================
+
+def busy(ms):
+    """Python work that holds the GIL, like detector output parsing / NMS / filters in Python."""
+    end = time.perf_counter() + ms / 1000.0
+    x = 0
+    while time.perf_counter() < end:
+        x += 1
+    return x
+
+class SyntheticCamera:
+    def __init__(self):
+        self.n = 0
+        self.t_next = time.monotonic()
+
+    def read(self):
+        self.t_next += 1.0 / FPS
+        delay = self.t_next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.n += 1
+        frame = np.zeros((H, W, 3), dtype=np.uint8)
+        frame[0, :8, 0] = np.frombuffer(self.n.to_bytes(8, "little"), dtype=np.uint8)
+        return True, frame
+
+    def release(self):
+        pass
+
+class SyntheticTracker:
+    faces = None
+    lens = None
+
+    def __init__(self, infer_ms, spike_ms, spike_every):
+        self.infer_ms, self.spike_ms, self.spike_every = infer_ms, spike_ms, spike_every
+        self.n = 0
+
+    def reset_filters(self):
+        pass
+
+    def process(self, frame, f_pixels, t_capture=None, p=None):
+        self.n += 1
+        spike = self.n % self.spike_every == 0
+        busy(self.infer_ms + (self.spike_ms if spike else 0.0))
+        x = float(self.n % 100)
+        return Measurement(face_ok=True, bbox=(self.n % W, 10, 100, 200), face_score=1.0 if spike else 0.0,
+                           n_faces=1, target_cx=x, target_cy=x + 0.5, view_cx=x, view_cy=x,
+                           ipd_px=60.0, raw_dist_cm=40.0, dist_cm=41.0, ex=0.1, ey=-0.1, ed_cm=6.0,
+                           t_capture=t_capture, t_infer_done=time.monotonic())
+
+def synthetic_source(infer_ms, spike_ms, spike_every):
+    return SyntheticCamera(), SyntheticTracker(infer_ms, spike_ms, spike_every)
+
+class SyntheticSource:
+    """Picklable make_source for VisionProcess."""
+    def __init__(self, *args):
+        self.args = args
+
+    def __call__(self):
+        return synthetic_source(*self.args)
+
+# ============================================================
+# CHECK
+# ============================================================
+
+def check_round_trip():
+    vision = VisionProcess(make_source=SyntheticSource(0.0, 0.0, 10**9))
+    vision.faces = None
+    if not vision.start(timeout=60.0):
+        raise AssertionError("vision process did not start")
+    try:
+        ok, frame, meas = vision.read(timeout=2.0)
+        if not ok:
+            raise AssertionError("no result from the vision process")
+        n = int.from_bytes(frame[0, :8, 0].tobytes(), "little")
+        expect = SyntheticTracker(0, 0, 10**9)
+        expect.n = n - 2              # the worker reads one frame for the ring size before processing
+        ref = expect.process(frame, None, meas.t_capture)
+        for field in ("face_ok", "bbox", "n_faces", "target_cx", "target_cy", "ipd_px", "raw_dist_cm",
+                      "dist_cm", "ex", "ey", "ed_cm", "t_capture", "track_id", "held"):
+            if getattr(meas, field) != getattr(ref, field):
+                raise AssertionError(f"{field}: {getattr(meas, field)!r} != {getattr(ref, field)!r}")
+        if frame.shape != (H, W, 3) or frame[1:].any():
+            raise AssertionError("frame differs")
+        seqs = []
+        for _ in range(20):
+            ok, frame, meas = vision.read(timeout=2.0)
+            seqs.append(int.from_bytes(frame[0, :8, 0].tobytes(), "little"))
+        if seqs != list(range(seqs[0], seqs[0] + 20)):
+            raise AssertionError(f"frames out of order or skipped: {seqs}")
+        print(f"[CHECK] Measurement fields and frames identical through the ring; 20 frames in order")
+    finally:
+        vision.close()
+
+# ============================================================
+# JITTER
+# ============================================================
+
+def control_loop(seconds, hz, poll):
+    """Fixed-rate loop; returns (lateness_ms per tick, spike windows seen [(t0, t1)], results)."""
+    period = 1.0 / hz
+    lateness, spikes = [], []
+    results = 0
+    t_next = time.monotonic() + period
+    t_end = time.monotonic() + seconds
+    while t_next < t_end:
+        delay = t_next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        lateness.append((t_next, 1000.0 * (now - t_next)))
+        for meas in poll():
+            results += 1
+            if meas.face_score:
+                spikes.append((meas.t_capture, meas.t_infer_done))
+        # a little control + telemetry work per tick
+        engine.json.dumps({"x": now, "y": results, "z": len(spikes)})
+        t_next += period
+    return lateness, spikes, results
+
+def summarize(name, lateness, spikes, results, seconds):
+    t = np.array([x[0] for x in lateness])
+    late = np.array([x[1] for x in lateness])
+    in_spike = np.zeros(t.size, dtype=bool)
+    for t0, t1 in spikes:
+        in_spike |= (t >= t0) & (t <= t1)
+    def stats(a):
+        return (f"p50 {np.percentile(a, 50):6.2f}  p99 {np.percentile(a, 99):6.2f}  max {a.max():6.2f} ms"
+                if a.size else "-")
+    print(f"[BENCH] {name:8s} {results / seconds:5.1f} results/s")
+    print(f"[BENCH]   ticks outside spikes: {stats(late[~in_spike])}")
+    print(f"[BENCH]   ticks during spikes:  {stats(late[in_spike])}")
+    return late
+
+def run_thread(args):
+    cam, tracker = synthetic_source(args.infer_ms, args.spike_ms, args.spike_every)
+    pending = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def vision():
+        while not stop.is_set():
+            ok, frame = cam.read()
+            meas = tracker.process(frame, None, time.monotonic())
+            with lock:
+                pending.append(meas)
+
+    def poll():
+        with lock:
+            out = pending[:]
+            pending.clear()
+        return out
+
+    th = threading.Thread(target=vision, daemon=True)
+    th.start()
+    time.sleep(0.5)
+    out = control_loop(args.seconds, args.hz, poll)
+    stop.set()
+    th.join()
+    return out
+
+def run_process(args):
+    vision = VisionProcess(make_source=SyntheticSource(args.infer_ms, args.spike_ms, args.spike_every))
+    vision.faces = None
+    if not vision.start(timeout=60.0):
+        raise SystemExit("vision process did not start")
+
+    def poll():
+        ok, _, meas = vision.read(timeout=0.0)
+        return [meas] if ok else []
+
+    try:
+        time.sleep(0.5)
+        return control_loop(args.seconds, args.hz, poll)
+    finally:
+        vision.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Control-loop jitter: vision thread vs vision process")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--hz", type=float, default=100.0, help="control loop rate")
+    parser.add_argument("--infer-ms", type=float, default=8.0, help="GIL-holding work per frame")
+    parser.add_argument("--spike-ms", type=float, default=80.0)
+    parser.add_argument("--spike-every", type=int, default=30, help="frames between spikes")
+    args = parser.parse_args()
+
+    engine.MIRROR_VIEW = False        # the frame number is stamped into the first pixels
+    check_round_trip()
+    print(f"[BENCH] {args.hz:.0f} Hz control loop, {FPS:.0f} fps vision, {args.infer_ms:g} ms per frame "
+          f"+ {args.spike_ms:g} ms spike every {args.spike_every} frames, {args.seconds:g}s each")
+    thread = summarize("thread", *run_thread(args), args.seconds)
+    proc = summarize("process", *run_process(args), args.seconds)
+    print(f"[BENCH] p99 tick lateness: thread {np.percentile(thread, 99):.2f} ms -> "
+          f"process {np.percentile(proc, 99):.2f} ms")
+
+if __name__ == "__main__":
+    main()
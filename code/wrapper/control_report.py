@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Control-quality report over TickLog recordings (TICKLOG_ENABLE=True).
+
+Each input is one column of the report: a run folder (session.json +
+chunk_*.ticks) or a folder of run folders (e.g. a whole day), whose sessions
+are joined. Chunks are memory-mapped and only the fields used are read, so
+days of ticks take seconds.
+
+Metrics, over "controlled" ticks (AUTO, tracking, PID stepped, not locked or
+paused), all computed with array operations:
+  - step responses per axis (ex, ey, ed_cm): a head move is the error leaving
+    the settle band and passing --move; settling time is until it is back in
+    the band for --hold seconds; overshoot is how far it swings past zero,
+    relative to the peak
+  - steady-state distance error against DIST_TARGET_CM (the target of the
+    params version in force), outside step responses
+  - command jitter while steady: RMS tick-to-tick change and direction
+    reversals per second, per axis
+  - serial send rate, time saturated at X_MIN..Z_MAX, capture-to-write latency
+--segments adds one row per stretch of control with the same params version.
+
+Usage:
+    python control_report.py ticklog/20260612_101500
+    python control_report.py before/ after/ --segments
+    python control_report.py ticklog/ --json report.json
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from roarm.engine import DIST_TARGET_CM, open_ticks
+
+FIELDS = ("t", "dt", "t_capture", "t_written", "manual", "face_ok", "tracking", "locked", "paused",
+          "controlled", "sent", "dist_cm", "ex", "ey", "ed_cm", "cmd", "params_version")
+AXES = (("x", "ex"), ("y", "ey"), ("dist", "ed_cm"))
+SAT_EPS_MM = 0.5
+MIN_SEGMENT_SEC = 5.0
+GAP_SEC = 1.0                      # a pause in ticks longer than this ends a segment
+
+# ============================================================
+# LOADING
+# ============================================================
+
+def find_sessions(path):
+    if os.path.exists(os.path.join(path, "session.json")):
+        return [path]
+    return sorted(os.path.join(path, d) for d in os.listdir(path)
+                  if os.path.exists(os.path.join(path, d, "session.json")))
+
+def load_params(run_dir):
+    """params version -> DIST_TARGET_CM, from params.jsonl."""
+    targets = {}
+    path = os.path.join(run_dir, "params.jsonl")
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                targets[entry["version"]] = entry.get("DIST_TARGET_CM", DIST_TARGET_CM)
+    return targets
+
+def load_run(path):
+    """Concatenated columns of every session under path, plus the first session's limits."""
+    sessions = find_sessions(path)
+    if not sessions:
+        raise SystemExit(f"{path}: no TickLog sessions")
+    cols = {k: [] for k in FIELDS}
+    cols["dist_target"] = []
+    cols["session"] = []
+    limits = None
+    for k, run_dir in enumerate(sessions):
+        session, chunks = open_ticks(run_dir)
+        limits = limits or session["limits"]
+        targets = load_params(run_dir)
+        for chunk in chunks:
+            for name in FIELDS:
+                cols[name].append(np.asarray(chunk[name]))
+            versions = np.asarray(chunk["params_version"])
+            lookup = np.vectorize(lambda v: targets.get(int(v), DIST_TARGET_CM), otypes=[np.float32])
+            uniq, inv = np.unique(versions, return_inverse=True)
+            cols["dist_target"].append(lookup(uniq)[inv] if uniq.size else np.zeros(0, np.float32))
+            cols["session"].append(np.full(chunk.shape[0], k, dtype=np.int32))
+    cols = {k: np.concatenate(v) if v else np.zeros(0) for k, v in cols.items()}
+    return cols, limits, len(sessions)
+
+# ============================================================
+# METRICS
+# ============================================================
+
+def control_mask(c):
+    return c["controlled"] & c["tracking"] & c["face_ok"] & ~c["manual"] & ~c["locked"] & ~c["paused"]
+
+def segment_ids(c, active):
+    """Stretch id per tick: a new one after any inactive tick, tick gap, new session or params version."""
+    brk = np.ones(c["t"].size, dtype=bool)
+    brk[1:] = ((~active[:-1]) | (np.diff(c["t"]) > GAP_SEC) | (np.diff(c["session"]) != 0)
+               | (np.diff(c["params_version"].astype(np.int64)) != 0))
+    return np.cumsum(brk) - 1
+
+def step_responses(t, e, active, seg, move, band, hold_sec):
+    """
+    Head-move events on one error signal. Returns dict of arrays, one entry per
+    event: index, settle_s (NaN if it never settled in the same stretch),
+    overshoot (fraction of the peak), peak.
+    """
+    n = t.size
+    idx = np.arange(n)
+    ae = np.where(active, np.abs(e), 0.0)
+    inside = active & (ae <= band)
+    exceed = active & (ae > move)
+
+    # settled = inside the band for hold_sec within one stretch; a zero crossing
+    # while still swinging is not
+    edges = np.diff(np.concatenate([[0], inside.astype(np.int8), [0]]))
+    run_start = np.nonzero(edges == 1)[0]
+    run_end = np.nonzero(edges == -1)[0]                 # exclusive
+    keep = (seg[run_start] == seg[run_end - 1]) & ((t[run_end - 1] - t[run_start]) >= hold_sec)
+    run_start, run_end = run_start[keep], run_end[keep]
+    mark = np.zeros(n + 1, dtype=np.int32)
+    np.add.at(mark, run_start, 1)
+    np.add.at(mark, run_end, -1)
+    settled_tick = np.cumsum(mark[:-1]) > 0
+
+    # an event is the first exceedance since the error last settled
+    last_settled = np.maximum.accumulate(np.where(settled_tick, idx, -1))
+    prev_exceed = np.concatenate([[-1], np.maximum.accumulate(np.where(exceed, idx, -1))[:-1]])
+    is_event = exceed & (last_settled >= 0) & (prev_exceed < last_settled)
+    is_event &= seg[np.maximum(last_settled, 0)] == seg
+    ev = np.nonzero(is_event)[0]
+    empty = {"index": ev, "settle_s": np.zeros(0), "overshoot": np.zeros(0), "peak": np.zeros(0),
+             "window_end": ev}
+    if ev.size == 0:
+        return empty
+
+    k = np.searchsorted(run_start, ev)
+    has_run = k < run_start.size
+    settle_at = np.where(has_run, run_start[np.minimum(k, run_start.size - 1)], n - 1)
+    next_ev = np.concatenate([ev[1:], [n]])
+    settled = has_run & (settle_at < next_ev) & (seg[settle_at] == seg[ev])
+    settle_s = np.where(settled, t[settle_at] - t[ev], np.nan)
+
+    # response window: event -> settled (or next event / end of stretch)
+    seg_end = np.searchsorted(seg, seg[ev], side="right")
+    w_end = np.where(settled, settle_at + 1, np.minimum(next_ev, seg_end))
+    bounds = np.stack([ev, np.maximum(w_end, ev + 1)], axis=1).ravel()
+    ez = np.where(active, e, 0.0).astype(np.float64)
+    reduce_at = bounds[:-1] if bounds[-1] >= n else bounds
+    hi = np.maximum.reduceat(ez, reduce_at)[0::2]
+    lo = np.minimum.reduceat(ez, reduce_at)[0::2]
+    sign = np.sign(e[ev])
+    peak = np.where(sign > 0, hi, -lo)
+    over = np.clip(np.where(sign > 0, -lo, hi), 0.0, None) / np.maximum(peak, 1e-9)
+    return {"index": ev, "settle_s": settle_s, "overshoot": over, "peak": peak, "window_end": w_end}
+
+def response_mask(n, resp):
+    """True inside any step-response window."""
+    mark = np.zeros(n + 1, dtype=np.int32)
+    if resp["index"].size:
+        np.add.at(mark, resp["index"], 1)
+        np.add.at(mark, resp["window_end"], -1)
+    return np.cumsum(mark[:-1]) > 0
+
+def pct(a, q):
+    a = a[np.isfinite(a)]
+    return float(np.percentile(a, q)) if a.size else float("nan")
+
+def summarize(c, lo, hi, active, responses, steady, limits, args):
+    """Metric dict over the active ticks in [lo, hi)."""
+    sel, steady = active[lo:hi], steady[lo:hi]
+    c = {k: v[lo:hi] for k, v in c.items()}
+    t, dt = c["t"], c["dt"].astype(np.float64)
+    out = {}
+    dur = float(dt[sel].sum())
+    out["control_s"] = dur
+    out["ticks"] = int(sel.sum())
+
+    for axis, _ in AXES:
+        r = responses[axis]
+        in_sel = (r["index"] >= lo) & (r["index"] < hi)
+        settle = r["settle_s"][in_sel]
+        out[f"{axis}_moves"] = int(in_sel.sum())
+        out[f"{axis}_settle_p50_s"] = pct(settle, 50)
+        out[f"{axis}_settle_p90_s"] = pct(settle, 90)
+        out[f"{axis}_unsettled"] = int(np.isnan(settle).sum())
+        out[f"{axis}_overshoot_p50"] = pct(r["overshoot"][in_sel], 50)
+        out[f"{axis}_overshoot_p90"] = pct(r["overshoot"][in_sel], 90)
+
+    st = sel & steady
+    derr = (c["dist_cm"] - c["dist_target"])[st]
+    derr = derr[np.isfinite(derr)]
+    out["dist_ss_bias_cm"] = float(derr.mean()) if derr.size else float("nan")
+    out["dist_ss_abs_p50_cm"] = pct(np.abs(derr), 50)
+    out["dist_ss_abs_p95_cm"] = pct(np.abs(derr), 95)
+
+    # jitter: consecutive steady ticks only
+    pair = st[1:] & st[:-1] & (np.diff(t) <= GAP_SEC)
+    dcmd = np.diff(c["cmd"].astype(np.float64), axis=0)[pair]
+    steady_s = max(float(dt[1:][pair].sum()), 1e-9)
+    for a, name in enumerate("xyz"):
+        d = dcmd[:, a] if dcmd.size else np.zeros(0)
+        out[f"jitter_{name}_rms_mm"] = float(np.sqrt(np.mean(d * d))) if d.size else float("nan")
+        moving = d[np.abs(d) > args.jitter_eps]
+        out[f"reversals_{name}_hz"] = float((np.diff(np.sign(moving)) != 0).sum() / steady_s) if d.size else float("nan")
+
+    out["send_hz"] = float(c["sent"][sel].sum() / max(dur, 1e-9))
+    out["send_frac"] = float(c["sent"][sel].mean()) if sel.any() else float("nan")
+
+    cmd = c["cmd"][sel].astype(np.float64)
+    low = np.array([limits["X_MIN"], limits["Y_MIN"], limits["Z_MIN"]])
+    high = np.array([limits["X_MAX"], limits["Y_MAX"], limits["Z_MAX"]])
+    sat = (cmd <= low + SAT_EPS_MM) | (cmd >= high - SAT_EPS_MM)
+    w = dt[sel]
+    for a, name in enumerate("xyz"):
+        out[f"saturated_{name}_frac"] = float(w[sat[:, a]].sum() / max(dur, 1e-9))
+    out["saturated_any_frac"] = float(w[sat.any(axis=1)].sum() / max(dur, 1e-9)) if sat.size else float("nan")
+
+    lat = (c["t_written"] - c["t_capture"])[sel & c["sent"]] * 1000.0
+    out["latency_p50_ms"] = pct(lat, 50)
+    out["latency_p95_ms"] = pct(lat, 95)
+    return out
+
+def analyze(path, args):
+    c, limits, n_sessions = load_run(path)
+    if c["t"].size == 0:
+        raise SystemExit(f"{path}: no ticks")
+    active = control_mask(c)
+    seg = segment_ids(c, active)
+
+    thresholds = {"x": (args.move, args.band), "y": (args.move, args.band),
+                  "dist": (args.move_cm, args.band_cm)}
+    responses, steady = {}, active.copy()
+    for axis, field in AXES:
+        move, band = thresholds[axis]
+        r = step_responses(c["t"], c[field].astype(np.float64), active, seg, move, band, args.hold)
+        responses[axis] = r
+        steady &= ~response_mask(c["t"].size, r)
+
+    report = {"path": path, "sessions": n_sessions, "total": summarize(c, 0, c["t"].size, active, responses, steady, limits, args)}
+    if args.segments:
+        report["segments"] = []
+        # segment ids only grow, so each one is a contiguous slice
+        bounds = np.searchsorted(seg, np.arange(seg[-1] + 2))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            hi = lo + int(active[lo:hi].sum())      # an inactive tick can only end a stretch
+            if hi == lo or c["t"][hi - 1] - c["t"][lo] < MIN_SEGMENT_SEC:
+                continue
+            m = summarize(c, lo, hi, active, responses, steady, limits, args)
+            m["start_s"] = float(c["t"][lo] - c["t"][0])
+            m["params_version"] = int(c["params_version"][lo])
+            report["segments"].append(m)
+    return report
+
+# ============================================================
+# OUTPUT
+# ============================================================
+
+ROWS = [
+    ("control time (s)", "control_s", "{:.0f}"),
+    ("x moves / settle p50 (s)", ("x_moves", "x_settle_p50_s"), "{} / {:.2f}"),
+    ("x settle p90 (s) / unsettled", ("x_settle_p90_s", "x_unsettled"), "{:.2f} / {}"),
+    ("x overshoot p50 / p90", ("x_overshoot_p50", "x_overshoot_p90"), "{:.0%} / {:.0%}"),
+    ("y moves / settle p50 (s)", ("y_moves", "y_settle_p50_s"), "{} / {:.2f}"),
+    ("y settle p90 (s) / unsettled", ("y_settle_p90_s", "y_unsettled"), "{:.2f} / {}"),
+    ("y overshoot p50 / p90", ("y_overshoot_p50", "y_overshoot_p90"), "{:.0%} / {:.0%}"),
+    ("dist moves / settle p50 (s)", ("dist_moves", "dist_settle_p50_s"), "{} / {:.2f}"),
+    ("dist overshoot p50 / p90", ("dist_overshoot_p50", "dist_overshoot_p90"), "{:.0%} / {:.0%}"),
+    ("dist steady bias (cm)", "dist_ss_bias_cm", "{:+.2f}"),
+    ("dist steady |err| p50/p95", ("dist_ss_abs_p50_cm", "dist_ss_abs_p95_cm"), "{:.2f} / {:.2f}"),
+    ("jitter rms x/y/z (mm)", ("jitter_x_rms_mm", "jitter_y_rms_mm", "jitter_z_rms_mm"), "{:.2f}/{:.2f}/{:.2f}"),
+    ("reversals x/y/z (Hz)", ("reversals_x_hz", "reversals_y_hz", "reversals_z_hz"), "{:.2f}/{:.2f}/{:.2f}"),
+    ("serial sends (Hz) / frac", ("send_hz", "send_frac"), "{:.1f} / {:.0%}"),
+    ("saturated any / x/y/z", ("saturated_any_frac", "saturated_x_frac", "saturated_y_frac", "saturated_z_frac"),
+     "{:.1%} / {:.1%}/{:.1%}/{:.1%}"),
+    ("latency p50 / p95 (ms)", ("latency_p50_ms", "latency_p95_ms"), "{:.1f} / {:.1f}"),
+]
+
+def fmt(metrics, keys, spec):
+    keys = keys if isinstance(keys, tuple) else (keys,)
+    return spec.format(*(metrics[k] for k in keys))
+
+def print_table(titles, columns):
+    cells = [[fmt(m, keys, spec) for m in columns] for _, keys, spec in ROWS]
+    width = max(len(x) for x in titles + [c for row in cells for c in row]) + 2
+    print(f"{'':30s}" + "".join(f"{t:>{width}s}" for t in titles))
+    for (label, _, _), row in zip(ROWS, cells):
+        print(f"{label:30s}" + "".join(f"{c:>{width}s}" for c in row))
+
+def main():
+    parser = argparse.ArgumentParser(description="Control-quality report over TickLog recordings")
+    parser.add_argument("runs", nargs="+", help="run folders, or folders of runs (one report column each)")
+    parser.add_argument("--move", type=float, default=0.15, help="image error (ex/ey) that counts as a head move")
+    parser.add_argument("--band", type=float, default=0.02, help="image error counted as settled")
+    parser.add_argument("--move-cm", type=float, default=8.0)
+    parser.add_argument("--band-cm", type=float, default=1.0)
+    parser.add_argument("--hold", type=float, default=0.3, help="seconds inside the band to count as settled")
+    parser.add_argument("--jitter-eps", type=float, default=0.05, help="mm; smaller command changes are not moves")
+    parser.add_argument("--segments", action="store_true", help="also report each control stretch")
+    parser.add_argument("--json", default=None, help="write the full report here")
+    args = parser.parse_args()
+
+    reports = [analyze(path, args) for path in args.runs]
+    print_table([os.path.basename(os.path.normpath(r["path"])) for r in reports], [r["total"] for r in reports])
+
+    if args.segments:
+        for r in reports:
+            segs = r["segments"]
+            print(f"\n{r['path']}: {len(segs)} segments of {MIN_SEGMENT_SEC:.0f}s or more")
+            for i in range(0, len(segs), 6):
+                part = segs[i:i + 6]
+                print_table([f"@{m['start_s']:.0f}s v{m['params_version']}" for m in part], part)
+                print()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"[REPORT] Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Distance calibration: fit FOV_DEG, DIST_SCALE, DIST_ESTIMATE_OFFSET_CM (and
+optionally the radial terms) from samples taken at tape-measured distances,
+and save them as the camera profile VisionTracker loads at startup.
+
+Model (same as VisionTracker, see radial_gain in roarm/engine.py):
+    dist = DIST_SCALE * f * IPD_REAL_CM / ipd_px * gain + DIST_ESTIMATE_OFFSET_CM
+    gain = sqrt(1 + r^2 / f^2)           (--radial: range along the ray)
+         + DIST_RADIAL_K * (r / (W/2))^2 (--radial: lens falloff off-center)
+    f    = (W/2) / tan(FOV_DEG / 2),  r = face center distance from frame center
+
+Without --radial, FOV and DIST_SCALE cannot be told apart, so FOV_DEG is kept
+and only the scale (and offset) is fitted. With --radial, every FOV on a grid
+is solved at once (batched normal equations) and the best one refined.
+--yaw divides out cos(yaw) from head pose for the fit (the live loop has no
+head pose, so face the camera when tracking).
+
+If the profile already has a lens model (lens_calib.py), record samples with it
+loaded: ipd_px and the face center are then undistorted, and the fit keeps the
+"lens" entry. Re-run the fit after re-calibrating the lens.
+
+Usage:
+    python dist_calib.py record --distance 60 --frames 60 --out samples.csv
+    python dist_calib.py record --distance 90 --frames 60 --out samples.csv
+    python dist_calib.py from-eval eval.npz --distances distances.json --out samples.csv
+    python dist_calib.py fit samples.csv --radial --out camera_profile.json
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from roarm import apply_profile, PROFILES
+from roarm.engine import (
+    FD_XML, LM_XML, FOV_DEG, IPD_REAL_CM, DIST_SCALE, DIST_ESTIMATE_OFFSET_CM, CAMERA_PROFILE, MIRROR_VIEW,
+    params, face_roi, to_blob, LensModel, cv2, ov,
+)
+
+SAMPLE_FIELDS = ["dist_cm", "ipd_px", "cx", "cy", "frame_w", "frame_h", "yaw_deg"]
+YAW_COS_MIN = 0.5                  # same clamp as the head-pose script
+FOV_GRID = (30.0, 170.0, 0.5)      # coarse search, then +-1 step at 0.01 deg
+
+# ============================================================
+# SAMPLES
+# ============================================================
+
+def append_samples(path, rows):
+    new_file = not os.path.exists(path)
+    with open(path, "a", newline="") as f:
+        w = csv.writer(f)
+        if new_file:
+            w.writerow(SAMPLE_FIELDS)
+        w.writerows(rows)
+
+def load_samples(path):
+    with open(path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise SystemExit(f"{path}: no samples")
+    return {k: np.array([float(r[k]) if r[k] not in ("", "nan") else np.nan for r in rows]) for k in SAMPLE_FIELDS}
+
+def record(args):
+    """Live camera: hold still at the tape-measured distance while N face frames are collected."""
+    from batch_eval import HP_XML, HP_OUTPUTS
+    from roarm.engine import init_camera, VisionTracker
+
+    apply_profile(args.profile)
+    # unfiltered IPD and face center per frame
+    params.update({"EMA_IPD": 1.0, "EMA_TARGET_CX": 1.0, "EMA_TARGET_CY": 1.0}, source="dist_calib")
+
+    cap = init_camera()
+    if cap is None:
+        raise SystemExit("camera failed")
+    tracker = VisionTracker(FD_XML, LM_XML, camera_profile="")
+    if args.lens and os.path.exists(args.lens):
+        # only the lens model: the distance terms are what is being fitted
+        with open(args.lens, "r") as f:
+            tracker.lens = LensModel.from_profile(json.load(f))
+    print(f"[CALIB] Lens undistortion {'on' if tracker.lens is not None else 'off'}")
+    hp = None
+    if args.head_pose:
+        hp = ov.Core().compile_model(args.hp, "CPU")
+
+    rows = []
+    print(f"[CALIB] Hold still at {args.distance:.1f} cm, collecting {args.frames} frames (ESC aborts)")
+    t_end = time.time() + args.timeout
+    while len(rows) < args.frames and time.time() < t_end:
+        ok, frame = cap.read()
+        if not ok or frame is None:
+            continue
+        if MIRROR_VIEW:
+            frame = cv2.flip(frame, 1)
+        H, W = frame.shape[:2]
+        f_pixels = (W / 2.0) / math.tan(math.radians(FOV_DEG) / 2.0)
+        meas = tracker.process(frame, f_pixels)
+
+        if meas.face_ok and meas.ipd_px:
+            yaw = math.nan
+            if hp is not None:
+                x0, y0, x1, y1 = face_roi(meas.bbox, W, H)
+                out = hp.create_infer_request().infer({hp.input(0): to_blob(frame[y0:y1, x0:x1], (60, 60))[None]})
+                yaw = float(out[hp.output(HP_OUTPUTS[0])].reshape(-1)[0])
+            rows.append([args.distance, meas.ipd_px, meas.target_cx, meas.target_cy, W, H, yaw])
+
+        cv2.putText(frame, f"CALIB {args.distance:.0f} cm: {len(rows)}/{args.frames}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.imshow("Distance calibration", frame)
+        if cv2.waitKey(1) & 0xFF == 27:
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+    if rows:
+        append_samples(args.out, rows)
+        ipd = np.array([r[1] for r in rows])
+        print(f"[CALIB] {len(rows)} samples at {args.distance:.1f} cm, IPD median {np.median(ipd):.2f} px "
+              f"(std {ipd.std():.2f}) -> {args.out}")
+
+def from_eval(args):
+    """Samples from batch_eval.py output; distances.json maps video file name -> tape distance in cm."""
+    with open(args.distances, "r") as f:
+        distances = json.load(f)
+    d = np.load(args.eval_npz)
+    files = [os.path.basename(str(x)) for x in d["files"]]
+
+    rows = []
+    for file_id, name in enumerate(files):
+        if name not in distances:
+            continue
+        m = (d["file_id"] == file_id) & d["face_ok"] & np.isfinite(d["ipd_px"])
+        cx = d["cx"][m].astype(np.float64)
+        cy = d["cy"][m].astype(np.float64)
+        w = np.full(cx.size, d["frame_size"][file_id][0])
+        h = np.full(cx.size, d["frame_size"][file_id][1])
+        rows += np.column_stack([np.full(cx.size, float(distances[name])), d["ipd_px"][m], cx, cy, w, h,
+                                 d["yaw"][m]]).tolist()
+    if not rows:
+        raise SystemExit("no face frames in videos listed in the distances file")
+    append_samples(args.out, rows)
+    print(f"[CALIB] {len(rows)} samples from {args.eval_npz} -> {args.out}")
+
+# ============================================================
+# FIT
+# ============================================================
+
+def design(s, fov_deg, radial, offset, use_yaw):
+    """
+    Design matrices for every FOV candidate at once: shape (G, n, m), columns
+    [scale term, radial-K term, offset]. Coefficients come out as
+    DIST_SCALE, DIST_SCALE * DIST_RADIAL_K, DIST_ESTIMATE_OFFSET_CM.
+    """
+    fov = np.atleast_1d(np.asarray(fov_deg, dtype=np.float64))[:, None]
+    W, H = s["frame_w"], s["frame_h"]
+    f = (W / 2.0) / np.tan(np.radians(fov) / 2.0)                     # (G, n)
+
+    u = 1.0 / s["ipd_px"]
+    if use_yaw:
+        yaw = np.nan_to_num(s["yaw_deg"], nan=0.0)
+        u = u * np.maximum(np.cos(np.radians(yaw)), YAW_COS_MIN)
+    base = IPD_REAL_CM * f * u                                         # pinhole distance at scale 1
+
+    dx = s["cx"] - 0.5 * W
+    dy = s["cy"] - 0.5 * H
+    r2 = dx * dx + dy * dy
+    cols = [base * np.sqrt(1.0 + r2 / (f * f)) if radial else base]
+    if radial:
+        cols.append(base * (r2 / (0.25 * W * W)))
+    if offset:
+        cols.append(np.ones_like(base))
+    return np.stack(cols, axis=-1)
+
+def solve(A, d):
+    """Batched least squares via normal equations; returns coef (G, m), rmse (G,) and residuals (G, n)."""
+    AtA = np.einsum("gnm,gnk->gmk", A, A)
+    Atd = np.einsum("gnm,n->gm", A, d)
+    coef = np.linalg.solve(AtA, Atd[..., None])[..., 0]
+    resid = d - np.einsum("gnm,gm->gn", A, coef)
+    return coef, np.sqrt(np.mean(resid * resid, axis=1)), resid
+
+def fit(args):
+    s = load_samples(args.samples)
+    ok = np.isfinite(s["ipd_px"]) & (s["ipd_px"] > 1.0) & np.isfinite(s["dist_cm"])
+    s = {k: v[ok] for k, v in s.items()}
+    d = s["dist_cm"]
+    n_dist = np.unique(d).size
+    if n_dist < 2:
+        raise SystemExit("need samples at two or more distances")
+
+    if args.radial:
+        lo, hi, step = FOV_GRID
+        grid = np.arange(lo, hi + step / 2, step)
+        coef, rmse, _ = solve(design(s, grid, True, args.offset, args.yaw), d)
+        best = int(np.argmin(rmse))
+        flat = (rmse.max() - rmse[best]) < 0.01 * rmse[best]
+        fine = np.arange(grid[best] - step, grid[best] + step + 1e-9, 0.01)
+        fine = fine[(fine > 1.0) & (fine < 179.0)]
+        coef, rmse, resid = solve(design(s, fine, True, args.offset, args.yaw), d)
+        best = int(np.argmin(rmse))
+        fov, coef, rmse, resid = float(fine[best]), coef[best], float(rmse[best]), resid[best]
+        if flat:
+            print("[CALIB] Warning: FOV is poorly constrained; add samples near the frame edges")
+    else:
+        fov = FOV_DEG
+        coef, rmse, resid = solve(design(s, fov, False, args.offset, args.yaw), d)
+        coef, rmse, resid = coef[0], float(rmse[0]), resid[0]
+
+    scale = float(coef[0])
+    radial_k = float(coef[1] / coef[0]) if args.radial else 0.0
+    offset = float(coef[-1]) if args.offset else 0.0
+
+    print(f"[CALIB] {d.size} samples at {n_dist} distances")
+    print(f"[CALIB] Before: FOV {FOV_DEG:.2f}  scale {DIST_SCALE:.4f}  offset {DIST_ESTIMATE_OFFSET_CM:.2f} cm")
+    print(f"[CALIB] Fitted: FOV {fov:.2f}  scale {scale:.4f}  offset {offset:.2f} cm  radial K {radial_k:.4f}")
+    print(f"[CALIB] Residual rmse {rmse:.2f} cm, max {np.abs(resid).max():.2f} cm")
+    print(f"{'dist cm':>8} {'n':>5} {'median err':>11} {'p95 |err|':>10}")
+    for dist in np.unique(d):
+        r = resid[d == dist]
+        print(f"{dist:8.1f} {r.size:5d} {np.median(r):11.2f} {np.percentile(np.abs(r), 95):10.2f}")
+
+    profile = {
+        "camera": args.camera,
+        "FOV_DEG": round(fov, 3),
+        "DIST_SCALE": round(scale, 6),
+        "DIST_ESTIMATE_OFFSET_CM": round(offset, 3),
+        "DIST_RADIAL_K": round(radial_k, 6),
+        "DIST_RADIAL_GEOMETRY": bool(args.radial),
+        "fit": {
+            "samples": int(d.size), "distances": int(n_dist), "rmse_cm": round(rmse, 3),
+            "max_abs_cm": round(float(np.abs(resid).max()), 3), "yaw_corrected": bool(args.yaw),
+            "frame_size": [int(np.median(s["frame_w"])), int(np.median(s["frame_h"]))],
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    }
+    params.validate({k: profile[k] for k in ("FOV_DEG", "DIST_SCALE", "DIST_ESTIMATE_OFFSET_CM", "DIST_RADIAL_K")})
+    if os.path.exists(args.out):
+        with open(args.out, "r") as f:
+            lens = json.load(f).get("lens")
+        if lens:
+            profile["lens"] = lens      # from lens_calib.py; the samples were undistorted with it
+    with open(args.out, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"[CALIB] Wrote {args.out}")
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the distance model to tape-measured samples")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("record", help="collect samples from the live camera")
+    p.add_argument("--distance", type=float, required=True, help="tape-measured camera-to-eyes distance, cm")
+    p.add_argument("--frames", type=int, default=60)
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--profile", choices=sorted(PROFILES), default="rdk_x5")
+    p.add_argument("--head-pose", action="store_true", help="also record yaw (for --yaw)")
+    p.add_argument("--hp", default=None)
+    p.add_argument("--lens", default=CAMERA_PROFILE, help="profile with the lens_calib.py model ('' = none)")
+    p.add_argument("--out", default="dist_samples.csv")
+
+    p = sub.add_parser("from-eval", help="collect samples from batch_eval.py output")
+    p.add_argument("eval_npz")
+    p.add_argument("--distances", required=True, help='JSON {"video.mp4": distance_cm, ...}')
+    p.add_argument("--out", default="dist_samples.csv")
+
+    p = sub.add_parser("fit", help="fit and write the camera profile")
+    p.add_argument("samples")
+    p.add_argument("--radial", action="store_true", help="fit FOV and the off-center terms too")
+    p.add_argument("--yaw", action="store_true", help="correct IPD by cos(yaw) where recorded")
+    p.add_argument("--offset", action=argparse.BooleanOptionalAction, default=True)
+    p.add_argument("--camera", default="default")
+    p.add_argument("--out", default=CAMERA_PROFILE)
+
+    args = parser.parse_args()
+    if args.cmd == "record":
+        if args.head_pose and args.hp is None:
+            from batch_eval import HP_XML
+            args.hp = HP_XML
+        record(args)
+    elif args.cmd == "from-eval":
+        from_eval(args)
+    else:
+        fit(args)
+
+if __name__ == "__main__":
+    main()
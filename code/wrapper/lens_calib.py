@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lens calibration for the wide-angle camera: fits the OpenCV fisheye model
+(K, D = k1..k4) from checkerboard views and stores it as the "lens" entry of
+the camera profile, next to the dist_calib.py distance terms.
+
+VisionTracker then undistorts only the bbox corners, landmarks and aim point
+through a lookup table (LensModel in roarm/engine.py); PREVIEW_UNDISTORT=True
+additionally remaps the preview window.
+
+Views are raw camera frames (not mirrored); the tracker mirrors K itself.
+Move the board over the whole frame, corners included, at several tilts.
+
+Usage:
+    python lens_calib.py capture --board 9x6 --views 25 --save-dir lens_views/
+    python lens_calib.py images lens_views/ --board 9x6
+    python lens_calib.py images lens_views/ --board 9x6 --out camera_profile.json
+
+After a new lens fit, re-record and re-fit the distance model (dist_calib.py):
+IPD and face position change once they are undistorted.
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from roarm import apply_profile, PROFILES
+from roarm.engine import CAMERA_PROFILE, cv2
+
+SUBPIX_CRITERIA = (3, 30, 0.01)          # cv2.TERM_CRITERIA_EPS + MAX_ITER
+FISHEYE_CRITERIA = (3, 100, 1e-6)
+MIN_VIEWS = 8
+
+def parse_board(text):
+    cols, _, rows = text.lower().partition("x")
+    return int(cols), int(rows)
+
+def find_corners(gray, board):
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK
+    found, corners = cv2.findChessboardCorners(gray, board, flags)
+    if not found:
+        return None
+    return cv2.cornerSubPix(gray, corners, (3, 3), (-1, -1), SUBPIX_CRITERIA)
+
+def capture(args):
+    """Live camera: grabs a view whenever the board is found and has moved since the last one."""
+    from roarm.engine import init_camera
+
+    apply_profile(args.profile)
+    cap = init_camera()
+    if cap is None:
+        raise SystemExit("camera failed")
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+
+    views, size = [], None
+    last = None
+    print(f"[LENS] Move the {args.board[0]}x{args.board[1]} board around the frame, ESC to stop early")
+    while len(views) < args.views:
+        ok, frame = cap.read()
+        if not ok or frame is None:
+            continue
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        size = gray.shape[::-1]
+        corners = find_corners(gray, args.board)
+        shown = frame.copy()
+        if corners is not None:
+            cv2.drawChessboardCorners(shown, args.board, corners, True)
+            center = corners.reshape(-1, 2).mean(axis=0)
+            if last is None or np.hypot(*(center - last)) > args.min_move * size[0]:
+                last = center
+                views.append(corners)
+                if args.save_dir:
+                    cv2.imwrite(os.path.join(args.save_dir, f"view_{len(views):03d}.png"), frame)
+                print(f"[LENS] View {len(views)}/{args.views}")
+        cv2.putText(shown, f"views {len(views)}/{args.views}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                    (0, 255, 0), 2)
+        cv2.imshow("lens_calib", shown)
+        if (cv2.waitKey(1) & 0xFF) == 27:
+            break
+    cap.release()
+    cv2.destroyAllWindows()
+    return views, size
+
+def from_images(args):
+    paths = sorted(p for ext in ("png", "jpg", "jpeg", "bmp") for p in glob.glob(os.path.join(args.folder, f"*.{ext}")))
+    views, size = [], None
+    for path in paths:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        if size is not None and gray.shape[::-1] != size:
+            print(f"[LENS] {path}: size {gray.shape[::-1]} differs from {size}, skipped")
+            continue
+        size = gray.shape[::-1]
+        corners = find_corners(gray, args.board)
+        if corners is None:
+            print(f"[LENS] {path}: board not found")
+            continue
+        views.append(corners)
+    print(f"[LENS] Board found in {len(views)}/{len(paths)} images")
+    return views, size
+
+def calibrate(views, size, board, square_mm):
+    obj = np.zeros((1, board[0] * board[1], 3), np.float64)
+    obj[0, :, :2] = np.mgrid[0:board[0], 0:board[1]].T.reshape(-1, 2) * square_mm
+    obj_pts = [obj] * len(views)
+    img_pts = [v.reshape(1, -1, 2).astype(np.float64) for v in views]
+
+    flags = cv2.fisheye.CALIB_RECOMPUTE_EXTRINSIC + cv2.fisheye.CALIB_CHECK_COND + cv2.fisheye.CALIB_FIX_SKEW
+    K = np.zeros((3, 3))
+    D = np.zeros((4, 1))
+    while True:
+        try:
+            rms, K, D, _, _ = cv2.fisheye.calibrate(obj_pts, img_pts, size, K, D, flags=flags,
+                                                    criteria=FISHEYE_CRITERIA)
+            return rms, K, D, len(obj_pts)
+        except cv2.error as e:
+            # CALIB_CHECK_COND names the ill-conditioned view ("... array 7 ..."); drop it and retry
+            bad = [int(w) for w in str(e).split() if w.isdigit()]
+            if not bad or bad[-1] >= len(obj_pts) or len(obj_pts) <= MIN_VIEWS:
+                raise
+            print(f"[LENS] Dropping ill-conditioned view {bad[-1]}")
+            del obj_pts[bad[-1]], img_pts[bad[-1]]
+
+def write_profile(path, K, D, size, rms, n_views, camera):
+    profile = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            profile = json.load(f)     # keep the distance terms
+    profile.setdefault("camera", camera)
+    profile["lens"] = {
+        "model": "fisheye",
+        "K": np.round(K, 4).tolist(),
+        "D": np.round(D.reshape(-1), 8).tolist(),
+        "size": [int(size[0]), int(size[1])],
+        "rms_px": round(float(rms), 4),
+        "views": int(n_views),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fisheye lens calibration from checkerboard views")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("capture", help="collect views from the live camera")
+    p.add_argument("--views", type=int, default=25)
+    p.add_argument("--min-move", type=float, default=0.08, help="board travel between views, fraction of width")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="rdk_x5")
+    p.add_argument("--save-dir", default=None, help="also save the raw views for re-fitting")
+
+    p = sub.add_parser("images", help="use saved views")
+    p.add_argument("folder")
+
+    for p in sub.choices.values():
+        p.add_argument("--board", type=parse_board, default=(9, 6), help="inner corners, e.g. 9x6")
+        p.add_argument("--square-mm", type=float, default=25.0)
+        p.add_argument("--camera", default="default")
+        p.add_argument("--out", default=CAMERA_PROFILE)
+
+    args = parser.parse_args()
+    views, size = capture(args) if args.cmd == "capture" else from_images(args)
+    if len(views) < MIN_VIEWS:
+        raise SystemExit(f"need at least {MIN_VIEWS} views with the board, got {len(views)}")
+
+    rms, K, D, used = calibrate(views, size, args.board, args.square_mm)
+    hfov = np.degrees(2.0 * (0.5 * size[0]) / K[0, 0])    # equidistant: theta = r / f at the frame edge
+    print(f"[LENS] {used} views, rms {rms:.3f} px, fx {K[0, 0]:.1f} fy {K[1, 1]:.1f} "
+          f"c ({K[0, 2]:.1f}, {K[1, 2]:.1f}), D {np.round(D.reshape(-1), 5).tolist()}")
+    print(f"[LENS] Horizontal FOV ~{hfov:.0f} deg (before distortion terms)")
+    write_profile(args.out, K, D, size, rms, used, args.camera)
+    print(f"[LENS] Wrote lens model to {args.out}; re-run dist_calib.py record/fit with it")
+
+if __name__ == "__main__":
+    main()
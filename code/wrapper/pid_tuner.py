@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Headless PID gain autotuner for the RoArm head follower.
+
+Simulates the whole loop that roarm/engine.py runs on the RDK:
+  user head motion -> camera/vision latency + noise + EMA filters
+  -> PID at SEND_HZ -> step clamps -> arm lag -> back to the camera
+
+Thousands of candidate gain sets are stepped together in one PIDBank and
+split across a process pool. Every candidate sees exactly the same user
+motion and noise (common random numbers) so the comparison is fair.
+
+Usage:
+    python pid_tuner.py --samples 4096 --workers 8 --out tuned_gains.json
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from roarm.engine import (
+    CAM_FPS, CAM_W, CAM_H, FOV_DEG, DIST_SCALE, IPD_REAL_CM,
+    DIST_TARGET_CM, DIST_ESTIMATE_OFFSET_CM, AIM_CENTER_X_NORM, AIM_CENTER_Y_NORM,
+    X0, Y0, Z0, X_MIN, X_MAX, Y_MIN, Y_MAX, Z_MIN, Z_MAX,
+    SEND_HZ, MAX_DT_SEC, DEADBAND_EX, DEADBAND_EY, DEADBAND_ED_CM,
+    EMA_TARGET_CX, EMA_TARGET_CY, EMA_IPD, EMA_DIST,
+    X_SIGN, Y_SIGN, Z_SIGN,
+    PIDBank, RoArmController,
+)
+
+# ============================================================
+# SIMULATION SETTINGS
+# ============================================================
+
+# User motion, same style as the web Code/simulator: the user is dragged
+# around a box, dwells, then moves again at up to ~45 cm/s.
+USER_MOVE_SPEED_MM_S = (150.0, 450.0)
+USER_DWELL_SEC = (1.5, 3.5)
+USER_SWAY_MM = 4.0                 # small breathing / posture sway
+USER_SWAY_HZ = 0.35
+
+# Vision model
+VISION_LATENCY_MS = 90.0           # exposure -> Measurement available
+VISION_CENTER_NOISE_PX = 1.5
+VISION_IPD_NOISE_PX = 0.6
+
+# Arm model: commanded pose is followed with a first-order lag
+ARM_TAU_SEC = 0.15
+
+# Metrics
+SETTLE_BAND_SCALE = 1.5            # settled when |error| <= scale * deadband
+OVERSHOOT_WEIGHT = 2.0             # seconds of settling worth 100% overshoot
+
+# Gain search space: log-uniform around the current hand-tuned gains
+GAIN_SPAN = 4.0
+
+GAIN_NAMES = ["x_kp", "x_ki", "x_kd", "yz_kp", "yz_ki", "yz_kd"]
+
+# ============================================================
+# BASELINE
+# ============================================================
+
+def baseline_gains():
+    """Current gains from RoArmController (Y and Z share one gain set)."""
+    ctrl = RoArmController(ser=None)
+    return np.array([
+        ctrl.pid_x.kp, ctrl.pid_x.ki, ctrl.pid_x.kd,
+        ctrl.pid_y.kp, ctrl.pid_y.ki, ctrl.pid_y.kd,
+    ], dtype=np.float64)
+
+def pid_limits():
+    """(out_min, out_max, i_min, i_max, d_alpha) for x, y, z from RoArmController."""
+    ctrl = RoArmController(ser=None)
+    rows = []
+    for pid in (ctrl.pid_x, ctrl.pid_y, ctrl.pid_z):
+        rows.append((pid.out_min, pid.out_max, pid.i_min, pid.i_max, pid.d_alpha))
+    steps = (ctrl.max_step_x, ctrl.max_step_y, ctrl.max_step_z)
+    return np.array(rows, dtype=np.float64), np.array(steps, dtype=np.float64)
+
+def sample_gains(n, seed):
+    """Candidate 0 is always the baseline so the report can compare against it."""
+    rng = np.random.default_rng(seed)
+    base = baseline_gains()
+    log_span = math.log(GAIN_SPAN)
+    factors = np.exp(rng.uniform(-log_span, log_span, size=(n, base.size)))
+    gains = base[None, :] * factors
+    gains[0] = base
+    return gains
+
+# ============================================================
+# SCENARIOS
+# ============================================================
+
+def make_scenario(seed, duration_sec):
+    """
+    Returns a dict with the user head trajectory (T, 3) in arm coordinates (mm),
+    the move events and the vision noise sequences shared by every candidate.
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1.0 / CAM_FPS
+    n = int(duration_sec * CAM_FPS)
+
+    lo = np.array([X_MIN + DIST_TARGET_CM * 10.0, Y_MIN, Z_MIN])
+    hi = np.array([X_MAX + DIST_TARGET_CM * 10.0, Y_MAX, Z_MAX])
+
+    pos = np.array([X0 + DIST_TARGET_CM * 10.0, Y0, Z0])
+    user = np.empty((n, 3))
+    events = []
+
+    k = 0
+    first = True
+    while k < n:
+        dwell = int(rng.uniform(*USER_DWELL_SEC) * CAM_FPS)
+        if first:
+            dwell = int(0.5 * CAM_FPS)
+            first = False
+        end = min(n, k + dwell)
+        user[k:end] = pos
+        k = end
+        if k >= n:
+            break
+
+        target = rng.uniform(lo, hi)
+        speed = rng.uniform(*USER_MOVE_SPEED_MM_S)
+        move_len = max(1, int(np.linalg.norm(target - pos) / speed * CAM_FPS))
+        end = min(n, k + move_len)
+        ramp = np.linspace(0.0, 1.0, move_len + 1)[1:end - k + 1]
+        user[k:end] = pos + ramp[:, None] * (target - pos)
+        events.append((k, end - 1))
+        pos = user[end - 1].copy()
+        k = end
+
+    t = np.arange(n) * dt
+    phase = rng.uniform(0.0, 2.0 * math.pi, size=3)
+    user += USER_SWAY_MM * np.sin(2.0 * math.pi * USER_SWAY_HZ * t[:, None] + phase[None, :])
+
+    # (move_start, move_end, next_move_start)
+    bounds = [e[0] for e in events[1:]] + [n]
+    events = [(s, e, nxt) for (s, e), nxt in zip(events, bounds) if nxt - e > CAM_FPS // 2]
+
+    return {
+        "user": user,
+        "events": events,
+        "noise_cx": rng.normal(0.0, VISION_CENTER_NOISE_PX, size=n),
+        "noise_cy": rng.normal(0.0, VISION_CENTER_NOISE_PX, size=n),
+        "noise_ipd": rng.normal(0.0, VISION_IPD_NOISE_PX, size=n),
+    }
+
+# ============================================================
+# CLOSED-LOOP SIMULATION
+# ============================================================
+
+def ema_vec(prev, new, alpha):
+    return (1.0 - alpha) * prev + alpha * new
+
+def true_errors(user, arm, f_pixels, tan_h, tan_v):
+    """Noise-free measurement-space errors: (dist_cm - target, ex, ey) without deadband."""
+    rel = user[None, :] - arm
+    depth = np.maximum(rel[:, 0], 50.0)
+    dist_cm = depth / 10.0
+    ex = (rel[:, 1] / (depth * tan_h)) - (AIM_CENTER_X_NORM - 0.5) * 2.0
+    ey = -(rel[:, 2] / (depth * tan_v)) + (0.5 - AIM_CENTER_Y_NORM) * 2.0
+    return dist_cm, ex, ey
+
+def simulate(gains, scenario, lim, max_steps, latency_ms, arm_tau):
+    """Returns per-tick true errors, shape (T, N, 3)."""
+    n = gains.shape[0]
+    user = scenario["user"]
+    T = user.shape[0]
+    frame_dt = 1.0 / CAM_FPS
+    delay = max(0, int(round(latency_ms / 1000.0 / frame_dt)))
+    arm_alpha = 1.0 - math.exp(-frame_dt / max(1e-6, arm_tau))
+
+    f_pixels = (CAM_W / 2.0) / math.tan(math.radians(FOV_DEG) / 2.0)
+    tan_h = math.tan(math.radians(FOV_DEG) / 2.0)
+    tan_v = tan_h * CAM_H / CAM_W
+
+    # One bank slot per (axis, candidate); Y and Z share the yz gains
+    bank = PIDBank(
+        kp=gains[:, [0, 3, 3]].T, ki=gains[:, [1, 4, 4]].T, kd=gains[:, [2, 5, 5]].T,
+        out_min=lim[:, 0:1], out_max=lim[:, 1:2], i_min=lim[:, 2:3], i_max=lim[:, 3:4],
+        d_alpha=lim[:, 4:5], shape=(3, n),
+    )
+
+    cmd = np.tile(np.array([X0, Y0, Z0]), (n, 1))
+    arm = cmd.copy()
+    lo = np.array([X_MIN, Y_MIN, Z_MIN])
+    hi = np.array([X_MAX, Y_MAX, Z_MAX])
+    signs = np.array([X_SIGN, Y_SIGN, Z_SIGN])[:, None]
+    max_steps = np.asarray(max_steps)[:, None]
+
+    # Observations waiting to come out of the vision pipeline
+    pending = []
+    cx_s = cy_s = ipd_s = raw_s = dist_s = None
+
+    errors = np.empty((T, n, 3))
+    last_send = 0.0
+
+    for k in range(T):
+        now = k * frame_dt
+        arm += arm_alpha * (cmd - arm)
+
+        dist_cm, ex, ey = true_errors(user[k], arm, f_pixels, tan_h, tan_v)
+        errors[k, :, 0] = dist_cm - DIST_TARGET_CM
+        errors[k, :, 1] = ex
+        errors[k, :, 2] = ey
+
+        # What the camera sees at this instant, in pixels
+        cx_px = CAM_W * 0.5 + (ex + (AIM_CENTER_X_NORM - 0.5) * 2.0) * CAM_W * 0.5
+        cy_px = CAM_H * 0.5 + (ey - (0.5 - AIM_CENTER_Y_NORM) * 2.0) * CAM_H * 0.5
+        ipd_px = DIST_SCALE * f_pixels * IPD_REAL_CM / dist_cm
+        pending.append((
+            cx_px + scenario["noise_cx"][k],
+            cy_px + scenario["noise_cy"][k],
+            np.maximum(ipd_px + scenario["noise_ipd"][k], 1.5),
+        ))
+        if len(pending) <= delay:
+            continue
+        obs_cx, obs_cy, obs_ipd = pending.pop(0)
+
+        # VisionTracker filtering
+        if cx_s is None:
+            cx_s, cy_s, ipd_s = obs_cx, obs_cy, obs_ipd
+            raw_s = DIST_SCALE * f_pixels * IPD_REAL_CM / ipd_s
+            dist_s = raw_s + DIST_ESTIMATE_OFFSET_CM
+        else:
+            cx_s = ema_vec(cx_s, obs_cx, EMA_TARGET_CX)
+            cy_s = ema_vec(cy_s, obs_cy, EMA_TARGET_CY)
+            ipd_s = ema_vec(ipd_s, obs_ipd, EMA_IPD)
+            raw_s = ema_vec(raw_s, DIST_SCALE * f_pixels * IPD_REAL_CM / ipd_s, EMA_DIST)
+            dist_s = ema_vec(dist_s, raw_s + DIST_ESTIMATE_OFFSET_CM, EMA_DIST)
+
+        m_ex = (cx_s - CAM_W * AIM_CENTER_X_NORM) / (CAM_W * 0.5)
+        m_ey = (cy_s - CAM_H * AIM_CENTER_Y_NORM) / (CAM_H * 0.5)
+        m_ex = np.where(np.abs(m_ex) < DEADBAND_EX, 0.0, m_ex)
+        m_ey = np.where(np.abs(m_ey) < DEADBAND_EY, 0.0, m_ey)
+        m_ed = dist_s - DIST_TARGET_CM
+        m_ed = np.where(np.abs(m_ed) < DEADBAND_ED_CM, 0.0, m_ed)
+
+        # Control tick, same gating as main()
+        if now - last_send < (1.0 / SEND_HZ):
+            continue
+        dt = min(max(now - last_send, 1e-3), MAX_DT_SEC)
+        last_send = now
+
+        err = np.stack([np.broadcast_to(m_ed, (n,)), np.broadcast_to(m_ex, (n,)), np.broadcast_to(m_ey, (n,))])
+        meas = np.stack([np.broadcast_to(dist_s, (n,)), err[1], err[2]])
+        v = bank.update(err, meas, dt)
+        step = np.clip(signs * v * dt, -max_steps, max_steps)
+        cmd[:] = np.clip(cmd + step.T, lo, hi)
+
+    return errors
+
+# ============================================================
+# METRICS
+# ============================================================
+
+def settle_and_overshoot(errors, events):
+    """
+    For every user move, settling time is measured from the moment the user
+    stops until the error stays inside the band; overshoot is the largest
+    excursion to the other side, as a fraction of the peak error during the move.
+    Returns mean settle seconds and mean overshoot fraction per candidate.
+    """
+    bands = SETTLE_BAND_SCALE * np.array([DEADBAND_ED_CM, DEADBAND_EX, DEADBAND_EY])
+    n = errors.shape[1]
+    settle_sum = np.zeros(n)
+    over_sum = np.zeros(n)
+    count = np.zeros(n)
+
+    for s, e, nxt in events:
+        during = errors[s:e + 1]
+        idx = np.abs(during).argmax(axis=0)
+        peak = np.take_along_axis(during, idx[None], axis=0)[0]
+        valid = np.abs(peak) > bands
+
+        after = errors[e:nxt]
+        L = after.shape[0]
+        outside = np.abs(after) > bands
+        last_out = L - 1 - outside[::-1].argmax(axis=0)
+        settle_idx = np.where(outside.any(axis=0), last_out + 1, 0)
+        settle_sec = settle_idx / float(CAM_FPS)
+
+        beyond = -np.sign(peak)[None] * after
+        overshoot = np.maximum(0.0, beyond.max(axis=0)) / np.maximum(np.abs(peak), 1e-9)
+
+        settle_sum += np.where(valid, settle_sec, 0.0).sum(axis=1)
+        over_sum += np.where(valid, overshoot, 0.0).sum(axis=1)
+        count += valid.sum(axis=1)
+
+    count = np.maximum(count, 1)
+    return settle_sum / count, over_sum / count
+
+def pareto_front(settle, overshoot):
+    """Indices of candidates not dominated in (settle, overshoot), sorted by settle."""
+    a = settle[:, None]
+    b = overshoot[:, None]
+    dominated = ((settle[None, :] <= a) & (overshoot[None, :] <= b)
+                 & ((settle[None, :] < a) | (overshoot[None, :] < b))).any(axis=1)
+    idx = np.flatnonzero(~dominated)
+    return idx[np.argsort(settle[idx])]
+
+# ============================================================
+# WORKER
+# ============================================================
+
+def evaluate_chunk(args):
+    gains, scenario_seeds, duration, latency_ms, arm_tau = args
+    lim, max_steps = pid_limits()
+    settle = np.zeros(gains.shape[0])
+    over = np.zeros(gains.shape[0])
+    for seed in scenario_seeds:
+        scenario = make_scenario(seed, duration)
+        errors = simulate(gains, scenario, lim, max_steps, latency_ms, arm_tau)
+        s, o = settle_and_overshoot(errors, scenario["events"])
+        settle += s
+        over += o
+    return settle / len(scenario_seeds), over / len(scenario_seeds)
+
+def evaluate(gains, workers, chunk, scenario_seeds, duration, latency_ms, arm_tau):
+    jobs = [(gains[i:i + chunk], scenario_seeds, duration, latency_ms, arm_tau)
+            for i in range(0, gains.shape[0], chunk)]
+
+    if workers <= 1:
+        results = [evaluate_chunk(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_chunk, jobs))
+
+    settle = np.concatenate([r[0] for r in results])
+    over = np.concatenate([r[1] for r in results])
+    return settle, over
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def gains_dict(row):
+    return {name: round(float(v), 4) for name, v in zip(GAIN_NAMES, row)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline PID gain tuner for RoArmController")
+    parser.add_argument("--samples", type=int, default=4096, help="number of gain sets to evaluate")
+    parser.add_argument("--scenarios", type=int, default=6, help="user motion scenarios per gain set")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per scenario")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=256, help="gain sets stepped together per task")
+    parser.add_argument("--latency-ms", type=float, default=VISION_LATENCY_MS)
+    parser.add_argument("--arm-tau", type=float, default=ARM_TAU_SEC)
+    parser.add_argument("--overshoot-weight", type=float, default=OVERSHOOT_WEIGHT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    gains = sample_gains(args.samples, args.seed)
+    scenario_seeds = [args.seed * 1000 + i for i in range(args.scenarios)]
+
+    print(f"[TUNER] {gains.shape[0]} gain sets x {args.scenarios} scenarios x {args.duration:.0f}s "
+          f"on {args.workers} workers")
+    t0 = time.time()
+    settle, over = evaluate(gains, args.workers, args.chunk, scenario_seeds,
+                            args.duration, args.latency_ms, args.arm_tau)
+    elapsed = time.time() - t0
+    sim_sec = gains.shape[0] * args.scenarios * args.duration
+    print(f"[TUNER] Done in {elapsed:.1f}s ({sim_sec / max(elapsed, 1e-9):.0f} simulated s/s)")
+
+    score = settle + args.overshoot_weight * over
+    best = int(np.argmin(score))
+    front = pareto_front(settle, over)
+
+    print(f"[TUNER] Baseline: settle {settle[0]:.2f}s  overshoot {100 * over[0]:.1f}%  {gains_dict(gains[0])}")
+    print(f"[TUNER] Best:     settle {settle[best]:.2f}s  overshoot {100 * over[best]:.1f}%  {gains_dict(gains[best])}")
+    print(f"[TUNER] Pareto front ({front.size} points):")
+    for i in front:
+        print(f"    settle {settle[i]:5.2f}s  overshoot {100 * over[i]:5.1f}%  {gains_dict(gains[i])}")
+
+    if args.out:
+        result = {
+            "baseline": {"gains": gains_dict(gains[0]), "settle_sec": float(settle[0]), "overshoot": float(over[0])},
+            "best": {"gains": gains_dict(gains[best]), "settle_sec": float(settle[best]), "overshoot": float(over[best])},
+            "pareto": [
+                {"gains": gains_dict(gains[i]), "settle_sec": float(settle[i]), "overshoot": float(over[i])}
+                for i in front
+            ],
+            "settings": vars(args),
+        }
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[TUNER] Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
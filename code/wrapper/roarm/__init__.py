@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+"""
+RoArm head-tracking controller.
+
+    from roarm import run
+    run("rdk_x5")                  # or "windows", "headless"
+    run("windows", SERIAL_PORT="COM5")
+
+roarm.engine holds the shared code, roarm.profiles the per-platform settings.
+"""
+
+from .profiles import PROFILES, apply_profile
+
+def run(profile, **overrides):
+    """Applies a platform profile, then runs the tracker until ESC."""
+    engine = apply_profile(profile, **overrides)
+    print(f"[SYSTEM] Profile: {profile}")
+    engine.run()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""
+python -m roarm --profile headless [--set KEY=VALUE ...]
+"""
+
+import argparse
+import ast
+
+from . import PROFILES, run
+
+def parse_override(text):
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass    # plain string, e.g. --set SERIAL_PORT=COM5
+    return key.strip(), value
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m roarm", description="RoArm head-tracking controller")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="rdk_x5")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="KEY=VALUE", help="override an engine setting")
+    args = parser.parse_args()
+    run(args.profile, **dict(args.overrides))
+
+if __name__ == "__main__":
+    main()
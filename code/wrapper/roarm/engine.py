@@ -0,0 +1,4085 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared RoArm head-tracking engine: vision, control, command server, telemetry.
+
+Settings below are the defaults; platform differences (devices, serial port,
+camera) live in roarm/profiles.py and are applied before run(). cv2, openvino
+and serial are only imported the first time they are used, so tools that just
+need the controller or the parser don't pay for them.
+"""
+
+import numpy as np
+import math
+import time
+import json
+import os
+import shutil
+import sys
+import queue
+import signal
+import socket
+import asyncio
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dataclasses import dataclass, replace
+
+from .lazy import LazyModule
+
+cv2 = LazyModule("cv2")
+ov = LazyModule("openvino")
+serial = LazyModule("serial")
+
+# ============================================================
+# USER SETTINGS
+# ============================================================
+
+PROFILE = None                     # set by roarm.profiles.apply_profile
+TEST_MODE = False
+PRINT_DEBUG = False
+PRINT_COMMAND = False
+
+SHOW_PREVIEW = True
+SHOW_DISTANCE_TEXT = True
+PREVIEW_FPS = 15.0                 # window refresh; overlays are drawn on the preview thread, off the control loop
+PREVIEW_SCALE = 1.0                # window size factor (drawing stays full size, black box clips too)
+
+# --- OpenVINO model paths ---
+FD_XML = r"models/face-detection-retail-0004.xml"
+LM_XML = r"models/landmarks-regression-retail-0009.xml"
+
+# Preferred devices (fallback to CPU automatically)
+DEVICE_FD = "NPU"
+DEVICE_LM = "NPU"
+
+# --- Socket Server ---
+SOCKET_HOST = "0.0.0.0"
+SOCKET_PORT = 5000
+SOCKET_BACKLOG = 64
+SOCKET_ACCEPT_TIMEOUT = 1.0
+SOCKET_RECV_TIMEOUT = 2.0
+SOCKET_BUFFER_SIZE = 1024
+TCP_IDLE_TIMEOUT_SEC = 8.0         # if no valid message for too long, close client
+TCP_HEARTBEAT_REPLY = True         # reply to PING with PONG
+PRINT_TCP_RAW = True               # print raw incoming TCP lines
+PRINT_TCP_ACK = True               # print ACK/ERR replies sent back
+
+# --- UDP jog channel (optional) ---
+# Datagrams: "<seq>,<sender_ms>,<CMD>", e.g. "42,123456,LEFT"
+UDP_ENABLE = False
+UDP_PORT = 5001
+UDP_STALE_MS = 200.0               # drop if older than the fastest recent packet by this much
+UDP_OFFSET_WINDOW = 256            # packets used to track the clock offset
+UDP_SEQ_RESET_GAP = 1000           # a jump back this large means the sender restarted
+UDP_REPLY = False                  # send ACK/ERR/PONG datagrams back
+UDP_STATS_LOG_SEC = 10.0
+
+# --- Telemetry push (SUBSCRIBE[:hz] / UNSUBSCRIBE) ---
+TELEMETRY_DEFAULT_HZ = 10.0
+TELEMETRY_MAX_HZ = 30.0
+TELEMETRY_MAX_BUFFER_BYTES = 4096  # per client; above this, frames are dropped
+
+# --- Logging ---
+LOG_RING_SIZE = 5000               # recent records kept in memory for crash / on-demand dumps
+LOG_QUEUE_MAX = 2000               # console backlog; beyond this records are dropped, never waited on
+LOG_DUMP_PATH = "roarm_log_dump.jsonl"
+# records per second per tag that reach the console (all still go to the ring)
+LOG_RATE_LIMITS = {"TCP RX RAW": 20, "TCP RX CMD": 20, "UDP RX CMD": 20, "TCP TX": 20, "UDP TX": 20,
+                   "SOCKET": 50, "SERIAL": 30, "CAMERA": 5, "BLACKBOX DROP": 1, "TICKLOG DROP": 1}
+
+# --- Metrics (Prometheus text format, localhost only) ---
+METRICS_ENABLE = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9100
+METRICS_LATENCY_BUCKETS_MS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+# --- Live tuning (SET key=value over TCP, or edit the file while running) ---
+TUNING_FILE = "roarm_tuning.json"  # {"DEADBAND_EX": 0.12, ...}; applied whenever it changes
+TUNING_POLL_SEC = 0.5
+
+# --- Black box recorder (FREEZE over TCP, or a fault, keeps the last seconds as a clip) ---
+BLACKBOX_ENABLE = False
+BLACKBOX_DIR = "blackbox"          # ring/ holds the rolling segments, clip_*/ the frozen ones
+BLACKBOX_SECONDS = 30.0            # ring length
+BLACKBOX_SEGMENT_SEC = 2.0
+BLACKBOX_POST_SEC = 3.0            # keep recording this long after the trigger
+BLACKBOX_FPS = 15.0                # frames offered to the encoder; the rest are skipped up front
+BLACKBOX_SCALE = 0.5               # resize in the encoder thread
+BLACKBOX_FOURCC = "MJPG"
+BLACKBOX_QUEUE = 8                 # frames waiting for the encoder; when full, frames are dropped
+BLACKBOX_MAX_CLIPS = 20
+BLACKBOX_FAULT_COOLDOWN_SEC = 30.0
+BLACKBOX_FAULT_JUMP_MM = 60.0      # commanded XYZ moving more than this in one tick counts as a fault
+
+# --- Tick log: one fixed-schema binary record per control tick (control_report.py reads it) ---
+TICKLOG_ENABLE = False
+TICKLOG_DIR = "ticklog"            # one folder per run: session.json, params.jsonl, chunk_NNNN.ticks
+TICKLOG_BUFFER_ROWS = 1024         # rows filled in memory before the writer thread gets them
+TICKLOG_FLUSH_SEC = 2.0            # hand over a partial buffer after this long anyway
+TICKLOG_CHUNK_ROWS = 1 << 18       # rows per chunk file (~2.4 h at 30 Hz)
+TICKLOG_MAX_PENDING = 64           # buffers waiting for the writer; beyond this ticks are dropped
+
+# --- Vision process: capture + inference in a child process, results back through shared memory ---
+VISION_PROCESS = False             # False = capture and inference run on the main loop, as before
+VISION_RING_SLOTS = 4              # frame + Measurement slots in the shared-memory ring
+VISION_START_TIMEOUT_SEC = 120.0   # camera open + model compile in the child
+VISION_STALL_SEC = 0.5             # no new result for this long counts as a failed camera read
+VISION_POLL_SEC = 0.0005           # main loop sleep while waiting for the next result
+
+# --- Frame budget governor: sheds optional work when the frame loop runs over budget ---
+GOVERNOR_ENABLE = True
+GOVERNOR_BUDGET_MS = None          # None = one camera frame (1000 / CAM_FPS); camera wait not counted
+GOVERNOR_SHED_AT = 1.0             # shed when the smoothed frame time goes over this fraction of the budget
+GOVERNOR_RESTORE_AT = 0.9          # restore a level once its predicted frame time fits under this fraction
+GOVERNOR_HOLD_SEC = 1.0            # minimum time between level changes
+GOVERNOR_EMA = 0.1                 # smoothing of the frame time and the per-stage costs
+# Levels in shedding order, each (preview_every, landmark_every, detect_every): preview + HUD on
+# every Nth frame, landmarks on every Nth detection (bbox-only distance in between), detection on
+# every Nth frame (the last measurement is held in between). Level 0 must be (1, 1, 1).
+GOVERNOR_LEVELS = (
+    (1, 1, 1),
+    (3, 1, 1),
+    (6, 2, 1),
+    (6, 2, 2),
+    (10, 3, 3),
+)
+
+# --- Scheduling (Linux): pin threads to cores, real-time priority for the control loop ---
+# Roles: "control" = main loop (capture too unless VISION_PROCESS, and the serial writes),
+# "vision" = the vision process, "io" = socket / metrics / log / tuning / black box / tick log threads.
+# cpus: cores the role may run on; fifo: SCHED_FIFO priority 1..99 (needs CAP_SYS_NICE or an
+# rtprio limit); nice: used when fifo is not set or refused (< 0 needs privileges).
+# Whatever the system refuses is logged once and left at the default.
+SCHED_ENABLE = False
+SCHED_PROFILE = {
+    "control": {"cpus": (3,), "fifo": 50, "nice": -10},
+    "vision": {"cpus": (1, 2)},
+    "io": {"cpus": (0,), "nice": 5},
+}
+
+# --- Serial / RoArm ---
+SERIAL_PORT = "/dev/ttyUSB0"
+BAUDRATE = 115200
+
+# --- Camera ---
+CAM_SOURCE = "/dev/v4l/by-path/platform-xhci-hcd.2.auto-usb-0:1.3:1.0-video-index0"
+CAM_BACKEND = "V4L2"               # cv2.CAP_<name>, resolved when the camera is opened
+CAM_W = 640
+CAM_H = 480
+CAM_FPS = 30				
+USE_MJPG = True
+MIRROR_VIEW = True
+
+# ============================================================
+# STARTUP / SAFETY / DEMO BEHAVIOR
+# ============================================================
+
+STARTUP_CAMERA_SETTLE_SEC = 1.0
+STARTUP_SERIAL_SETTLE_SEC = 2.0
+STARTUP_MODEL_WARMUP_RUNS = 3
+STARTUP_DROP_FRAMES = 15
+STARTUP_PARALLEL = True            # camera, models and serial/arm init overlap; False = one after another
+STARTUP_TIMELINE = True            # print the boot timeline + critical path once ready
+SEND_HOME_AFTER_INIT = True
+HOME_ON_EXIT = False
+
+# Safety / robustness
+MAX_DT_SEC = 0.08                  # prevent one slow frame from causing a huge jump
+CAMERA_FAIL_RETRY_SLEEP_SEC = 0.05
+MAX_CAMERA_FAIL_STREAK = 20
+PAUSE_HOLDS_POSITION = True
+RETURN_HOME_ON_LONG_FACE_LOSS = False
+RETURN_HOME_FACE_LOSS_SEC = 4.0
+TRACK_ENABLE_FACE_FRAMES = 3       # need N good frames before auto motion starts
+TRACK_DISABLE_FACE_LOSS_SEC = 0.60
+TRACK_RESET_FILTERS_SEC = 1.20
+
+# Multi-face tracking: every face gets a persistent ID and the arm follows one
+# locked ID. It only switches on TARGET <id> / TARGET NEXT / TARGET AUTO, or
+# when the locked face has been gone for TARGET_LOST_SEC.
+MULTI_FACE_TRACKING = True
+TRACK_IOU_MIN = 0.20               # below this a detection cannot continue a track
+TRACK_CONFIRM_FRAMES = 3           # hits before a new track can be auto-selected
+TRACK_DROP_SEC = 0.50              # unmatched tracks are forgotten after this (the locked one after TARGET_LOST_SEC)
+TARGET_LOST_SEC = 1.50
+TRACK_MAX_FACES = 32
+
+# Reduce command spam / jitter at the arm side
+SERIAL_SEND_ONLY_IF_CHANGED = True
+MIN_SEND_DELTA_MM = 2.0
+MIN_SEND_DELTA_RAD = 0.02
+
+# Photon-to-actuation latency (all timestamps are time.monotonic())
+SHOW_LATENCY_TEXT = True
+LATENCY_STATS_WINDOW = 300         # rolling window of recent sent commands
+LATENCY_LOG_SEC = 5.0
+CAPTURE_LATENCY_MS = 0.0           # exposure -> cap.read() returns; fill in from calibration
+LATENCY_CALIBRATION = False        # flash test at startup, camera must see the flash
+LATENCY_CALIB_SOURCE = "SCREEN"    # "SCREEN" (flash a window) or "LED" (RoArm LED over serial)
+LATENCY_CALIB_TRIALS = 10
+LATENCY_CALIB_THRESHOLD = 40.0     # mean gray-level jump that counts as "flash seen"
+
+# ============================================================
+# TRACKING / CAMERA MODEL / DISTANCE TUNING
+# ============================================================
+
+# Your physical target distance at the design fair
+DIST_TARGET_CM = 35.0
+
+# Keep this offset because of the camera swap / calibration mismatch.
+# Effective distance used by control/display = raw_estimated_distance + DIST_ESTIMATE_OFFSET_CM
+DIST_ESTIMATE_OFFSET_CM = 0.0
+
+# Face model assumptions
+IPD_REAL_CM = 6.3
+FACE_CONF_THRESH = 0.35
+MIN_FACE_AREA_FRAC = 0.015
+
+# Camera model
+FOV_DEG = 145.0                    # spec provided by you
+DIST_SCALE = 2.1	                   # extra multiplier if you want later fine tuning
+
+# Fitted per camera by dist_calib.py; when the file exists it overrides FOV_DEG,
+# DIST_SCALE, DIST_ESTIMATE_OFFSET_CM and the radial terms below.
+CAMERA_PROFILE = "camera_profile.json"
+DIST_RADIAL_GEOMETRY = False       # distance along the ray to the face instead of along the optical axis
+DIST_RADIAL_K = 0.0                # extra gain * (off-center distance / half width)^2, for lens falloff
+
+# Lens distortion, from the "lens" entry lens_calib.py adds to CAMERA_PROFILE.
+# Only the landmarks, bbox corners and aim point are undistorted (lookup table,
+# a few microseconds a frame); the frame itself is left alone.
+LENS_UNDISTORT = True
+PREVIEW_UNDISTORT = False          # also remap the preview window (full frame, costs real CPU)
+LENS_PREVIEW_BALANCE = 0.5         # 0 = crop to valid pixels, 1 = keep the whole fisheye view
+
+# Where you want the user's head center to appear in the frame.
+# Since the camera is below the phone, you'll likely want AIM_CENTER_Y_NORM < 0.50
+# so the system aims the face a bit above geometric center.
+AIM_CENTER_X_NORM = 0.50
+AIM_CENTER_Y_NORM = 0.40
+
+# ============================================================
+# ARM START / LIMITS & MANUAL TUNING
+# ============================================================
+
+X0, Y0, Z0 = 235.0, 0.0, 234.0
+T_NEUTRAL = 3.14
+
+X_MIN, X_MAX = 140.0, 330.0
+Y_MIN, Y_MAX = -150.0, 150.0
+Z_MIN, Z_MAX = 100.0, 320.0
+
+MANUAL_STEP_MM = 10.0
+MANUAL_CMD_TIMEOUT_SEC = 0.65      # jog falls back to STOP after this much silence
+
+# ============================================================
+# CONTROL LOOP & FILTER PARAMS
+# ============================================================
+
+SEND_HZ = 20.0
+DEADBAND_EX = 0.10
+DEADBAND_EY = 0.10
+DEADBAND_ED_CM = 2.0
+
+EMA_TARGET_CX = 0.35
+EMA_TARGET_CY = 0.35
+EMA_IPD = 0.35
+EMA_DIST = 0.30
+
+# PID gains; y and z share one set
+PID_X_KP, PID_X_KI, PID_X_KD = 10.0, 0.30, 2.0
+PID_YZ_KP, PID_YZ_KI, PID_YZ_KD = 280.0, 8.0, 28.0
+
+# Step the x/y/z PIDs as one NumPy PIDBank instead of three PIDAxis calls.
+# Results are identical; the bank is mainly there for offline simulation.
+USE_PID_BANK = False
+
+X_SIGN = 1.0
+Y_SIGN = 1.0
+Z_SIGN = -1.0
+
+CMD_MOVE_INIT = 100
+CMD_XYZT_DIRECT_CTRL = 1041
+CMD_LED_CTRL = 114
+
+# Settings that can change while running (see ParamStore), with allowed range
+TUNABLE_PARAMS = {
+    "PID_X_KP": (0.0, 1000.0), "PID_X_KI": (0.0, 100.0), "PID_X_KD": (0.0, 200.0),
+    "PID_YZ_KP": (0.0, 2000.0), "PID_YZ_KI": (0.0, 200.0), "PID_YZ_KD": (0.0, 500.0),
+    "EMA_TARGET_CX": (0.01, 1.0), "EMA_TARGET_CY": (0.01, 1.0), "EMA_IPD": (0.01, 1.0), "EMA_DIST": (0.01, 1.0),
+    "DEADBAND_EX": (0.0, 0.5), "DEADBAND_EY": (0.0, 0.5), "DEADBAND_ED_CM": (0.0, 30.0),
+    "AIM_CENTER_X_NORM": (0.0, 1.0), "AIM_CENTER_Y_NORM": (0.0, 1.0),
+    "DIST_TARGET_CM": (10.0, 200.0), "DIST_ESTIMATE_OFFSET_CM": (-100.0, 100.0), "DIST_SCALE": (0.05, 20.0),
+    "DIST_RADIAL_K": (-2.0, 2.0),
+    "IPD_REAL_CM": (4.0, 8.0), "FOV_DEG": (10.0, 170.0),
+    "FACE_CONF_THRESH": (0.05, 0.99), "MIN_FACE_AREA_FRAC": (0.0, 0.5),
+    "MANUAL_STEP_MM": (0.0, 50.0), "SEND_HZ": (1.0, 60.0),
+}
+
+# ============================================================
+# GLOBAL SYSTEM STATE
+# ============================================================
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    version: int = 0
+    mode: str = "AUTO"
+    locked: bool = False
+    paused: bool = False
+    gyro_cmd: str = "STOP"
+    last_cmd_time: float = 0.0
+    system_ready: bool = False
+    status_text: str = "BOOTING"
+
+class SystemState:
+    """
+    Control state is published as immutable, versioned StateSnapshot objects.
+    Readers just take `state.snapshot` (one reference load, no lock). Writers
+    build a new snapshot and swap it in; the lock only serializes the
+    check-and-swap between writers.
+
+    The tcp_* / telemetry_* fields are bookkeeping owned by the command
+    server thread and are written only from there.
+    """
+
+    def __init__(self):
+        self.snapshot = StateSnapshot()
+        self.lock = threading.Lock()
+        self.tcp_connected = False
+        self.tcp_client_addr = None
+        self.tcp_client_count = 0
+        self.telemetry_subscribers = 0
+        self.telemetry_frame = None     # latest encoded TEL line, swapped whole by main()
+        self.last_tcp_rx_time = 0.0
+        self.last_udp_rx_time = 0.0
+
+    def update(self, expect_version=None, **changes):
+        """
+        Publishes a new snapshot with `changes` applied and returns it. No-op
+        (same snapshot back) if nothing would change. With expect_version, the
+        write is skipped (returns None) if another writer got there first.
+
+        The new snapshot is built outside the lock; the lock only covers the
+        check-and-swap, and the build is retried if another writer won.
+        """
+        while True:
+            cur = self.snapshot
+            if expect_version is not None and cur.version != expect_version:
+                return None
+            if all(getattr(cur, k) == v for k, v in changes.items()):
+                return cur
+            new = replace(cur, version=cur.version + 1, **changes)
+            with self.lock:
+                if self.snapshot is cur:
+                    self.snapshot = new
+                    return new
+
+    def toggle_paused(self):
+        while True:
+            cur = self.snapshot
+            new = replace(cur, version=cur.version + 1, paused=not cur.paused)
+            with self.lock:
+                if self.snapshot is cur:
+                    self.snapshot = new
+                    return new
+
+state = SystemState()
+
+# ============================================================
+# METRICS
+# ============================================================
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class PipelineMetrics:
+    """
+    Plain counters bumped from the hot path (one integer add each) and
+    rendered as Prometheus text only when the endpoint is scraped. Each
+    counter has a single writer thread, so no locking is needed.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.detector_calls = 0
+        self.landmark_calls = 0
+        self.face_lost_events = 0
+        self.target_switches = 0
+        self.blackbox_frames = 0        # written by the encoder thread
+        self.blackbox_dropped = 0
+        self.blackbox_clips = 0
+        self.camera_failures = 0
+        self.vision_skipped = 0         # VISION_PROCESS results overwritten before the main loop read them
+        self.governor_level = {"main": 0, "vision": 0}      # FrameGovernor level per frame loop
+        self.governor_changes = {"main": 0, "vision": 0}
+        self.serial_bytes = 0
+        self.serial_commands = 0
+        self.tcp_clients_total = 0
+        self.commands_by_type = {}
+        self.latency_ms = {}             # stage -> Histogram, built on the first sample (buckets read then)
+
+    def observe_latency(self, stage, ms):
+        hist = self.latency_ms.get(stage)
+        if hist is None:
+            hist = self.latency_ms[stage] = Histogram(METRICS_LATENCY_BUCKETS_MS)
+        hist.observe(ms)
+
+    def count_command(self, cmd, transport="tcp"):
+        if cmd.startswith("SUBSCRIBE"):
+            cmd = "SUBSCRIBE"
+        elif cmd.startswith(("SET ", "SET:", "GET")):
+            cmd = cmd[:3]
+        elif cmd.startswith("TARGET"):
+            cmd = "TARGET"
+        elif cmd not in VALID_COMMANDS:
+            cmd = "UNKNOWN"
+        key = (transport, cmd)
+        self.commands_by_type[key] = self.commands_by_type.get(key, 0) + 1
+
+    def render(self):
+        out = []
+
+        def metric(name, kind, help_text, samples):
+            out.append(f"# HELP roarm_{name} {help_text}")
+            out.append(f"# TYPE roarm_{name} {kind}")
+            for labels, value in samples:
+                out.append(f"roarm_{name}{labels} {value}")
+
+        metric("frames_total", "counter", "Camera frames processed", [("", self.frames)])
+        metric("detector_calls_total", "counter", "Face detection inferences", [("", self.detector_calls)])
+        metric("landmark_calls_total", "counter", "Landmark inferences", [("", self.landmark_calls)])
+        metric("face_lost_total", "counter", "Face present -> missing transitions", [("", self.face_lost_events)])
+        metric("target_switches_total", "counter", "Followed face changed to another track ID",
+               [("", self.target_switches)])
+        metric("blackbox_frames_total", "counter", "Frames encoded by the black box recorder",
+               [("", self.blackbox_frames)])
+        metric("blackbox_dropped_total", "counter", "Frames dropped because the black box encoder was behind",
+               [("", self.blackbox_dropped)])
+        metric("blackbox_clips_total", "counter", "Black box clips frozen", [("", self.blackbox_clips)])
+        metric("camera_failures_total", "counter", "Failed camera reads", [("", self.camera_failures)])
+        metric("vision_skipped_total", "counter", "Vision process results the main loop never read",
+               [("", self.vision_skipped)])
+        metric("governor_level", "gauge", "Frame budget governor degradation level (0 = nothing shed)",
+               [(f'{{loop="{k}"}}', v) for k, v in self.governor_level.items()])
+        metric("governor_changes_total", "counter", "Frame budget governor level changes",
+               [(f'{{loop="{k}"}}', v) for k, v in self.governor_changes.items()])
+        metric("serial_bytes_total", "counter", "Bytes written to the RoArm serial port", [("", self.serial_bytes)])
+        metric("serial_commands_total", "counter", "JSON commands written to the RoArm", [("", self.serial_commands)])
+        metric("tcp_clients", "gauge", "Connected TCP clients", [("", state.tcp_client_count)])
+        metric("tcp_connections_total", "counter", "TCP clients accepted", [("", self.tcp_clients_total)])
+        metric("commands_total", "counter", "Remote commands received, by type",
+               [(f'{{transport="{t}",cmd="{k}"}}', v) for (t, k), v in sorted(self.commands_by_type.items())])
+
+        out.append("# HELP roarm_latency_ms Photon-to-actuation latency per stage (ms)")
+        out.append("# TYPE roarm_latency_ms histogram")
+        for stage in ("infer", "decide", "write", "total"):
+            hist = self.latency_ms.get(stage) or Histogram(METRICS_LATENCY_BUCKETS_MS)
+            counts = list(hist.counts)
+            cumulative = 0
+            for bound, n in zip(hist.buckets, counts):
+                cumulative += n
+                out.append(f'roarm_latency_ms_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            out.append(f'roarm_latency_ms_bucket{{stage="{stage}",le="+Inf"}} {sum(counts)}')
+            out.append(f'roarm_latency_ms_sum{{stage="{stage}"}} {hist.sum:.3f}')
+            out.append(f'roarm_latency_ms_count{{stage="{stage}"}} {hist.count}')
+
+        return "\n".join(out) + "\n"
+
+metrics = PipelineMetrics()
+
+# ============================================================
+# LOGGING
+# ============================================================
+
+class StructuredLogger:
+    """
+    Cheap, non-blocking logging for the control loop and the command server.
+
+    log.info(tag, msg, **fields) timestamps the record, appends it to an
+    in-memory ring (last LOG_RING_SIZE records) and hands it to a background
+    writer thread for the console. The producer never waits on the console:
+    records over a tag's LOG_RATE_LIMITS budget or beyond LOG_QUEUE_MAX are
+    dropped from the console (they stay in the ring) and counted.
+    """
+
+    def __init__(self, ring_size=None, queue_max=None, rate_limits=None):
+        # None = follow LOG_RING_SIZE / LOG_QUEUE_MAX / LOG_RATE_LIMITS, read per record so profiles and
+        # --set overrides applied after import still take effect
+        self.ring_size = ring_size
+        self.ring = deque(maxlen=LOG_RING_SIZE if ring_size is None else ring_size)
+        self.queue = queue.SimpleQueue()
+        self.queue_max = queue_max
+        self.rate_limits = None if rate_limits is None else dict(rate_limits)
+        self.buckets = {}
+        self.dropped_full = 0
+        self.dropped_rate = 0
+        self._reported_drops = 0
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+    def info(self, tag, msg, **fields):
+        self.log("INFO", tag, msg, fields)
+
+    def warn(self, tag, msg, **fields):
+        self.log("WARN", tag, msg, fields)
+
+    def error(self, tag, msg, **fields):
+        self.log("ERROR", tag, msg, fields)
+
+    def log(self, level, tag, msg, fields=None):
+        rec = (time.time(), level, tag, msg, fields or None)
+        ring_size = LOG_RING_SIZE if self.ring_size is None else self.ring_size
+        if self.ring.maxlen != ring_size:
+            self.ring = deque(self.ring, maxlen=ring_size)
+        self.ring.append(rec)
+
+        if level == "INFO" and not self._take_token(tag, rec[0]):
+            self.dropped_rate += 1
+            return
+        if self.queue.qsize() >= (LOG_QUEUE_MAX if self.queue_max is None else self.queue_max):
+            self.dropped_full += 1
+            return
+        if self._writer is None:
+            self._start_writer()
+        self.queue.put(rec)
+
+    def _take_token(self, tag, now):
+        rate = (LOG_RATE_LIMITS if self.rate_limits is None else self.rate_limits).get(tag)
+        if rate is None:
+            return True
+        bucket = self.buckets.get(tag)
+        if bucket is None:
+            bucket = self.buckets[tag] = [float(rate), now]
+        tokens = min(float(rate), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens < 1.0:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1.0
+        return True
+
+    def _start_writer(self):
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+                self._writer.start()
+
+    @staticmethod
+    def format(rec):
+        _, level, tag, msg, fields = rec
+        line = f"[{tag}] {msg}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if level != "INFO":
+            line = f"{level} {line}"
+        return line
+
+    def _write_loop(self):
+        sched_thread("io")
+        while True:
+            rec = self.queue.get()    # sleeps until a record arrives
+            lines = [self.format(rec)]
+            try:
+                while True:
+                    lines.append(self.format(self.queue.get_nowait()))
+            except queue.Empty:
+                pass
+
+            drops = self.dropped_full + self.dropped_rate
+            if drops != self._reported_drops:
+                lines.append(f"[LOG] {drops - self._reported_drops} records kept off the console "
+                             f"(rate limited {self.dropped_rate}, backlog {self.dropped_full} total)")
+                self._reported_drops = drops
+            try:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+            except Exception:
+                pass
+
+    def dump(self, path=None):
+        """Writes the ring buffer as JSON lines (oldest first) to path or LOG_DUMP_PATH. Returns the record count."""
+        path = LOG_DUMP_PATH if path is None else path
+        records = list(self.ring)
+        with open(path, "w") as f:
+            for t, level, tag, msg, fields in records:
+                row = {"t": round(t, 6), "level": level, "tag": tag, "msg": msg}
+                if fields:
+                    row.update({k: v if isinstance(v, (int, float, str, bool, type(None))) else repr(v)
+                                for k, v in fields.items()})
+                f.write(json.dumps(row) + "\n")
+        print(f"[LOG] Dumped {len(records)} records to {path}")
+        return len(records)
+
+log = StructuredLogger()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass  # no console line per scrape
+
+def start_metrics_server(host=None, port=None):
+    """Serves /metrics from its own daemon thread; rendering never runs on the control loop."""
+    host = METRICS_HOST if host is None else host
+    port = METRICS_PORT if port is None else port
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        log.warn("METRICS", f"Could not bind {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+
+    def serve():
+        sched_thread("io")       # request threads inherit it
+        server.serve_forever()
+
+    threading.Thread(target=serve, name="metrics", daemon=True).start()
+    print(f"[METRICS] Serving http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+# ============================================================
+# LIVE TUNING
+# ============================================================
+
+@dataclass(frozen=True)
+class TuningParams:
+    """One field per TUNABLE_PARAMS entry, lower-cased (DEADBAND_EX -> deadband_ex)."""
+    version: int
+    pid_x_kp: float
+    pid_x_ki: float
+    pid_x_kd: float
+    pid_yz_kp: float
+    pid_yz_ki: float
+    pid_yz_kd: float
+    ema_target_cx: float
+    ema_target_cy: float
+    ema_ipd: float
+    ema_dist: float
+    deadband_ex: float
+    deadband_ey: float
+    deadband_ed_cm: float
+    aim_center_x_norm: float
+    aim_center_y_norm: float
+    dist_target_cm: float
+    dist_estimate_offset_cm: float
+    dist_scale: float
+    dist_radial_k: float
+    ipd_real_cm: float
+    fov_deg: float
+    face_conf_thresh: float
+    min_face_area_frac: float
+    manual_step_mm: float
+    send_hz: float
+
+    @classmethod
+    def from_settings(cls, version=0):
+        g = globals()
+        return cls(version=version, **{name.lower(): float(g[name]) for name in TUNABLE_PARAMS})
+
+class ParamStore:
+    """
+    Tuning values the loop reads while running, published like SystemState:
+    `params.snapshot` is an immutable TuningParams, so the hot path takes one
+    reference per frame and every field read after that is a plain attribute.
+
+    update() validates the whole batch first (name, number, TUNABLE_PARAMS
+    range) and then swaps in one new snapshot, so a frame never sees half of a
+    change. Updates come from the TCP SET command and from TUNING_FILE, which
+    watch_file() polls for changes.
+    """
+
+    def __init__(self):
+        self.snapshot = TuningParams.from_settings()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Back to the module settings (e.g. after a profile changed them)."""
+        with self.lock:
+            self.snapshot = TuningParams.from_settings(self.snapshot.version + 1)
+        return self.snapshot
+
+    @staticmethod
+    def validate(changes):
+        """Returns {field: float} or raises ValueError naming the first bad entry."""
+        out = {}
+        for name, value in changes.items():
+            key = str(name).strip().upper()
+            if key not in TUNABLE_PARAMS:
+                raise ValueError(f"unknown parameter {key}")
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key}={value!r} is not a number") from None
+            lo, hi = TUNABLE_PARAMS[key]
+            if not lo <= value <= hi:
+                raise ValueError(f"{key}={value:g} outside [{lo:g}, {hi:g}]")
+            out[key.lower()] = value
+        return out
+
+    def update(self, changes, source="API"):
+        fields = self.validate(changes)
+        while True:
+            cur = self.snapshot
+            if all(getattr(cur, k) == v for k, v in fields.items()):
+                return cur
+            new = replace(cur, version=cur.version + 1, **fields)
+            with self.lock:
+                if self.snapshot is cur:
+                    self.snapshot = new
+                    break
+        log.info("TUNING", f"{source}: " + " ".join(f"{k.upper()}={v:g}" for k, v in fields.items()),
+                 version=new.version)
+        return new
+
+    def get(self, name):
+        key = name.strip().upper()
+        if key not in TUNABLE_PARAMS:
+            raise ValueError(f"unknown parameter {key}")
+        return getattr(self.snapshot, key.lower())
+
+    def as_dict(self, snapshot=None):
+        """TUNABLE_PARAMS -> values of snapshot (default: the current one)."""
+        cur = self.snapshot if snapshot is None else snapshot
+        return {name: getattr(cur, name.lower()) for name in TUNABLE_PARAMS}
+
+    def load_file(self, path):
+        with open(path, "r") as f:
+            changes = json.load(f)
+        if not isinstance(changes, dict):
+            raise ValueError("expected a JSON object of NAME: value")
+        return self.update(changes, source=path)
+
+    def watch_file(self, path=None, poll_sec=None):
+        """Daemon thread applying `path` at start and whenever its mtime changes. A missing file is fine."""
+        path = TUNING_FILE if path is None else path
+        poll_sec = TUNING_POLL_SEC if poll_sec is None else poll_sec
+
+        def loop():
+            sched_thread("io")
+            last_mtime = None
+            while True:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime is not None and mtime != last_mtime:
+                    try:
+                        self.load_file(path)
+                    except (OSError, ValueError) as e:
+                        # keep running on the last good values
+                        log.warn("TUNING", f"{path} not applied: {e}")
+                last_mtime = mtime
+                time.sleep(poll_sec)
+
+        t = threading.Thread(target=loop, name="tuning-watch", daemon=True)
+        t.start()
+        return t
+
+params = ParamStore()
+
+# ============================================================
+# SCHEDULING
+# ============================================================
+
+_sched_reported = set()
+
+def sched_thread(role):
+    """
+    Applies SCHED_PROFILE[role] to the calling thread (on Linux affinity, policy and
+    nice are per thread). Never raises: anything refused or unsupported is logged
+    once per role and left as it was. Returns a description of what is in effect.
+    """
+    if not SCHED_ENABLE:
+        return "default"
+    spec = SCHED_PROFILE.get(role) or {}
+    tid = threading.get_native_id()
+    applied, problems = [], []
+
+    cpus = spec.get("cpus")
+    if cpus and hasattr(os, "sched_setaffinity"):
+        usable = sorted(c for c in cpus if 0 <= c < (os.cpu_count() or 1))
+        try:
+            if not usable:
+                raise OSError(f"no such cores on this machine ({os.cpu_count()} cores)")
+            os.sched_setaffinity(0, usable)
+            applied.append("cpus " + ",".join(map(str, usable)))
+        except OSError as e:
+            problems.append(f"affinity {list(cpus)} not applied: {e}")
+    elif cpus:
+        problems.append("affinity not supported on this platform")
+
+    fifo = spec.get("fifo")
+    nice = spec.get("nice")
+    if hasattr(os, "sched_setscheduler"):
+        try:
+            if fifo:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(fifo))
+                applied.append(f"SCHED_FIFO {fifo}")
+                nice = None
+            elif os.sched_getscheduler(0) != os.SCHED_OTHER:
+                # threads inherit the policy of the thread that started them
+                os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+        except OSError as e:
+            problems.append(f"SCHED_FIFO {fifo} refused ({e}), " +
+                            ("falling back to nice" if nice is not None else "staying SCHED_OTHER"))
+    elif fifo:
+        problems.append("SCHED_FIFO not supported on this platform")
+
+    if nice is not None and hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, nice)
+            applied.append(f"nice {nice}")
+        except OSError as e:
+            problems.append(f"nice {nice} refused: {e}")
+
+    summary = ", ".join(applied) or "default"
+    if role not in _sched_reported:
+        _sched_reported.add(role)
+        for problem in problems:
+            log.warn("SCHED", f"{role}: {problem}")
+        log.info("SCHED", f"{role}: {summary}")
+    return summary
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def clamp(v, lo, hi):
+    return max(lo, min(hi, v))
+
+def apply_deadband(v, db):
+    return 0.0 if abs(v) < db else v
+
+def ema(prev, new, alpha):
+    return new if prev is None else (1.0 - alpha) * prev + alpha * new
+
+def write_json(ser, obj):
+    """Returns the monotonic time the bytes were handed to the port (after flush)."""
+    line = json.dumps(obj, separators=(",", ":"))
+    if ser is None:
+        if PRINT_COMMAND:
+            log.info("SERIAL", f"SIM SEND: {line}")
+        return time.monotonic()
+    data = (line + "\n").encode("utf-8")
+    ser.write(data)
+    ser.flush()
+    metrics.serial_bytes += len(data)
+    metrics.serial_commands += 1
+    t_written = time.monotonic()
+    if PRINT_COMMAND:
+        log.info("SERIAL", f"SEND: {line}")
+    return t_written
+
+def set_status(msg):
+    # called every tick; unchanged status costs one lock-free read
+    if state.snapshot.status_text == msg:
+        return
+    state.update(status_text=msg)
+    log.info("STATUS", msg)
+
+def configure_server_socket(server):
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    # Low-latency small command packets
+    try:
+        server.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception:
+        pass
+
+    server.settimeout(SOCKET_ACCEPT_TIMEOUT)
+
+
+def configure_client_socket(conn):
+    conn.settimeout(SOCKET_RECV_TIMEOUT)
+
+    try:
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception:
+        pass
+
+    # TCP keepalive so dead clients are detected better
+    try:
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    except Exception:
+        pass
+
+    # Linux-specific keepalive tuning (RDK side should support these)
+    try:
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 5)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 2)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+    except Exception:
+        pass
+
+
+def send_tcp_reply(conn, msg: str):
+    if not msg.endswith("\n"):
+        msg += "\n"
+    conn.sendall(msg.encode("utf-8"))
+    if PRINT_TCP_ACK:
+        log.info("TCP TX", msg.strip())
+
+# ============================================================
+# COMMAND SERVER (ASYNCIO, MULTI-CLIENT, ACK + ALWAYS-ALIVE)
+# ============================================================
+
+TCP_IDLE_DISCONNECT_SEC = 8.0
+TCP_RECV_SIZE = 1024
+TCP_MAX_PENDING_BYTES = 256        # unterminated bytes kept per client before discarding
+
+VALID_COMMANDS = {
+    "AUTO", "MANUAL", "LOCK", "UNLOCK", "PAUSE", "RESUME",
+    "RIGHT", "LEFT", "FORWARD", "BACKWARD", "STOP", "UP", "DOWN",
+    "PING", "HEARTBEAT", "KEEPALIVE", "SUBSCRIBE", "UNSUBSCRIBE", "DUMPLOG", "TRACKS", "FREEZE"
+}
+# refused over UDP: they need a connection that stays open (telemetry) or a reply that may not fit a datagram
+UDP_REJECTED = ("SUBSCRIBE", "UNSUBSCRIBE", "TARGET", "TRACKS")
+
+def set_tcp_connection(is_connected, addr=None):
+    # command server thread only, so no lock needed
+    if is_connected:
+        state.tcp_client_count += 1
+        metrics.tcp_clients_total += 1
+        state.tcp_client_addr = addr
+        state.last_tcp_rx_time = time.time()
+    else:
+        state.tcp_client_count = max(0, state.tcp_client_count - 1)
+        if state.tcp_client_count == 0:
+            state.tcp_client_addr = None
+    state.tcp_connected = state.tcp_client_count > 0
+
+def touch_tcp_rx():
+    state.last_tcp_rx_time = time.time()
+
+def touch_udp_rx():
+    state.last_udp_rx_time = time.time()
+
+def send_tcp_reply(conn, msg: str):
+    try:
+        if not msg.endswith("\n"):
+            msg += "\n"
+        conn.sendall(msg.encode("utf-8"))
+        if PRINT_TCP_ACK:
+            log.info("UDP TX" if isinstance(conn, _UdpReplyConn) else "TCP TX", msg.strip())
+    except Exception as e:
+        log.warn("TCP TX", f"Failed to send reply: {e}")
+
+def handle_socket_command(cmd: str, conn=None):
+    cmd = cmd.strip().upper()
+    if not cmd:
+        return False
+
+    if PRINT_TCP_RAW:
+        log.info("TCP RX CMD", repr(cmd))
+
+    touch_tcp_rx()
+    metrics.count_command(cmd)
+    return dispatch_command(cmd, conn)
+
+def handle_udp_command(cmd: str, conn=None):
+    """Entry point for accepted UDP datagrams: its own rx time, log tag and metric label."""
+    cmd = cmd.strip().upper()
+    if not cmd:
+        return False
+
+    if PRINT_TCP_RAW:
+        log.info("UDP RX CMD", repr(cmd))
+
+    touch_udp_rx()
+    metrics.count_command(cmd, transport="udp")
+
+    if cmd.startswith(UDP_REJECTED):
+        if conn is not None:
+            send_tcp_reply(conn, f"ERR:{cmd}:not over UDP")
+        log.info("UDP", f"Rejected command: {cmd}")
+        return False
+    return dispatch_command(cmd, conn)
+
+def dispatch_command(cmd, conn=None):
+    """Executes an upper-cased command for either transport; replies go to conn if given."""
+    if cmd in ["PING", "HEARTBEAT", "KEEPALIVE"]:
+        if TCP_HEARTBEAT_REPLY and conn is not None:
+            send_tcp_reply(conn, "PONG")
+        return True
+
+    if cmd.startswith("SUBSCRIBE") or cmd == "UNSUBSCRIBE":
+        return handle_subscribe_command(cmd, conn)
+
+    if cmd.startswith(("SET ", "SET:")) or cmd == "GET" or cmd.startswith(("GET ", "GET:")):
+        return handle_tuning_command(cmd, conn)
+
+    if cmd.startswith("TARGET") or cmd == "TRACKS":
+        return handle_target_command(cmd, conn)
+
+    if cmd == "FREEZE":
+        ok = blackbox.freeze("TCP FREEZE")
+        if conn is not None:
+            send_tcp_reply(conn, f"ACK:FREEZE:{BLACKBOX_DIR}" if ok else "ERR:FREEZE:recorder off")
+        return ok
+
+    if cmd == "DUMPLOG":
+        # file I/O off the server loop
+        threading.Thread(target=log.dump, name="log-dump", daemon=True).start()
+        if conn is not None:
+            send_tcp_reply(conn, f"ACK:DUMPLOG:{LOG_DUMP_PATH}")
+        return True
+
+    handled = True
+
+    if cmd == "AUTO":
+        state.update(mode="AUTO")
+    elif cmd == "MANUAL":
+        state.update(mode="MANUAL")
+    elif cmd == "LOCK":
+        state.update(locked=True)
+    elif cmd == "UNLOCK":
+        state.update(locked=False)
+    elif cmd == "PAUSE":
+        state.update(paused=True)
+    elif cmd == "RESUME":
+        state.update(paused=False)
+    elif cmd in ["RIGHT", "LEFT", "FORWARD", "BACKWARD", "STOP", "UP", "DOWN"]:
+        state.update(gyro_cmd=cmd, last_cmd_time=time.time())
+    else:
+        handled = False
+
+    if conn is not None:
+        if handled:
+            send_tcp_reply(conn, f"ACK:{cmd}")
+        else:
+            send_tcp_reply(conn, f"ERR:{cmd}")
+
+    if handled:
+        log.info("SOCKET", f"Handled command: {cmd}")
+    else:
+        log.info("SOCKET", f"Unknown command: {cmd}")
+
+    return handled
+
+def handle_tuning_command(cmd, conn):
+    """
+    SET NAME=value [NAME=value ...] (also SET:NAME=value, comma separated is fine)
+    GET            -> PARAMS:{json of all tunables}
+    GET NAME       -> PARAM:NAME=value
+    A SET with any bad entry changes nothing.
+    """
+    verb, arg = cmd[:3], cmd[4:].strip()
+    try:
+        if verb == "GET":
+            if not arg:
+                reply = "PARAMS:" + json.dumps(params.as_dict(), separators=(",", ":"))
+            else:
+                reply = f"PARAM:{arg}={params.get(arg):g}"
+        else:
+            changes = {}
+            for item in arg.replace(",", " ").split():
+                name, sep, value = item.partition("=")
+                if not sep:
+                    raise ValueError(f"expected NAME=value, got {item}")
+                changes[name] = value
+            if not changes:
+                raise ValueError("nothing to set")
+            params.update(changes, source="TCP SET")
+            reply = "ACK:SET:" + " ".join(f"{k.upper()}={params.get(k):g}" for k in changes)
+    except ValueError as e:
+        reply = f"ERR:{verb}:{e}"
+
+    if conn is not None:
+        send_tcp_reply(conn, reply)
+    return not reply.startswith("ERR")
+
+def handle_target_command(cmd, conn):
+    """
+    TARGET <id>    follow that track (IDs as shown in the preview / TRACKS)
+    TARGET NEXT    next face, left to right
+    TARGET AUTO    drop the lock; the best-scoring face is picked again
+    TRACKS         -> TRACKS:{"target": id, "faces": [[id, x0, y0, x1, y1, seen], ...]}
+    """
+    if cmd == "TRACKS":
+        view = faces.view
+        body = {"target": faces.locked_id, "faces": [[i, *box, int(seen)] for i, box, seen, _ in view]}
+        reply = "TRACKS:" + json.dumps(body, separators=(",", ":"))
+    else:
+        arg = cmd[len("TARGET"):].strip(" :=")
+        if arg in ("NEXT", "AUTO"):
+            faces.request(arg)
+            reply = f"ACK:TARGET:{arg}"
+        elif arg.isdigit() and any(i == int(arg) for i, _, _, _ in faces.view):
+            faces.request(int(arg))
+            reply = f"ACK:TARGET:{int(arg)}"
+        else:
+            reply = f"ERR:TARGET:{arg or 'missing id'}"
+
+    if conn is not None:
+        send_tcp_reply(conn, reply)
+    return not reply.startswith("ERR")
+
+def handle_subscribe_command(cmd, conn):
+    """
+    SUBSCRIBE, SUBSCRIBE:<hz> (also 'SUBSCRIBE 5' / 'SUBSCRIBE=5') or UNSUBSCRIBE.
+    A subscriber needs no keepalive: the idle timeout (TCP_IDLE_DISCONNECT_SEC)
+    doesn't apply while it takes its frames; one whose buffer stays full that
+    long (frames dropped) is disconnected like an idle client.
+    """
+    if conn is None or not hasattr(conn, "subscribe"):
+        return False
+
+    if cmd == "UNSUBSCRIBE":
+        conn.subscribe(0.0)
+        send_tcp_reply(conn, "ACK:UNSUBSCRIBE")
+        return True
+
+    arg = cmd[len("SUBSCRIBE"):].lstrip(" :=")
+    try:
+        hz = float(arg) if arg else TELEMETRY_DEFAULT_HZ
+    except ValueError:
+        send_tcp_reply(conn, f"ERR:{cmd}")
+        return False
+    if not (hz > 0.0):
+        send_tcp_reply(conn, f"ERR:{cmd}")
+        return False
+
+    hz = min(hz, TELEMETRY_MAX_HZ)
+    conn.subscribe(hz)
+    send_tcp_reply(conn, f"ACK:SUBSCRIBE:{hz:g}")
+    return True
+
+def publish_telemetry(controller, meas, tracking_enabled, fps, mode, status_text):
+    """
+    Encodes one compact telemetry line for subscribed clients. Called from the
+    control loop; only builds the line when someone is listening, and never
+    waits on a client (each client's pusher picks up the latest frame).
+    """
+    if state.telemetry_subscribers <= 0:
+        return
+
+    def r(v, nd):
+        return None if v is None else round(v, nd)
+
+    frame = {
+        "t": round(time.monotonic(), 3),
+        "x": round(controller.x_cmd, 1),
+        "y": round(controller.y_cmd, 1),
+        "z": round(controller.z_cmd, 1),
+        "d": r(meas.dist_cm, 1),
+        "ex": r(meas.ex, 3),
+        "ey": r(meas.ey, 3),
+        "id": meas.track_id,
+        "nf": meas.n_faces,
+        "trk": 1 if tracking_enabled else 0,
+        "fps": round(fps, 1),
+        "shed": max(metrics.governor_level.values()),
+        "mode": mode,
+        "st": status_text,
+    }
+    line = "TEL:" + json.dumps(frame, separators=(",", ":")) + "\n"
+    # single reference swap; readers never see a half-written frame
+    state.telemetry_frame = line.encode("utf-8")
+
+class CommandStreamParser:
+    """
+    Incremental line parser for one TCP client.
+    Accepts either:
+      - newline-separated commands: 'LOCK\\nUNLOCK\\n'
+      - single raw packets: 'LEFT'
+      - CRLF packets from some clients
+
+    Each byte is scanned once: the pending bytearray only ever holds an
+    unterminated tail, and all complete lines are cut off with one slice
+    delete per feed(). A client that never sends a terminator cannot grow the
+    buffer past TCP_MAX_PENDING_BYTES; the tail is dropped and the parser
+    skips ahead to the next terminator.
+    """
+
+    def __init__(self, max_pending=None):
+        self.pending = bytearray()
+        self.max_pending = TCP_MAX_PENDING_BYTES if max_pending is None else max_pending
+        self.discarding = False
+        self.overflows = 0
+
+    def feed(self, data):
+        """Returns every complete command in data, in order."""
+        cmds = []
+        if b"\r" in data:
+            data = data.replace(b"\r", b"\n")
+        view = memoryview(data)
+
+        if self.discarding:
+            end = data.find(b"\n")
+            if end < 0:
+                return cmds
+            view = view[end + 1:]
+            self.discarding = False
+
+        pending = self.pending
+        scan = len(pending)  # the old tail holds no terminator
+        pending += view
+
+        # only the new bytes can hold a terminator; everything up to the last
+        # one is decoded and split in one pass
+        last = pending.rfind(b"\n", scan)
+        if last >= 0:
+            block = pending[:last].decode("utf-8", errors="ignore")
+            del pending[:last + 1]
+            for line in block.split("\n"):
+                line = line.strip()
+                if line:
+                    cmds.append(line)
+
+        if len(pending) > self.max_pending:
+            pending.clear()
+            self.discarding = True
+            self.overflows += 1
+        elif pending:
+            # if leftover buffer is itself exactly one valid token, process it immediately
+            token = pending.decode("utf-8", errors="ignore").strip().upper()
+            if token in VALID_COMMANDS:
+                cmds.append(token)
+                pending.clear()
+
+        return cmds
+
+class _ClientConn:
+    """
+    One connected client. Lets handle_socket_command reply through an asyncio
+    StreamWriter like a socket, and owns the client's telemetry subscription.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.addr = writer.get_extra_info("peername")
+        self.telemetry_hz = 0.0
+        self.telemetry_task = None
+        self.telemetry_sent = 0
+        self.telemetry_dropped = 0
+        self.telemetry_ok_time = 0.0    # monotonic; last frame written, or none was there to send
+
+    def sendall(self, data):
+        # buffered by the transport; never blocks the event loop
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def subscribe(self, hz):
+        was_subscribed = self.telemetry_task is not None
+        if self.telemetry_task is not None:
+            self.telemetry_task.cancel()
+            self.telemetry_task = None
+
+        self.telemetry_hz = hz
+        if hz > 0.0:
+            self.telemetry_ok_time = time.monotonic()
+            self.telemetry_task = asyncio.get_running_loop().create_task(_push_telemetry(self))
+
+        if was_subscribed != (self.telemetry_task is not None):
+            state.telemetry_subscribers += 1 if self.telemetry_task is not None else -1
+        if was_subscribed and self.telemetry_task is None:
+            log.info("TELEMETRY", f"{self.addr} unsubscribed",
+                     sent=self.telemetry_sent, dropped=self.telemetry_dropped)
+
+    def telemetry_active(self, window):
+        """True while subscribed and taking frames within the last window (+ one period)."""
+        if self.telemetry_task is None:
+            return False
+        return time.monotonic() - self.telemetry_ok_time < window + 1.0 / self.telemetry_hz
+
+async def _push_telemetry(conn):
+    """
+    Sends the newest telemetry frame at the client's rate. A slow client
+    backs up its own transport buffer; once that passes
+    TELEMETRY_MAX_BUFFER_BYTES frames are dropped instead of queued.
+    """
+    loop = asyncio.get_running_loop()
+    period = 1.0 / conn.telemetry_hz
+    next_t = loop.time()
+    transport = conn.writer.transport
+
+    while not conn.writer.is_closing():
+        next_t += period
+        delay = next_t - loop.time()
+        if delay < 0.0:
+            next_t = loop.time()  # fell behind: skip ahead instead of bursting
+            delay = 0.0
+        await asyncio.sleep(delay)
+
+        frame = state.telemetry_frame
+        if frame is None:
+            conn.telemetry_ok_time = time.monotonic()
+            continue
+        if transport.get_write_buffer_size() > TELEMETRY_MAX_BUFFER_BYTES:
+            conn.telemetry_dropped += 1
+            continue
+        conn.writer.write(frame)
+        conn.telemetry_sent += 1
+        conn.telemetry_ok_time = time.monotonic()
+
+def _tune_client_socket(sock):
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 10)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 3)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+        except Exception:
+            pass
+    except Exception:
+        pass
+
+async def _serve_client(reader, writer):
+    addr = writer.get_extra_info("peername")
+    log.info("SOCKET", f"Connected by {addr}")
+    _tune_client_socket(writer.get_extra_info("socket"))
+
+    conn = _ClientConn(writer)
+    set_tcp_connection(True, addr)
+    parser = CommandStreamParser()
+
+    try:
+        # optional greeting so client knows server is ready
+        send_tcp_reply(conn, "ACK:CONNECTED")
+        await writer.drain()
+
+        while True:
+            # sleeps until data arrives; the timeout is the per-client idle limit
+            try:
+                data = await asyncio.wait_for(reader.read(TCP_RECV_SIZE), TCP_IDLE_DISCONNECT_SEC)
+            except asyncio.TimeoutError:
+                if conn.telemetry_active(TCP_IDLE_DISCONNECT_SEC):
+                    continue            # a subscriber that only listens is not idle
+                log.info("SOCKET", f"Client {addr} idle timeout ({TCP_IDLE_DISCONNECT_SEC:.1f}s), disconnecting")
+                break
+
+            if not data:
+                log.info("SOCKET", f"Client {addr} closed connection")
+                break
+
+            if PRINT_TCP_RAW:
+                log.info("TCP RX RAW", repr(data.decode("utf-8", errors="ignore")))
+
+            touch_tcp_rx()
+            overflows = parser.overflows
+            # every complete command from this read, then a single drain for all replies
+            for cmd in parser.feed(data):
+                handle_socket_command(cmd, conn)
+            if parser.overflows != overflows:
+                log.warn("SOCKET", f"Client {addr} sent over {TCP_MAX_PENDING_BYTES} bytes without a newline, discarded")
+            await writer.drain()
+
+    except ConnectionResetError:
+        log.info("SOCKET", f"Connection reset by {addr}")
+    except Exception as e:
+        log.warn("SOCKET", f"Client {addr} error: {e}")
+    finally:
+        conn.subscribe(0.0)
+        set_tcp_connection(False)
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+class UdpClientStats:
+    """Sequence / loss / reorder / latency bookkeeping for one UDP sender."""
+
+    def __init__(self):
+        self.last_seq = None
+        self.received = 0
+        self.accepted = 0
+        self.lost = 0
+        self.reordered = 0
+        self.stale = 0
+        self.invalid = 0
+        self.offsets = deque(maxlen=UDP_OFFSET_WINDOW)
+        self.latency_ms = deque(maxlen=UDP_OFFSET_WINDOW)
+
+    def check_seq(self, seq):
+        """Returns True if seq is newer than anything seen (32-bit wraparound safe)."""
+        if self.last_seq is None:
+            self.last_seq = seq
+            return True
+
+        diff = (seq - self.last_seq) & 0xFFFFFFFF
+        if diff == 0 or diff >= 0x80000000:
+            if ((self.last_seq - seq) & 0xFFFFFFFF) > UDP_SEQ_RESET_GAP:
+                # sender restarted its counter
+                self.last_seq = seq
+                self.offsets.clear()
+                return True
+            self.reordered += 1
+            return False
+
+        self.lost += diff - 1
+        self.last_seq = seq
+        return True
+
+    def relative_latency_ms(self, recv_ms, sender_ms):
+        """
+        One-way latency above the fastest recent packet. Sender and RDK clocks
+        are not synced, so the absolute offset is unknown; the windowed
+        minimum stands in for it and also follows slow clock drift.
+        """
+        offset = recv_ms - sender_ms
+        self.offsets.append(offset)
+        rel = offset - min(self.offsets)
+        self.latency_ms.append(rel)
+        return rel
+
+    def summary(self):
+        lat = "--"
+        if self.latency_ms:
+            p50, p95 = np.percentile(np.fromiter(self.latency_ms, dtype=np.float64), [50, 95])
+            lat = f"{p50:.1f}/{p95:.1f} ms"
+        expected = max(1, self.accepted + self.lost)
+        return (f"rx {self.received} ok {self.accepted} lost {self.lost} ({100.0 * self.lost / expected:.1f}%) "
+                f"reordered {self.reordered} stale {self.stale} invalid {self.invalid} latency p50/p95 {lat}")
+
+class _UdpReplyConn:
+    def __init__(self, transport, addr):
+        self.transport = transport
+        self.addr = addr
+
+    def sendall(self, data):
+        self.transport.sendto(data, self.addr)
+
+class UdpCommandProtocol(asyncio.DatagramProtocol):
+    """
+    Sequence-numbered jog commands over UDP. A lost datagram costs one command
+    instead of stalling every later one behind a TCP retransmit. Accepted
+    commands go through handle_udp_command, so semantics match TCP; the
+    commands that need a stream (SUBSCRIBE, TARGET, TRACKS) are refused.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.clients = {}
+        self.last_log = time.monotonic()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        recv_ms = 1000.0 * time.monotonic()
+        stats = self.clients.get(addr)
+        if stats is None:
+            stats = self.clients[addr] = UdpClientStats()
+            log.info("UDP", f"New sender {addr}")
+        stats.received += 1
+
+        parts = data.decode("ascii", errors="ignore").strip().split(",", 2)
+        try:
+            seq = int(parts[0]) & 0xFFFFFFFF
+            sender_ms = float(parts[1])
+            cmd = parts[2].strip().upper()
+        except (ValueError, IndexError):
+            stats.invalid += 1
+            return
+        if cmd not in VALID_COMMANDS:
+            stats.invalid += 1
+            return
+
+        if not stats.check_seq(seq):
+            return
+        if stats.relative_latency_ms(recv_ms, sender_ms) > UDP_STALE_MS:
+            stats.stale += 1
+            return
+
+        stats.accepted += 1
+        conn = _UdpReplyConn(self.transport, addr) if UDP_REPLY else None
+        handle_udp_command(cmd, conn)
+
+        now = time.monotonic()
+        if now - self.last_log >= UDP_STATS_LOG_SEC:
+            self.last_log = now
+            for client_addr, client_stats in self.clients.items():
+                log.info("UDP", f"{client_addr} {client_stats.summary()}")
+
+async def command_server_main(host=None, port=None, ready=None):
+    host = SOCKET_HOST if host is None else host
+    port = SOCKET_PORT if port is None else port
+    server = await asyncio.start_server(_serve_client, host, port,
+                                        reuse_address=True, backlog=SOCKET_BACKLOG)
+    if UDP_ENABLE:
+        await asyncio.get_running_loop().create_datagram_endpoint(
+            UdpCommandProtocol, local_addr=(host, UDP_PORT))
+        print(f"[UDP] Jog channel listening on {host}:{UDP_PORT}")
+    bound = ", ".join(str(sock.getsockname()[:2]) for sock in server.sockets)
+    print(f"[SOCKET] Always-alive server listening on {bound}")
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+def command_server_thread(host=None, port=None, ready=None):
+    """Runs the asyncio command server; every client is served concurrently on one loop."""
+    host = SOCKET_HOST if host is None else host
+    port = SOCKET_PORT if port is None else port
+    sched_thread("io")
+    while True:
+        try:
+            asyncio.run(command_server_main(host, port, ready))
+        except Exception as e:
+            log.error("SOCKET", f"Server fatal error, restarting: {e}")
+            time.sleep(1.0)
+
+# ============================================================
+# DATA TYPES
+# ============================================================
+
+@dataclass
+class Measurement:
+    face_ok: bool = False
+    bbox: tuple = None
+    face_score: float = 0.0
+    track_id: int = None           # MULTI_FACE_TRACKING: followed track
+    n_faces: int = 0               # faces seen this frame
+    target_cx: float = None        # undistorted when a lens model is loaded
+    target_cy: float = None
+    view_cx: float = None          # target in frame pixels, for drawing
+    view_cy: float = None
+    ipd_px: float = None
+    raw_dist_cm: float = None
+    dist_cm: float = None
+    ex: float = None
+    ey: float = None
+    ed_cm: float = None
+    t_capture: float = None        # frame read (monotonic)
+    t_infer_done: float = None     # detection + landmarks finished
+    held: bool = False             # detection shed by the FrameGovernor: a copy of the last real measurement
+
+# ============================================================
+# LATENCY TRACKING
+# ============================================================
+
+class LatencyStats:
+    """
+    Rolling photon-to-actuation latency for commands that came from a frame.
+    Stages: capture -> inference done -> control decision -> bytes written.
+    """
+
+    STAGES = ("infer", "decide", "write", "total")
+
+    def __init__(self, window=None, capture_latency_ms=None):
+        window = LATENCY_STATS_WINDOW if window is None else window
+        capture_latency_ms = CAPTURE_LATENCY_MS if capture_latency_ms is None else capture_latency_ms
+        self.samples = {k: deque(maxlen=window) for k in self.STAGES}
+        self.capture_latency = capture_latency_ms / 1000.0
+        self.last_log = time.monotonic()
+        self.recorded = 0
+        self.hud_cache = (-1, None)      # (recorded, text)
+
+    def record(self, t_capture, t_infer_done, t_decision, t_written):
+        if t_capture is None or t_infer_done is None or t_written is None:
+            return
+        self.samples["infer"].append(t_infer_done - t_capture)
+        self.samples["decide"].append(t_decision - t_infer_done)
+        self.samples["write"].append(t_written - t_decision)
+        # the frame was exposed before cap.read() returned it
+        self.samples["total"].append(t_written - t_capture + self.capture_latency)
+        self.recorded += 1
+        for stage in self.STAGES:
+            metrics.observe_latency(stage, 1000.0 * self.samples[stage][-1])
+
+    def percentiles(self, stage):
+        data = self.samples[stage]
+        if not data:
+            return None
+        arr = np.fromiter(data, dtype=np.float64)
+        p50, p95 = np.percentile(arr, [50, 95])
+        return 1000.0 * p50, 1000.0 * p95, 1000.0 * arr.max()
+
+    def hud_text(self):
+        if self.hud_cache[0] != self.recorded:    # percentiles only after a new sample
+            total = self.percentiles("total")
+            text = "LAT: --" if total is None else f"LAT: {total[0]:.0f} ms (p95 {total[1]:.0f})"
+            self.hud_cache = (self.recorded, text)
+        return self.hud_cache[1]
+
+    def maybe_log(self, now):
+        if now - self.last_log < LATENCY_LOG_SEC:
+            return
+        self.last_log = now
+        total = self.percentiles("total")
+        if total is None:
+            return
+        parts = []
+        for stage in ("infer", "decide", "write"):
+            p50, p95, _ = self.percentiles(stage)
+            parts.append(f"{stage} {p50:.1f}/{p95:.1f}")
+        log.info("LATENCY", f"e2e p50 {total[0]:.1f} ms  p95 {total[1]:.1f}  max {total[2]:.1f}  "
+              f"| {'  '.join(parts)} (p50/p95 ms, capture offset {1000.0 * self.capture_latency:.0f} ms)")
+
+# ============================================================
+# FRAME BUDGET GOVERNOR
+# ============================================================
+
+class FrameGovernor:
+    """
+    Keeps a frame loop inside its time budget by shedding optional work in
+    GOVERNOR_LEVELS order: preview + HUD rate, then landmark inference, then
+    detection rate.
+
+    The optional stages report their cost per call (record()); end_frame()
+    gets the frame's whole work time, and what the stages did not account for
+    is the fixed cost. From those the frame time of any level is predicted:
+    over budget, the level jumps to the first one predicted to fit under
+    GOVERNOR_RESTORE_AT (at least one step); with headroom it steps back one
+    level at a time, once that level is predicted to fit. Changes are at least
+    GOVERNOR_HOLD_SEC apart.
+
+    One instance per frame loop (the main loop, or the vision process), used
+    only from that loop's thread.
+    """
+
+    KNOBS = ("preview", "landmarks", "detect")
+
+    def __init__(self, name="main"):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.level = 0
+        self.cost_ms = {"preview": None, "landmarks": None, "detect": None, "fixed": None}
+        self.frame_ms = None
+        self.calls = dict.fromkeys(self.KNOBS, 0)
+        self.stage_ms = 0.0            # recorded by the stages during the current frame
+        self.t_change = time.monotonic()
+
+    @property
+    def budget_ms(self):
+        return GOVERNOR_BUDGET_MS or 1000.0 / CAM_FPS
+
+    def due(self, knob):
+        """True when the optional stage should run this time, at the current level."""
+        every = GOVERNOR_LEVELS[self.level][self.KNOBS.index(knob)]
+        n = self.calls[knob]
+        self.calls[knob] = n + 1
+        return n % every == 0
+
+    def record(self, stage, ms):
+        self.stage_ms += ms
+        self.cost_ms[stage] = ema(self.cost_ms[stage], ms, GOVERNOR_EMA)
+
+    def predict(self, level):
+        preview_every, landmark_every, detect_every = GOVERNOR_LEVELS[level]
+        c = {k: v or 0.0 for k, v in self.cost_ms.items()}
+        return (c["fixed"] + c["preview"] / preview_every + c["detect"] / detect_every
+                + c["landmarks"] / (detect_every * landmark_every))
+
+    def end_frame(self, frame_ms):
+        """Once per frame with its work time in ms (camera wait excluded). Returns True if the level changed."""
+        self.cost_ms["fixed"] = ema(self.cost_ms["fixed"], max(0.0, frame_ms - self.stage_ms), GOVERNOR_EMA)
+        self.stage_ms = 0.0
+        self.frame_ms = ema(self.frame_ms, frame_ms, GOVERNOR_EMA)
+        now = time.monotonic()
+        if not GOVERNOR_ENABLE or now - self.t_change < GOVERNOR_HOLD_SEC:
+            return False
+
+        budget = self.budget_ms
+        top = len(GOVERNOR_LEVELS) - 1
+        if self.frame_ms > budget * GOVERNOR_SHED_AT and self.level < top:
+            level = next((n for n in range(self.level + 1, top)
+                          if self.predict(n) <= budget * GOVERNOR_RESTORE_AT), top)
+        elif self.level > 0 and self.predict(self.level - 1) <= budget * GOVERNOR_RESTORE_AT:
+            level = self.level - 1
+        else:
+            return False
+
+        preview_every, landmark_every, detect_every = GOVERNOR_LEVELS[level]
+        log.info("GOVERNOR", f"{self.name}: level {self.level} -> {level}, frame {self.frame_ms:.1f} ms "
+                             f"(budget {budget:.1f}, predicted {self.predict(level):.1f}): preview 1/{preview_every}, "
+                             f"landmarks 1/{landmark_every}, detection 1/{detect_every}")
+        self.level = level
+        self.t_change = now
+        metrics.governor_level[self.name] = level
+        metrics.governor_changes[self.name] += 1
+        return True
+
+governor = FrameGovernor()
+
+# ============================================================
+# PID CONTROLLER
+# ============================================================
+
+class PIDAxis:
+    def __init__(self, kp, ki, kd, out_min, out_max, i_min, i_max, d_alpha=0.25):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.out_min = out_min
+        self.out_max = out_max
+        self.i_min = i_min
+        self.i_max = i_max
+        self.d_alpha = d_alpha
+        self.integral = 0.0
+        self.prev_measurement = None
+        self.d_filt = 0.0
+
+    def reset(self):
+        self.integral = 0.0
+        self.prev_measurement = None
+        self.d_filt = 0.0
+
+    def update(self, error, measurement, dt):
+        if dt <= 1e-5:
+            return 0.0
+
+        if self.prev_measurement is None:
+            d_meas = 0.0
+        else:
+            d_meas = (measurement - self.prev_measurement) / dt
+
+        self.prev_measurement = measurement
+        self.d_filt = (1.0 - self.d_alpha) * self.d_filt + self.d_alpha * d_meas
+
+        new_integral = clamp(self.integral + error * dt, self.i_min, self.i_max)
+        u = self.kp * error + self.ki * new_integral - self.kd * self.d_filt
+        u_sat = clamp(u, self.out_min, self.out_max)
+
+        if (u == u_sat) or ((u > self.out_max) and (error < 0)) or ((u < self.out_min) and (error > 0)):
+            self.integral = new_integral
+
+        return u_sat
+
+class PIDBank:
+    """
+    Many independent PIDAxis controllers stepped in one NumPy call.
+
+    Gains and limits may be scalars or arrays; they are broadcast to `shape`
+    (e.g. (3,) for the x/y/z axes, or (3, N) for N simulated controllers).
+    update() matches PIDAxis.update bit for bit: same anti-windup rule,
+    derivative on measurement and d_alpha filter.
+    """
+
+    def __init__(self, kp, ki, kd, out_min, out_max, i_min, i_max, d_alpha=0.25, shape=None):
+        params = np.broadcast_arrays(*[np.asarray(p, dtype=np.float64)
+                                       for p in (kp, ki, kd, out_min, out_max, i_min, i_max, d_alpha)])
+        if shape is None:
+            shape = params[0].shape
+        params = [np.broadcast_to(p, shape).copy() for p in params]
+        (self.kp, self.ki, self.kd, self.out_min, self.out_max,
+         self.i_min, self.i_max, self.d_alpha) = params
+
+        self.shape = tuple(shape)
+        self.integral = np.zeros(self.shape)
+        self.prev_measurement = np.zeros(self.shape)
+        self.has_prev = np.zeros(self.shape, dtype=bool)
+        self.d_filt = np.zeros(self.shape)
+
+    @classmethod
+    def from_axes(cls, axes):
+        """Bank with one slot per PIDAxis, copying its gains and limits (state starts reset)."""
+        cols = [[getattr(a, name) for a in axes]
+                for name in ("kp", "ki", "kd", "out_min", "out_max", "i_min", "i_max", "d_alpha")]
+        return cls(*cols)
+
+    def reset(self, mask=None):
+        if mask is None:
+            self.integral[...] = 0.0
+            self.prev_measurement[...] = 0.0
+            self.has_prev[...] = False
+            self.d_filt[...] = 0.0
+        else:
+            self.integral[mask] = 0.0
+            self.prev_measurement[mask] = 0.0
+            self.has_prev[mask] = False
+            self.d_filt[mask] = 0.0
+
+    def update(self, error, measurement, dt):
+        error = np.broadcast_to(np.asarray(error, dtype=np.float64), self.shape)
+        measurement = np.broadcast_to(np.asarray(measurement, dtype=np.float64), self.shape)
+        dt = np.asarray(dt, dtype=np.float64)
+
+        # PIDAxis returns 0 and leaves its state alone for a degenerate dt
+        active = np.broadcast_to(dt > 1e-5, self.shape)
+        if not active.any():
+            return np.zeros(self.shape)
+        safe_dt = np.where(dt > 1e-5, dt, 1.0)
+
+        d_meas = np.where(self.has_prev, (measurement - self.prev_measurement) / safe_dt, 0.0)
+        d_filt = (1.0 - self.d_alpha) * self.d_filt + self.d_alpha * d_meas
+
+        new_integral = np.maximum(self.i_min, np.minimum(self.i_max, self.integral + error * safe_dt))
+        u = self.kp * error + self.ki * new_integral - self.kd * d_filt
+        u_sat = np.maximum(self.out_min, np.minimum(self.out_max, u))
+
+        keep = (u == u_sat) | ((u > self.out_max) & (error < 0)) | ((u < self.out_min) & (error > 0))
+
+        self.prev_measurement = np.where(active, measurement, self.prev_measurement)
+        self.has_prev = self.has_prev | active
+        self.d_filt = np.where(active, d_filt, self.d_filt)
+        self.integral = np.where(active & keep, new_integral, self.integral)
+
+        return np.where(active, u_sat, 0.0)
+
+# ============================================================
+# LENS UNDISTORTION
+# ============================================================
+
+class LensModel:
+    """
+    OpenCV fisheye (equidistant) lens: r_d = f * theta * (1 + k1 theta^2 + k2 theta^4 + k3 theta^6 + k4 theta^8).
+
+    Points are mapped to an ideal pinhole camera with the same focal length and
+    the principal point at the frame center, so aim point, radial_gain and the
+    IPD distance model keep working unchanged, just without the barrel squeeze.
+
+    The inverse has no closed form, so it is solved once per pixel (Newton) into
+    a lookup table; undistort_points() is then a bilinear read of a handful of
+    entries. The full-frame maps for the preview are a separate, lazy cache.
+    """
+
+    NEWTON_ITERS = 10
+
+    def __init__(self, K, D, size):
+        self.K = np.asarray(K, dtype=np.float64).reshape(3, 3)
+        self.D = np.asarray(D, dtype=np.float64).reshape(-1)[:4]
+        self.size = (int(size[0]), int(size[1]))
+        self._luts = {}
+        self._preview_maps = {}
+
+    @classmethod
+    def from_profile(cls, profile):
+        lens = (profile or {}).get("lens")
+        if not lens:
+            return None
+        if lens.get("model", "fisheye") != "fisheye":
+            raise ValueError(f"unsupported lens model {lens.get('model')!r}")
+        return cls(lens["K"], lens["D"], lens["size"])
+
+    def camera_matrix(self, W, H, mirror=False):
+        """K for frames of W x H (calibrated at another resolution, or flipped like MIRROR_VIEW)."""
+        sx = W / float(self.size[0])
+        sy = H / float(self.size[1])
+        K = self.K * np.array([[sx, 1.0, sx], [1.0, sy, sy], [1.0, 1.0, 1.0]])
+        if mirror:
+            K[0, 2] = (W - 1) - K[0, 2]
+        return K
+
+    def undistort_exact(self, u, v, W, H, mirror=False):
+        """Newton inverse of the lens model for pixel arrays u, v; what the LUT stores."""
+        K = self.camera_matrix(W, H, mirror)
+        fx, fy, cx, cy = K[0, 0], K[1, 1], K[0, 2], K[1, 2]
+        k1, k2, k3, k4 = np.pad(self.D, (0, 4 - self.D.size))
+
+        xd = (np.asarray(u, dtype=np.float64) - cx) / fx
+        yd = (np.asarray(v, dtype=np.float64) - cy) / fy
+        theta_d = np.hypot(xd, yd)
+
+        theta = theta_d.copy()
+        for _ in range(self.NEWTON_ITERS):
+            t2 = theta * theta
+            f = theta * (1.0 + t2 * (k1 + t2 * (k2 + t2 * (k3 + t2 * k4)))) - theta_d
+            df = 1.0 + t2 * (3.0 * k1 + t2 * (5.0 * k2 + t2 * (7.0 * k3 + t2 * 9.0 * k4)))
+            theta = np.clip(theta - f / df, 0.0, 0.5 * math.pi - 1e-3)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(theta_d > 1e-9, np.tan(theta) / theta_d, 1.0)
+        return 0.5 * W + fx * xd * scale, 0.5 * H + fy * yd * scale
+
+    def lut(self, W, H, mirror=False):
+        """(H, W, 2) float32 table of undistorted pixel positions, built on first use per frame size."""
+        key = (W, H, bool(mirror))
+        table = self._luts.get(key)
+        if table is None:
+            v, u = np.mgrid[0:H, 0:W]
+            ux, uy = self.undistort_exact(u, v, W, H, mirror)
+            table = np.stack([ux, uy], axis=-1).astype(np.float32)
+            self._luts[key] = table
+        return table
+
+    def undistort_points(self, pts, W, H, mirror=False):
+        """(n, 2) frame pixels -> (n, 2) undistorted pixels, bilinear in the LUT."""
+        # few points, so the cost is numpy call overhead: one gather for all 4 neighbours
+        table = self.lut(W, H, mirror).reshape(-1, 2)
+        pts = np.array(pts, dtype=np.float32).reshape(-1, 2)
+        np.clip(pts, 0.0, (W - 1.001, H - 1.001), out=pts)
+        ij = pts.astype(np.intp)
+        frac = pts - ij
+        q = table[(ij[:, 1] * W + ij[:, 0])[:, None] + (0, 1, W, W + 1)]
+        fx = frac[:, 0:1]
+        top = q[:, 0] + (q[:, 1] - q[:, 0]) * fx
+        bottom = q[:, 2] + (q[:, 3] - q[:, 2]) * fx
+        return top + (bottom - top) * frac[:, 1:2]
+
+    def preview_maps(self, W, H, mirror=False):
+        """cv2.remap maps for PREVIEW_UNDISTORT, computed once per frame size."""
+        key = (W, H, bool(mirror))
+        maps = self._preview_maps.get(key)
+        if maps is None:
+            K = self.camera_matrix(W, H, mirror)
+            D = np.pad(self.D, (0, 4 - self.D.size)).reshape(4, 1)
+            K_new = cv2.fisheye.estimateNewCameraMatrixForUndistortRectify(
+                K, D, (W, H), np.eye(3), balance=LENS_PREVIEW_BALANCE)
+            maps = cv2.fisheye.initUndistortRectifyMap(K, D, np.eye(3), K_new, (W, H), cv2.CV_16SC2)
+            self._preview_maps[key] = maps
+        return maps
+
+    def remap(self, frame, mirror=False):
+        H, W = frame.shape[:2]
+        map1, map2 = self.preview_maps(W, H, mirror)
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+
+# ============================================================
+# MULTI-FACE TRACKING
+# ============================================================
+
+def face_candidates(detections, W, H, p):
+    """
+    Vectorized pick_best_face filter: face-detection-retail rows -> (boxes (k, 4) int32 pixels, conf (k,)),
+    same confidence / area / degenerate-box rules.
+    """
+    d = np.asarray(detections, dtype=np.float32).reshape(-1, 7)
+    d = d[d[:, 2] >= p.face_conf_thresh]
+    boxes = np.clip((d[:, 3:7] * (W, H, W, H)).astype(np.int32), 0, (W - 1, H - 1, W - 1, H - 1))
+    bw = boxes[:, 2] - boxes[:, 0]
+    bh = boxes[:, 3] - boxes[:, 1]
+    ok = (bw > 0) & (bh > 0) & (bw * bh >= p.min_face_area_frac * max(1, W * H))
+    return boxes[ok], d[ok, 2]
+
+def iou_matrix(a, b):
+    """IoU of every box in a (n, 4) against every box in b (m, 4) -> (n, m)."""
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0.0, None) * np.clip(y1 - y0, 0.0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def linear_assignment(cost):
+    """
+    Minimum-cost one-to-one assignment (Hungarian method, shortest augmenting
+    paths, O(n^2 m)) for the small dense matrices here. Plain Python lists:
+    at a few dozen rows that beats per-step NumPy calls. Returns (rows, cols).
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        return np.zeros(0, np.intp), np.zeros(0, np.intp)
+
+    c = cost.tolist()
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)          # column j -> row (1-based), 0 = free
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            row = c[i0 - 1]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+
+    rows = np.array([match[j] - 1 for j in range(1, m + 1) if match[j]], dtype=np.intp)
+    cols = np.array([j - 1 for j in range(1, m + 1) if match[j]], dtype=np.intp)
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+class MultiFaceTracker:
+    """
+    Keeps an ID on every face across frames and picks which one the arm follows.
+
+    Tracks are parallel NumPy arrays (box, velocity, hits, last seen). Each
+    frame the predicted track boxes are matched to the detections by IoU: when
+    every track has at most one candidate (the usual case) that is the answer,
+    otherwise linear_assignment() on 1 - IoU settles the crossings.
+
+    The followed face is locked by ID. A missing locked face just means "no
+    face this frame" until TARGET_LOST_SEC; only then (or on a TARGET command)
+    is another face picked, by score_face among confirmed tracks.
+
+    TARGET commands arrive from the command server thread through request();
+    they are applied at the start of the next update(), on the vision thread.
+    `view` is the published (id, box, matched, locked) list, swapped whole.
+    """
+
+    def __init__(self):
+        self.requests = queue.SimpleQueue()
+        self.next_id = 1
+        self.reset()
+
+    def reset(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float64)
+        self.vel = np.zeros((0, 4), dtype=np.float64)    # px / s
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self.matched = np.zeros(0, dtype=bool)
+        self.locked_id = None
+        self.view = []
+
+    def request(self, arg):
+        """'AUTO', 'NEXT' or a track id; thread-safe."""
+        self.requests.put(arg)
+
+    def _lock(self, track_id, reason):
+        if track_id != self.locked_id:
+            if self.locked_id is not None and track_id is not None:
+                metrics.target_switches += 1
+            log.info("TRACK", f"Target {self.locked_id} -> {track_id} ({reason})")
+        self.locked_id = track_id
+
+    def _apply_requests(self):
+        while True:
+            try:
+                arg = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if arg == "AUTO":
+                self._lock(None, "TARGET AUTO")
+            elif arg == "NEXT":
+                # left to right among the faces in view, wrapping around
+                live = self.ids[self.matched][np.argsort(self.boxes[self.matched, 0])].tolist()
+                if live:
+                    k = live.index(self.locked_id) + 1 if self.locked_id in live else 0
+                    self._lock(live[k % len(live)], "TARGET NEXT")
+            elif arg in self.ids:
+                self._lock(int(arg), "TARGET id")
+            else:
+                log.warn("TRACK", f"TARGET {arg}: no such track")
+
+    def _filter(self, mask):
+        for name in ("ids", "boxes", "vel", "hits", "last_seen", "matched"):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def _associate(self, det, t):
+        n, m = self.ids.size, det.shape[0]
+        if n == 0 or m == 0:
+            return np.zeros(0, np.intp), np.zeros(0, np.intp)
+        dt = np.minimum(t - self.last_seen, 0.5)[:, None]
+        iou = iou_matrix(self.boxes + self.vel * dt, det)
+        gate = iou >= TRACK_IOU_MIN
+        if (gate.sum(axis=0) <= 1).all() and (gate.sum(axis=1) <= 1).all():
+            return np.nonzero(gate)
+        rows, cols = linear_assignment(np.where(gate, 1.0 - iou, 1e3))
+        keep = gate[rows, cols]
+        return rows[keep], cols[keep]
+
+    def update(self, detections, W, H, p, t):
+        """
+        One frame of detector output. Returns the locked face as
+        (x0, y0, x1, y1, conf, score) like pick_best_face, or None.
+        """
+        boxes, conf = face_candidates(detections, W, H, p)
+        det = boxes.astype(np.float64)
+        self._apply_requests()
+
+        rows, cols = self._associate(det, t)
+        self.matched = np.zeros(self.ids.size, dtype=bool)
+        self.matched[rows] = True
+        if rows.size:
+            dt = np.maximum(t - self.last_seen[rows], 1e-3)[:, None]
+            self.vel[rows] = 0.6 * self.vel[rows] + 0.4 * (det[cols] - self.boxes[rows]) / dt
+            self.boxes[rows] = det[cols]
+            self.hits[rows] += 1
+            self.last_seen[rows] = t
+        det_of = np.full(self.ids.size, -1, dtype=np.intp)
+        det_of[rows] = cols
+
+        # forget stale tracks (the locked one gets the longer grace period)
+        age = t - self.last_seen
+        keep = age <= np.where(self.ids == (self.locked_id or -1), TARGET_LOST_SEC, TRACK_DROP_SEC)
+        if self.locked_id is not None and not keep[self.ids == self.locked_id].any():
+            self._lock(None, f"lost for {TARGET_LOST_SEC:.1f}s")
+        self._filter(keep)
+        det_of = det_of[keep]
+
+        new = np.setdiff1d(np.arange(det.shape[0]), cols)[:max(0, TRACK_MAX_FACES - self.ids.size)]
+        if new.size:
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + new.size)])
+            self.next_id += new.size
+            self.boxes = np.concatenate([self.boxes, det[new]])
+            self.vel = np.concatenate([self.vel, np.zeros((new.size, 4))])
+            self.hits = np.concatenate([self.hits, np.ones(new.size, dtype=np.int64)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(new.size, t)])
+            self.matched = np.concatenate([self.matched, np.ones(new.size, dtype=bool)])
+            det_of = np.concatenate([det_of, new])
+
+        if self.locked_id is None:
+            best_score = -1e9
+            for k in np.nonzero(self.matched & (self.hits >= TRACK_CONFIRM_FRAMES))[0]:
+                x0, y0, x1, y1 = boxes[det_of[k]].tolist()
+                score = score_face(x0, y0, x1, y1, float(conf[det_of[k]]), W, H, p)
+                if score > best_score:
+                    best_score = score
+                    best_id = int(self.ids[k])
+            if best_score > -1e9:
+                self._lock(best_id, "auto")
+
+        self.view = [(int(i), tuple(b), bool(mt), int(i) == self.locked_id)
+                     for i, b, mt in zip(self.ids.tolist(), self.boxes.astype(int).tolist(), self.matched.tolist())]
+
+        if self.locked_id is None:
+            return None
+        k = np.nonzero(self.ids == self.locked_id)[0][0]
+        if not self.matched[k]:
+            return None
+        x0, y0, x1, y1 = boxes[det_of[k]].tolist()
+        c = float(conf[det_of[k]])
+        return x0, y0, x1, y1, c, score_face(x0, y0, x1, y1, c, W, H, p)
+
+faces = MultiFaceTracker()
+
+# ============================================================
+# VISION TRACKER
+# ============================================================
+
+def score_face(x0, y0, x1, y1, conf, frame_w, frame_h, p, prev_bbox=None):
+    w = max(1, x1 - x0)
+    h = max(1, y1 - y0)
+    area_norm = (w * h) / float(frame_w * frame_h)
+    score = 3.0 * conf + 2.0 * area_norm
+
+    cx = 0.5 * (x0 + x1)
+    cy = 0.5 * (y0 + y1)
+    aim_x = frame_w * p.aim_center_x_norm
+    aim_y = frame_h * p.aim_center_y_norm
+    dx = (cx - aim_x) / max(1.0, frame_w * 0.5)
+    dy = (cy - aim_y) / max(1.0, frame_h * 0.5)
+    score -= 0.20 * math.sqrt(dx * dx + dy * dy)
+
+    if prev_bbox is not None:
+        px0, py0, px1, py1 = prev_bbox
+        prev_cx = 0.5 * (px0 + px1)
+        prev_cy = 0.5 * (py0 + py1)
+        dist_prev = math.hypot(cx - prev_cx, cy - prev_cy)
+        score -= 0.35 * (dist_prev / math.hypot(frame_w, frame_h))
+
+    return score
+
+def pick_best_face(detections, W, H, p, prev_bbox=None):
+    """
+    Best face from face-detection-retail rows (image_id, label, conf, x0, y0, x1, y1):
+    confident, big, near the aim point and close to last frame's pick.
+    Returns (x0, y0, x1, y1, conf, score) in pixels, or None.
+    """
+    best = None
+    best_score = -1e9
+
+    for d in detections:
+        conf = float(d[2])
+        if conf < p.face_conf_thresh:
+            continue
+
+        x0 = clamp(int(d[3] * W), 0, W - 1)
+        y0 = clamp(int(d[4] * H), 0, H - 1)
+        x1 = clamp(int(d[5] * W), 0, W - 1)
+        y1 = clamp(int(d[6] * H), 0, H - 1)
+
+        if x1 <= x0 or y1 <= y0:
+            continue
+
+        area_frac = ((x1 - x0) * (y1 - y0)) / float(max(1, W * H))
+        if area_frac < p.min_face_area_frac:
+            continue
+
+        score = score_face(x0, y0, x1, y1, conf, W, H, p, prev_bbox)
+        if score > best_score:
+            best_score = score
+            best = (x0, y0, x1, y1, conf, score)
+
+    return best
+
+def radial_gain(cx, cy, W, H, f_pixels, radial_k, geometry):
+    """
+    Off-center factor of the distance model (1.0 for the plain pinhole model).
+    Works on floats and on NumPy arrays (dist_calib.py fits with it).
+    """
+    dx = cx - 0.5 * W
+    dy = cy - 0.5 * H
+    r2 = dx * dx + dy * dy
+    gain = np.sqrt(1.0 + r2 / (f_pixels * f_pixels)) if geometry else 1.0
+    return gain + radial_k * r2 / (0.25 * W * W)
+
+def load_camera_profile(path):
+    """Applies a dist_calib.py profile to the live params. Returns the profile dict, or None if there is none."""
+    global DIST_RADIAL_GEOMETRY
+    if not path or not os.path.exists(path):
+        print(f"[CAMERA] No camera profile at {path}, using FOV_DEG/DIST_SCALE from settings")
+        return None
+    with open(path, "r") as f:
+        profile = json.load(f)
+
+    params.update({k: profile[k] for k in ("FOV_DEG", "DIST_SCALE", "DIST_ESTIMATE_OFFSET_CM", "DIST_RADIAL_K")
+                   if k in profile}, source=f"camera profile {path}")
+    DIST_RADIAL_GEOMETRY = bool(profile.get("DIST_RADIAL_GEOMETRY", False))
+    fit = profile.get("fit", {})
+    print(f"[CAMERA] Profile {profile.get('camera', path)}: FOV {profile.get('FOV_DEG', FOV_DEG):.1f} deg, "
+          f"scale {profile.get('DIST_SCALE', DIST_SCALE):.3f}, fit rmse {fit.get('rmse_cm', float('nan')):.2f} cm "
+          f"over {fit.get('samples', 0)} samples")
+    return profile
+
+def face_roi(bbox, W, H):
+    """Detector box padded by 10% for the landmark / head-pose crops, clipped to the frame."""
+    x0, y0, x1, y1 = bbox
+    pad = int(0.10 * max(x1 - x0, y1 - y0))
+    return max(0, x0 - pad), max(0, y0 - pad), min(W, x1 + pad), min(H, y1 + pad)
+
+def to_blob(img, size):
+    """BGR image -> CHW float32 at `size` (w, h), the layout the OpenVINO models take."""
+    return np.transpose(cv2.resize(img, size), (2, 0, 1)).astype(np.float32)
+
+class VisionTracker:
+    def __init__(self, fd_xml, lm_xml, camera_profile=None):
+        self.camera_profile = load_camera_profile(CAMERA_PROFILE if camera_profile is None else camera_profile)
+        self.lens = LensModel.from_profile(self.camera_profile) if LENS_UNDISTORT else None
+        if self.lens is not None:
+            t0 = time.perf_counter()
+            self.lens.lut(CAM_W, CAM_H, MIRROR_VIEW)     # built here, not on the first tracked frame
+            print(f"[CAMERA] Lens model loaded, undistorting landmarks and bbox "
+                  f"(LUT {CAM_W}x{CAM_H} in {1000.0 * (time.perf_counter() - t0):.0f} ms)")
+        self.core = ov.Core()
+
+        available = list(self.core.available_devices)
+        print(f"[OpenVINO] Available devices: {available}")
+
+        self.device_fd = DEVICE_FD if DEVICE_FD in available else "CPU"
+        self.device_lm = DEVICE_LM if DEVICE_LM in available else "CPU"
+
+        print(f"[OpenVINO] Loading face detection on {self.device_fd}")
+        self.fd_model = self.core.read_model(fd_xml)
+        self.fd_comp = self.core.compile_model(self.fd_model, self.device_fd)
+        self.fd_input = self.fd_comp.input(0)
+        self.fd_output = self.fd_comp.output(0)
+        self.fd_req = self.fd_comp.create_infer_request()
+
+        print(f"[OpenVINO] Loading landmarks on {self.device_lm}")
+        self.lm_model = self.core.read_model(lm_xml)
+        self.lm_comp = self.core.compile_model(self.lm_model, self.device_lm)
+        self.lm_input = self.lm_comp.input(0)
+        self.lm_output = self.lm_comp.output(0)
+        self.lm_req = self.lm_comp.create_infer_request()
+
+        self.faces = faces if MULTI_FACE_TRACKING else None
+        self.governor = governor if GOVERNOR_ENABLE else None
+        self.last_meas = None
+        self.reset_filters()
+
+    def reset_filters(self):
+        self.cx_s = None
+        self.cy_s = None
+        self.view_cx_s = None
+        self.view_cy_s = None
+        self.ipd_s = None
+        self.raw_dist_s = None
+        self.dist_s = None
+        self.prev_bbox = None
+        self.ipd_per_width = None       # landmark IPD / bbox width, for the bbox-only estimate
+
+    def warmup(self):
+        dummy_fd = np.zeros((1, 3, 300, 300), dtype=np.float32)
+        dummy_lm = np.zeros((1, 3, 48, 48), dtype=np.float32)
+        for _ in range(STARTUP_MODEL_WARMUP_RUNS):
+            self.fd_req.infer({self.fd_input: dummy_fd})
+            self.lm_req.infer({self.lm_input: dummy_lm})
+        print("[OpenVINO] Warmup complete")
+
+    def process(self, frame, f_pixels, t_capture=None, p=None):
+        gov = self.governor
+        if gov is not None and not gov.due("detect") and self.last_meas is not None:
+            return replace(self.last_meas, held=True)    # detection shed: its t_capture stays the old one
+        self.last_meas = meas = self._process(frame, f_pixels, t_capture, p)
+        return meas
+
+    def _process(self, frame, f_pixels, t_capture, p):
+        if p is None:
+            p = params.snapshot
+        gov = self.governor
+        H, W = frame.shape[:2]
+        meas = Measurement(t_capture=t_capture)
+
+        t0 = time.perf_counter()
+        fd_blob = to_blob(frame, (300, 300))[None, ...]
+
+        self.fd_req.infer({self.fd_input: fd_blob})
+        metrics.detector_calls += 1
+        fd_out = self.fd_req.get_output_tensor(self.fd_output.index).data[0, 0]
+        if gov is not None:
+            gov.record("detect", 1000.0 * (time.perf_counter() - t0))
+
+        if self.faces is not None:
+            best = self.faces.update(fd_out, W, H, p, time.monotonic() if t_capture is None else t_capture)
+            meas.track_id = self.faces.locked_id
+            meas.n_faces = int(self.faces.matched.sum())
+        else:
+            best = pick_best_face(fd_out, W, H, p, self.prev_bbox)
+        if best is None:
+            meas.t_infer_done = time.monotonic()
+            return meas
+
+        x0, y0, x1, y1, conf, score = best
+        rx0, ry0, rx1, ry1 = face_roi((x0, y0, x1, y1), W, H)
+
+        face = frame[ry0:ry1, rx0:rx1]
+        if face.size == 0:
+            meas.t_infer_done = time.monotonic()
+            return meas
+
+        meas.face_ok = True
+        meas.bbox = (x0, y0, x1, y1)
+        meas.face_score = score
+        self.prev_bbox = (x0, y0, x1, y1)
+
+        pts = []
+        if gov is None or self.ipd_per_width is None or gov.due("landmarks"):
+            t0 = time.perf_counter()
+            lm_blob = to_blob(face, (48, 48))[None, ...]
+
+            self.lm_req.infer({self.lm_input: lm_blob})
+            metrics.landmark_calls += 1
+            pts_norm = self.lm_req.get_output_tensor(self.lm_output.index).data.reshape(-1, 2)
+
+            fw = rx1 - rx0
+            fh = ry1 - ry0
+            pts = [(int(px * fw + rx0), int(py * fh + ry0)) for px, py in pts_norm]
+            if gov is not None:
+                gov.record("landmarks", 1000.0 * (time.perf_counter() - t0))
+        meas.t_infer_done = time.monotonic()
+
+        aim_x = W * p.aim_center_x_norm
+        aim_y = H * p.aim_center_y_norm
+        cx = 0.5 * (x0 + x1)
+        cy = 0.5 * (y0 + y1)
+        bbox_w = x1 - x0
+        if self.lens is not None:
+            # one LUT read for everything geometric: 4 bbox corners, aim point, landmarks
+            und = self.lens.undistort_points([(x0, y0), (x1, y0), (x0, y1), (x1, y1), (aim_x, aim_y)] + pts,
+                                             W, H, MIRROR_VIEW)
+            cx = 0.5 * float(und[:4, 0].min() + und[:4, 0].max())
+            cy = 0.5 * float(und[:4, 1].min() + und[:4, 1].max())
+            bbox_w = float(und[:4, 0].max() - und[:4, 0].min())
+            aim_x, aim_y = und[4].tolist()
+            pts = und[5:].tolist()
+
+        self.cx_s = ema(self.cx_s, cx, p.ema_target_cx)
+        self.cy_s = ema(self.cy_s, cy, p.ema_target_cy)
+        self.view_cx_s = ema(self.view_cx_s, 0.5 * (x0 + x1), p.ema_target_cx)
+        self.view_cy_s = ema(self.view_cy_s, 0.5 * (y0 + y1), p.ema_target_cy)
+        meas.target_cx = self.cx_s
+        meas.target_cy = self.cy_s
+        meas.view_cx = self.view_cx_s
+        meas.view_cy = self.view_cy_s
+
+        ipd_now = None
+        if len(pts) >= 2:
+            ipd_now = math.hypot(pts[1][0] - pts[0][0], pts[1][1] - pts[0][1])
+            if bbox_w > 0:
+                self.ipd_per_width = ema(self.ipd_per_width, ipd_now / bbox_w, p.ema_ipd)
+        elif self.ipd_per_width is not None:
+            ipd_now = self.ipd_per_width * bbox_w       # landmarks shed: bbox-only estimate
+
+        if ipd_now is not None:
+            self.ipd_s = ema(self.ipd_s, ipd_now, p.ema_ipd)
+            meas.ipd_px = self.ipd_s
+
+            if self.ipd_s > 1.0:
+                raw_dist_cm = p.dist_scale * ((f_pixels * p.ipd_real_cm) / self.ipd_s)
+                if DIST_RADIAL_GEOMETRY or p.dist_radial_k:
+                    raw_dist_cm *= radial_gain(self.cx_s, self.cy_s, W, H, f_pixels,
+                                               p.dist_radial_k, DIST_RADIAL_GEOMETRY)
+                self.raw_dist_s = ema(self.raw_dist_s, raw_dist_cm, p.ema_dist)
+                meas.raw_dist_cm = self.raw_dist_s
+                corrected_dist_cm = self.raw_dist_s + p.dist_estimate_offset_cm
+                self.dist_s = ema(self.dist_s, corrected_dist_cm, p.ema_dist)
+                meas.dist_cm = self.dist_s
+
+        if meas.target_cx is not None and meas.target_cy is not None:
+            meas.ex = apply_deadband((meas.target_cx - aim_x) / (W * 0.5), p.deadband_ex)
+            meas.ey = apply_deadband((meas.target_cy - aim_y) / (H * 0.5), p.deadband_ey)
+
+        if meas.dist_cm is not None:
+            meas.ed_cm = apply_deadband(meas.dist_cm - p.dist_target_cm, p.deadband_ed_cm)
+
+        return meas
+
+# ============================================================
+# ARM CONTROLLER
+# ============================================================
+
+class RoArmController:
+    def __init__(self, ser=None):
+        self.ser = ser
+        self.x_cmd = X0
+        self.y_cmd = Y0
+        self.z_cmd = Z0
+        self.last_sent = None
+        self.last_written_time = None
+
+        # Slightly tamer gains for fair-day robustness
+        self.pid_x = PIDAxis(PID_X_KP, PID_X_KI, PID_X_KD, -120.0, 120.0, -25.0, 25.0, 0.25)
+        self.pid_y = PIDAxis(PID_YZ_KP, PID_YZ_KI, PID_YZ_KD, -220.0, 220.0, -30.0, 30.0, 0.25)
+        self.pid_z = PIDAxis(PID_YZ_KP, PID_YZ_KI, PID_YZ_KD, -220.0, 220.0, -30.0, 30.0, 0.25)
+        self.pid_bank = PIDBank.from_axes([self.pid_x, self.pid_y, self.pid_z]) if USE_PID_BANK else None
+        self.pid_out = (0.0, 0.0, 0.0)    # last update_from_measurement velocities, for the tick log
+
+        self.max_step_x = 10.0
+        self.max_step_y = 12.0
+        self.max_step_z = 12.0
+
+    def attach_serial(self, ser):
+        self.ser = ser
+
+    def apply_gains(self, p):
+        """Takes the PID gains from a TuningParams snapshot; integrator state is kept."""
+        gains = ((p.pid_x_kp, p.pid_x_ki, p.pid_x_kd),
+                 (p.pid_yz_kp, p.pid_yz_ki, p.pid_yz_kd),
+                 (p.pid_yz_kp, p.pid_yz_ki, p.pid_yz_kd))
+        for axis, (kp, ki, kd) in zip((self.pid_x, self.pid_y, self.pid_z), gains):
+            axis.kp, axis.ki, axis.kd = kp, ki, kd
+        if self.pid_bank is not None:
+            self.pid_bank.kp[:], self.pid_bank.ki[:], self.pid_bank.kd[:] = np.array(gains).T
+
+    def reset_pid(self):
+        if self.pid_bank is not None:
+            self.pid_bank.reset()
+        self.pid_x.reset()
+        self.pid_y.reset()
+        self.pid_z.reset()
+
+    def reset_pose(self):
+        self.x_cmd = X0
+        self.y_cmd = Y0
+        self.z_cmd = Z0
+        self.reset_pid()
+
+    def go_home(self, force_send=True):
+        self.reset_pose()
+        if force_send:
+            self.send_current(force=True)
+
+    def apply_manual_command(self, cmd):
+        step = params.snapshot.manual_step_mm
+        if cmd == "UP":
+            self.z_cmd += step
+        elif cmd == "DOWN":
+            self.z_cmd -= step
+        elif cmd == "LEFT":
+            self.y_cmd += step
+        elif cmd == "RIGHT":
+            self.y_cmd -= step
+        elif cmd == "FORWARD":
+            self.x_cmd += step
+        elif cmd == "BACKWARD":
+            self.x_cmd -= step
+
+        self.x_cmd = clamp(self.x_cmd, X_MIN, X_MAX)
+        self.y_cmd = clamp(self.y_cmd, Y_MIN, Y_MAX)
+        self.z_cmd = clamp(self.z_cmd, Z_MIN, Z_MAX)
+        return self.x_cmd, self.y_cmd, self.z_cmd
+
+    def update_from_measurement(self, meas, dt):
+        if not meas.face_ok:
+            return self.x_cmd, self.y_cmd, self.z_cmd
+
+        mx = 0.0 if meas.dist_cm is None else meas.dist_cm
+        my = 0.0 if meas.ex is None else meas.ex
+        mz = 0.0 if meas.ey is None else meas.ey
+
+        ex_dist = 0.0 if meas.ed_cm is None else meas.ed_cm
+        ey_img = 0.0 if meas.ex is None else meas.ex
+        ez_img = 0.0 if meas.ey is None else meas.ey
+
+        if self.pid_bank is not None:
+            vx, vy, vz = self.pid_bank.update((ex_dist, ey_img, ez_img), (mx, my, mz), dt).tolist()
+        else:
+            vx = self.pid_x.update(ex_dist, mx, dt)
+            vy = self.pid_y.update(ey_img, my, dt)
+            vz = self.pid_z.update(ez_img, mz, dt)
+        self.pid_out = (vx, vy, vz)
+
+        dx = clamp(X_SIGN * vx * dt, -self.max_step_x, self.max_step_x)
+        dy = clamp(Y_SIGN * vy * dt, -self.max_step_y, self.max_step_y)
+        dz = clamp(Z_SIGN * vz * dt, -self.max_step_z, self.max_step_z)
+
+        self.x_cmd = clamp(self.x_cmd + dx, X_MIN, X_MAX)
+        self.y_cmd = clamp(self.y_cmd + dy, Y_MIN, Y_MAX)
+        self.z_cmd = clamp(self.z_cmd + dz, Z_MIN, Z_MAX)
+
+        return self.x_cmd, self.y_cmd, self.z_cmd
+
+    def pid_state(self):
+        """((integral x, y, z), (d_filt x, y, z)) from whichever PID implementation is active."""
+        if self.pid_bank is not None:
+            return tuple(self.pid_bank.integral.tolist()), tuple(self.pid_bank.d_filt.tolist())
+        axes = (self.pid_x, self.pid_y, self.pid_z)
+        return tuple(a.integral for a in axes), tuple(a.d_filt for a in axes)
+
+    def send_current(self, force=False):
+        """Returns the monotonic write time if a command went out, else None."""
+        payload = (round(self.x_cmd, 2), round(self.y_cmd, 2), round(self.z_cmd, 2), round(T_NEUTRAL, 2))
+        should_send = True
+
+        if SERIAL_SEND_ONLY_IF_CHANGED and self.last_sent is not None and not force:
+            dx = abs(payload[0] - self.last_sent[0])
+            dy = abs(payload[1] - self.last_sent[1])
+            dz = abs(payload[2] - self.last_sent[2])
+            dt_ang = abs(payload[3] - self.last_sent[3])
+            should_send = (dx >= MIN_SEND_DELTA_MM) or (dy >= MIN_SEND_DELTA_MM) or (dz >= MIN_SEND_DELTA_MM) or (dt_ang >= MIN_SEND_DELTA_RAD)
+
+        if should_send:
+            t_written = write_json(self.ser, {
+                "T": CMD_XYZT_DIRECT_CTRL,
+                "x": float(payload[0]),
+                "y": float(payload[1]),
+                "z": float(payload[2]),
+                "t": float(payload[3])
+            })
+            self.last_sent = payload
+            self.last_written_time = t_written
+            return t_written
+        return None
+
+# ============================================================
+# INITIALIZATION HELPERS
+# ============================================================
+
+def init_camera():
+    set_status("OPENING CAMERA")
+    cap = cv2.VideoCapture(CAM_SOURCE, getattr(cv2, f"CAP_{CAM_BACKEND}"))
+
+    if not cap.isOpened():
+        print(f"[CAMERA] Failed to open {CAM_SOURCE}")
+        return None
+
+    if USE_MJPG:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAM_W)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAM_H)
+    cap.set(cv2.CAP_PROP_FPS, CAM_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    time.sleep(STARTUP_CAMERA_SETTLE_SEC)
+
+    actual_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    actual_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    actual_fps = cap.get(cv2.CAP_PROP_FPS)
+    print(f"[CAMERA] Opened {actual_w}x{actual_h} @ {actual_fps:.1f} fps")
+
+    for _ in range(STARTUP_DROP_FRAMES):
+        cap.read()
+
+    ok, frame = cap.read()
+    if not ok or frame is None:
+        print("[CAMERA] Failed on first frame read")
+        cap.release()
+        return None
+
+    print(f"[CAMERA] First frame ok: {frame.shape}")
+    return cap
+
+def init_serial_only():
+    if TEST_MODE:
+        print("[SERIAL] TEST_MODE on, skipping serial")
+        return None
+
+    set_status("OPENING SERIAL")
+    try:
+        ser = serial.Serial(SERIAL_PORT, BAUDRATE, timeout=0.1)
+        ser.setRTS(False)
+        ser.setDTR(False)
+        time.sleep(STARTUP_SERIAL_SETTLE_SEC)
+        print(f"[SERIAL] Opened {SERIAL_PORT} @ {BAUDRATE}")
+        return ser
+    except Exception as e:
+        print(f"[SERIAL] Init failed: {e}")
+        return None
+
+def arm_safe_initialize(ser, controller):
+    if ser is None:
+        controller.go_home(force_send=False)
+        return
+
+    set_status("INITIALIZING ARM")
+    write_json(ser, {"T": CMD_MOVE_INIT})
+    time.sleep(1.0)
+
+    if SEND_HOME_AFTER_INIT:
+        controller.go_home(force_send=True)
+        time.sleep(0.5)
+
+    print("[SERIAL] Arm init complete")
+
+def calibrate_capture_latency(cap, ser=None):
+    """
+    Flash test for the camera's own capture latency: switch a light on and time
+    how long until a frame returned by cap.read() shows it. Point the camera at
+    the calibration window (SCREEN) or at the RoArm LED (LED). The result also
+    contains the display/LED rise time, so treat it as an upper bound.
+    Returns the median in ms, or None if no flash was seen.
+    """
+    use_led = LATENCY_CALIB_SOURCE == "LED" and ser is not None
+    window = "Latency calibration"
+    dark = np.zeros((CAM_H, CAM_W, 3), dtype=np.uint8)
+    bright = np.full((CAM_H, CAM_W, 3), 255, dtype=np.uint8)
+
+    def flash(on):
+        if use_led:
+            write_json(ser, {"T": CMD_LED_CTRL, "led": 255 if on else 0})
+        else:
+            cv2.imshow(window, bright if on else dark)
+            cv2.waitKey(1)
+        return time.monotonic()
+
+    def read_brightness():
+        ok, frame = cap.read()
+        t_read = time.monotonic()
+        if not ok or frame is None:
+            return None, t_read
+        return float(frame[::8, ::8].mean()), t_read
+
+    set_status("CALIBRATING LATENCY")
+    print(f"[LATENCY] Calibrating with {'RoArm LED' if use_led else 'screen flash'}, "
+          f"{LATENCY_CALIB_TRIALS} trials")
+
+    results = []
+    for _ in range(LATENCY_CALIB_TRIALS):
+        flash(False)
+        baseline = []
+        settle_until = time.monotonic() + 0.6
+        while time.monotonic() < settle_until:
+            level, _ = read_brightness()
+            if level is not None:
+                baseline.append(level)
+        if not baseline:
+            continue
+        base_level = float(np.median(baseline[-5:]))
+
+        t_on = flash(True)
+        while True:
+            level, t_read = read_brightness()
+            if t_read - t_on > 1.0:
+                break
+            if level is not None and level - base_level > LATENCY_CALIB_THRESHOLD:
+                results.append(t_read - t_on)
+                break
+
+    flash(False)
+    if not use_led:
+        cv2.destroyWindow(window)
+
+    if not results:
+        print("[LATENCY] Calibration failed: flash never seen by the camera")
+        return None
+
+    arr = 1000.0 * np.array(results)
+    print(f"[LATENCY] Flash-to-frame median {np.median(arr):.1f} ms "
+          f"(min {arr.min():.1f}, max {arr.max():.1f}, {arr.size}/{LATENCY_CALIB_TRIALS} trials)")
+    print(f"[LATENCY] Set CAPTURE_LATENCY_MS = {np.median(arr):.0f} to keep this result")
+    return float(np.median(arr))
+
+# ============================================================
+# BOOT SEQUENCE
+# ============================================================
+
+class BootSequence:
+    """
+    Runs the startup steps as a small dependency graph. Every step gets its own
+    thread and starts as soon as the steps it depends on are done, so camera
+    settle, model compile/warmup and serial settle + arm init overlap instead
+    of adding up. A step's function is called with its dependencies' results
+    (in order). An exception fails the step and every step that depends on it;
+    wait() re-raises it in the caller.
+    """
+
+    def __init__(self, parallel=True):
+        self.parallel = parallel
+        self.steps = {}
+        self.order = []
+        self.t0 = None
+
+    def add(self, name, fn, deps=()):
+        for dep in deps:
+            if dep not in self.steps:
+                raise ValueError(f"boot step {name!r} depends on unknown step {dep!r}")
+        self.steps[name] = {"fn": fn, "deps": tuple(deps), "done": threading.Event(),
+                            "result": None, "error": None, "t_start": None, "t_end": None}
+        self.order.append(name)
+
+    def start(self):
+        self.t0 = time.monotonic()
+        if not self.parallel:
+            for name in self.order:
+                self._run(name)
+            return
+        for name in self.order:
+            threading.Thread(target=self._run, args=(name,), name=f"boot-{name}", daemon=True).start()
+
+    def _run(self, name):
+        step = self.steps[name]
+        try:
+            args = []
+            for dep in step["deps"]:
+                dep_step = self.steps[dep]
+                dep_step["done"].wait()
+                if dep_step["error"] is not None:
+                    raise RuntimeError(f"dependency {dep!r} failed") from dep_step["error"]
+                args.append(dep_step["result"])
+            step["t_start"] = time.monotonic()
+            step["result"] = step["fn"](*args)
+        except Exception as e:
+            step["error"] = e
+            print(f"[BOOT] Step {name} failed: {e!r}")
+        finally:
+            step["t_end"] = time.monotonic()
+            step["done"].set()
+
+    def wait(self, name):
+        step = self.steps[name]
+        step["done"].wait()
+        if step["error"] is not None:
+            raise step["error"]
+        return step["result"]
+
+    def critical_path(self):
+        # walk back from the last step to finish through whichever dependency finished last
+        ends = {n: s["t_end"] for n, s in self.steps.items() if s["t_end"] is not None}
+        if not ends:
+            return []
+        name = max(ends, key=ends.get)
+        path = [name]
+        while self.steps[name]["deps"]:
+            name = max(self.steps[name]["deps"], key=lambda d: self.steps[d]["t_end"] or 0.0)
+            path.append(name)
+        return path[::-1]
+
+    def report(self, width=40):
+        finished = [(n, self.steps[n]) for n in self.order if self.steps[n]["t_end"] is not None]
+        if not finished:
+            return
+        total = max(s["t_end"] for _, s in finished) - self.t0
+        serial_sum = sum(s["t_end"] - (s["t_start"] or s["t_end"]) for _, s in finished)
+        scale = width / max(total, 1e-6)
+
+        print(f"[BOOT] Timeline ({'parallel' if self.parallel else 'sequential'}), ms from start:")
+        for name, s in finished:
+            start = (s["t_start"] or s["t_end"]) - self.t0
+            end = s["t_end"] - self.t0
+            bar = " " * int(start * scale) + "#" * max(1, int(round((end - start) * scale)))
+            flag = "  FAILED" if s["error"] is not None else ""
+            print(f"[BOOT]   {name:10s} {1000.0 * start:7.0f} .. {1000.0 * end:7.0f}  |{bar:<{width}}|{flag}")
+        path = self.critical_path()
+        print(f"[BOOT] Done after {1000.0 * total:.0f} ms (steps add up to {1000.0 * serial_sum:.0f} ms); "
+              f"critical path: {' -> '.join(path)}")
+
+def boot_system():
+    """
+    Camera, models and serial -> arm init in parallel (see BootSequence). The
+    arm only initializes and homes once the camera (or the vision process) is
+    up, so a failed camera leaves it where it is.
+    Returns (cap, tracker, ser, controller); cap is None if the camera failed,
+    and controller is None then too.
+    With VISION_PROCESS the camera and models live in the child: tracker is the
+    VisionProcess (None if it failed to start) and cap is None.
+    """
+    def load_models():
+        set_status("LOADING MODELS")
+        tracker = VisionTracker(FD_XML, LM_XML)
+        tracker.warmup()
+        return tracker
+
+    def init_arm(ser, camera):
+        if camera is None:
+            print("[SERIAL] No camera, arm init skipped")
+            return None
+        controller = RoArmController(ser=ser)
+        arm_safe_initialize(ser, controller)
+        return controller
+
+    def start_vision():
+        set_status("STARTING VISION PROCESS")
+        vision = VisionProcess()
+        return vision if vision.start() else None
+
+    boot = BootSequence(parallel=STARTUP_PARALLEL)
+    if VISION_PROCESS:
+        boot.add("vision", start_vision)
+    else:
+        boot.add("camera", init_camera)
+        boot.add("models", load_models)
+    boot.add("serial", init_serial_only)
+    boot.add("arm_init", init_arm, deps=("serial", "vision" if VISION_PROCESS else "camera"))
+    boot.start()
+
+    try:
+        if VISION_PROCESS:
+            cap, tracker = None, boot.wait("vision")
+        else:
+            cap = boot.wait("camera")
+            tracker = boot.wait("models")
+        ser = boot.wait("serial")
+        controller = boot.wait("arm_init")
+    finally:
+        if STARTUP_TIMELINE:
+            boot.report()
+
+    return cap, tracker, ser, controller
+
+# ============================================================
+# BLACK BOX RECORDER
+# ============================================================
+
+class BlackBoxRecorder:
+    """
+    Keeps the last BLACKBOX_SECONDS of preview frames (HUD included) plus the
+    Measurement and commanded XYZ of each frame, so a misbehaving demo can be
+    looked at afterwards.
+
+    main() only calls submit(), which never waits: the frame reference goes
+    into a bounded queue (BLACKBOX_QUEUE) or, if the encoder is behind, is
+    dropped and counted. The encoder thread resizes, encodes short segments
+    (BLACKBOX_SEGMENT_SEC, video + JSON lines sidecar) into ring/ and deletes
+    the oldest beyond BLACKBOX_SECONDS.
+
+    freeze() (TCP FREEZE) or fault() (camera trouble, command jumps, crash)
+    keeps recording for BLACKBOX_POST_SEC, then moves the ring into its own
+    clip_<time>/ folder with a manifest.json; a fresh ring starts after it.
+    """
+
+    STOP = object()
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=BLACKBOX_QUEUE)
+        self.freezes = queue.SimpleQueue()
+        self.thread = None
+        self.dropped = 0               # main thread
+        self.last_submit = 0.0
+        self.last_fault = -1e9
+        self.last_xyz = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.ring_dir = os.path.join(BLACKBOX_DIR, "ring")
+        shutil.rmtree(self.ring_dir, ignore_errors=True)     # leftovers of the last run; clips are kept
+        os.makedirs(self.ring_dir, exist_ok=True)
+        self.queue = queue.Queue(maxsize=BLACKBOX_QUEUE)
+        self.thread = threading.Thread(target=self._encoder_loop, name="blackbox", daemon=True)
+        self.thread.start()
+        log.info("BLACKBOX", f"Recording last {BLACKBOX_SECONDS:.0f}s at {BLACKBOX_FPS:g} fps into {BLACKBOX_DIR}/")
+
+    def due(self, t):
+        """True if submit() would take a frame captured at t."""
+        return self.thread is not None and t - self.last_submit >= 1.0 / BLACKBOX_FPS
+
+    def submit(self, frame, meas, xyz, t):
+        """Preview thread, once per frame it draws. Never blocks."""
+        if not self.due(t):
+            return
+        self.last_submit = t
+        try:
+            self.queue.put_nowait((frame, meas, xyz, t))
+        except queue.Full:
+            self.dropped += 1
+            metrics.blackbox_dropped += 1
+            log.info("BLACKBOX DROP", f"Encoder behind, dropped frame ({self.dropped} total)")
+
+    def check_jump(self, xyz):
+        """Called per control tick with the commanded XYZ; a big jump is a fault."""
+        if self.last_xyz is not None and math.dist(xyz, self.last_xyz) > BLACKBOX_FAULT_JUMP_MM:
+            self.fault(f"command jump {math.dist(xyz, self.last_xyz):.0f} mm")
+        self.last_xyz = xyz
+
+    def freeze(self, reason):
+        """Thread-safe. False if the recorder is not running."""
+        if not self.running:
+            return False
+        self.freezes.put((reason, time.monotonic()))
+        log.info("BLACKBOX", f"Freeze requested: {reason}")
+        return True
+
+    def fault(self, reason):
+        now = time.monotonic()
+        if now - self.last_fault < BLACKBOX_FAULT_COOLDOWN_SEC:
+            return False
+        self.last_fault = now
+        return self.freeze(f"fault: {reason}")
+
+    def close(self, timeout=5.0):
+        """Flushes what is queued (and a pending freeze, without the post-trigger time)."""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(self.STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+
+    # ---- encoder thread ----
+
+    def _encoder_loop(self):
+        sched_thread("io")
+        self.segments = deque()        # dicts: video, meta, frames, t0, dropped_at_start
+        self.seg = None
+        self.seg_index = 0
+        pending = None                 # (reason, freeze at)
+        while True:
+            try:
+                item = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                item = None
+
+            if pending is None:
+                try:
+                    reason, t_req = self.freezes.get_nowait()
+                    pending = (reason, t_req + BLACKBOX_POST_SEC)
+                except queue.Empty:
+                    pass
+
+            if item is self.STOP:
+                self._close_segment()
+                if pending is not None:
+                    self._freeze_clip(pending[0])
+                return
+            if item is not None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    log.error("BLACKBOX", f"Encoder failed, recorder stopped: {e!r}")
+                    self._close_segment()
+                    return
+
+            if pending is not None and time.monotonic() >= pending[1]:
+                self._close_segment()
+                self._freeze_clip(pending[0])
+                pending = None
+
+    def _write(self, frame, meas, xyz, t):
+        if BLACKBOX_SCALE != 1.0:
+            frame = cv2.resize(frame, None, fx=BLACKBOX_SCALE, fy=BLACKBOX_SCALE, interpolation=cv2.INTER_AREA)
+        if self.seg is None or t - self.seg["t0"] >= BLACKBOX_SEGMENT_SEC:
+            self._close_segment()
+            self._open_segment(frame, t)
+        self.seg["writer"].write(frame)
+        record = {"t": round(t, 4), **{k: v for k, v in vars(meas).items() if k != "t_capture"},
+                  "xyz": [round(v, 1) for v in xyz]}
+        self.seg["meta_file"].write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.seg["frames"] += 1
+        metrics.blackbox_frames += 1
+
+    def _open_segment(self, frame, t):
+        self.seg_index += 1
+        base = os.path.join(self.ring_dir, f"seg_{self.seg_index:06d}")
+        H, W = frame.shape[:2]
+        writer = cv2.VideoWriter(base + ".avi", cv2.VideoWriter_fourcc(*BLACKBOX_FOURCC), BLACKBOX_FPS, (W, H))
+        self.seg = {"video": base + ".avi", "meta": base + ".jsonl", "writer": writer,
+                    "meta_file": open(base + ".jsonl", "w"), "frames": 0, "t0": t, "dropped_at_start": self.dropped}
+
+    def _close_segment(self):
+        if self.seg is None:
+            return
+        self.seg["writer"].release()
+        self.seg["meta_file"].close()
+        seg = {k: v for k, v in self.seg.items() if k not in ("writer", "meta_file")}
+        seg["dropped"] = self.dropped - seg.pop("dropped_at_start")
+        self.segments.append(seg)
+        self.seg = None
+        keep = max(1, int(math.ceil(BLACKBOX_SECONDS / BLACKBOX_SEGMENT_SEC)))
+        while len(self.segments) > keep:
+            old = self.segments.popleft()
+            for path in (old["video"], old["meta"]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _freeze_clip(self, reason):
+        if not self.segments:
+            log.warn("BLACKBOX", f"Nothing recorded yet, no clip for: {reason}")
+            return
+        clip_dir = os.path.join(BLACKBOX_DIR, time.strftime("clip_%Y%m%d_%H%M%S"))
+        os.makedirs(clip_dir, exist_ok=True)
+        segments = list(self.segments)
+        self.segments.clear()
+        for seg in segments:
+            for key in ("video", "meta"):
+                dst = os.path.join(clip_dir, os.path.basename(seg[key]))
+                os.replace(seg[key], dst)
+                seg[key] = os.path.basename(dst)
+
+        frames = sum(seg["frames"] for seg in segments)
+        dropped = sum(seg["dropped"] for seg in segments)
+        manifest = {
+            "reason": reason,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "profile": PROFILE,
+            "fps": BLACKBOX_FPS,
+            "frames": frames,
+            "dropped": dropped,
+            "segments": segments,
+        }
+        with open(os.path.join(clip_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        metrics.blackbox_clips += 1
+        log.warn("BLACKBOX", f"Froze {frames} frames ({dropped} dropped) to {clip_dir}: {reason}")
+
+        clips = sorted(d for d in os.listdir(BLACKBOX_DIR) if d.startswith("clip_"))
+        for old in clips[:max(0, len(clips) - BLACKBOX_MAX_CLIPS)]:
+            shutil.rmtree(os.path.join(BLACKBOX_DIR, old), ignore_errors=True)
+
+blackbox = BlackBoxRecorder()
+
+# ============================================================
+# TICK LOG
+# ============================================================
+
+# One row per control tick. NaN / -1 where there was nothing (no face, no send).
+# Changing this changes the file format: readers take the dtype from session.json.
+TICK_DTYPE = np.dtype([
+    ("t", "f8"),                   # monotonic, same clock as t_capture
+    ("dt", "f4"),
+    ("t_capture", "f8"),
+    ("t_infer_done", "f8"),
+    ("t_written", "f8"),           # serial write time if a command went out
+    ("manual", "?"),
+    ("face_ok", "?"),
+    ("tracking", "?"),
+    ("locked", "?"),
+    ("paused", "?"),
+    ("controlled", "?"),           # PID stepped this tick
+    ("sent", "?"),
+    ("track_id", "i4"),
+    ("n_faces", "u1"),
+    ("target_cx", "f4"),
+    ("target_cy", "f4"),
+    ("ipd_px", "f4"),
+    ("raw_dist_cm", "f4"),
+    ("dist_cm", "f4"),
+    ("ex", "f4"),
+    ("ey", "f4"),
+    ("ed_cm", "f4"),
+    ("pid_out", "f4", (3,)),       # x, y, z velocities from the last PID step
+    ("integral", "f4", (3,)),
+    ("d_filt", "f4", (3,)),
+    ("cmd", "f4", (3,)),           # commanded x, y, z (mm) after this tick
+    ("params_version", "u4"),
+])
+
+def _nan(v):
+    return math.nan if v is None else v
+
+class TickLog:
+    """
+    Appends every control tick to TICKLOG_DIR/<run>/chunk_NNNN.ticks, raw
+    TICK_DTYPE records, so a chunk can be opened with np.memmap (open_ticks())
+    even while it is still being written or after a crash.
+
+    record() is the only per-tick cost on the control thread: one tuple into a
+    preallocated structured array. Full buffers (or partial ones after
+    TICKLOG_FLUSH_SEC) go to the writer thread, which writes them in one call
+    and hands the buffer back for reuse. If the writer falls
+    TICKLOG_MAX_PENDING buffers behind, ticks are dropped and counted.
+    """
+
+    STOP = object()
+
+    def __init__(self):
+        self.thread = None
+        self.dropped = 0
+        self.rows = 0
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self):
+        self.dir = os.path.join(TICKLOG_DIR, time.strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(self.dir, exist_ok=True)
+        session = {
+            "dtype": np.lib.format.dtype_to_descr(TICK_DTYPE),
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "t0_wall": time.time(),
+            "t0_monotonic": time.monotonic(),
+            "profile": PROFILE,
+            "limits": {"X_MIN": X_MIN, "X_MAX": X_MAX, "Y_MIN": Y_MIN, "Y_MAX": Y_MAX, "Z_MIN": Z_MIN, "Z_MAX": Z_MAX},
+            "min_send_delta_mm": MIN_SEND_DELTA_MM,
+            "chunk_rows": TICKLOG_CHUNK_ROWS,
+        }
+        with open(os.path.join(self.dir, "session.json"), "w") as f:
+            json.dump(session, f, indent=2)
+
+        self.queue = queue.SimpleQueue()
+        self.free = queue.SimpleQueue()
+        self.buf = np.zeros(TICKLOG_BUFFER_ROWS, dtype=TICK_DTYPE)
+        self.n = 0
+        self.last_handoff = time.monotonic()
+        self.params_version = -1
+        self.thread = threading.Thread(target=self._writer_loop, name="ticklog", daemon=True)
+        self.thread.start()
+        log.info("TICKLOG", f"Logging control ticks to {self.dir}/")
+
+    def record(self, t, dt, meas, controller, p, mode, tracking, locked, paused, controlled, t_written):
+        """Control thread, once per tick."""
+        if p.version != self.params_version:
+            self.params_version = p.version
+            self.queue.put(("params", {"t": t, **params.as_dict(p), "version": p.version}))   # p, not the newest
+        integral, d_filt = controller.pid_state()
+        self.buf[self.n] = (
+            t, dt, _nan(meas.t_capture), _nan(meas.t_infer_done), _nan(t_written),
+            mode == "MANUAL", meas.face_ok, tracking, locked, paused, controlled, t_written is not None,
+            -1 if meas.track_id is None else meas.track_id, meas.n_faces,
+            _nan(meas.target_cx), _nan(meas.target_cy), _nan(meas.ipd_px), _nan(meas.raw_dist_cm),
+            _nan(meas.dist_cm), _nan(meas.ex), _nan(meas.ey), _nan(meas.ed_cm),
+            controller.pid_out, integral, d_filt, (controller.x_cmd, controller.y_cmd, controller.z_cmd),
+            p.version,
+        )
+        self.n += 1
+        if self.n == TICKLOG_BUFFER_ROWS or t - self.last_handoff >= TICKLOG_FLUSH_SEC:
+            self._handoff(t)
+
+    def _handoff(self, t):
+        self.last_handoff = t
+        if self.n == 0:
+            return
+        if self.queue.qsize() >= TICKLOG_MAX_PENDING:
+            self.dropped += self.n
+            log.info("TICKLOG DROP", f"Writer behind, dropped {self.n} ticks ({self.dropped} total)")
+        else:
+            self.queue.put(("rows", self.buf, self.n))
+            try:
+                self.buf = self.free.get_nowait()
+            except queue.Empty:
+                self.buf = np.zeros(TICKLOG_BUFFER_ROWS, dtype=TICK_DTYPE)
+        self.n = 0
+
+    def close(self, timeout=5.0):
+        if self.thread is None:
+            return
+        self._handoff(time.monotonic())
+        self.queue.put(self.STOP)
+        self.thread.join(timeout)
+        self.thread = None
+        log.info("TICKLOG", f"Closed {self.dir}: {self.rows} ticks, {self.dropped} dropped")
+
+    # ---- writer thread ----
+
+    def _writer_loop(self):
+        sched_thread("io")
+        chunk, chunk_rows, f = 0, 0, None
+        try:
+            while True:
+                item = self.queue.get()
+                if item is self.STOP:
+                    return
+                kind, *payload = item
+                if kind == "params":
+                    with open(os.path.join(self.dir, "params.jsonl"), "a") as pf:
+                        pf.write(json.dumps(payload[0]) + "\n")
+                    continue
+
+                buf, n = payload
+                start = 0
+                while start < n:
+                    if f is None or chunk_rows == TICKLOG_CHUNK_ROWS:
+                        if f is not None:
+                            f.close()
+                            chunk += 1
+                        f = open(os.path.join(self.dir, f"chunk_{chunk:04d}.ticks"), "ab")
+                        chunk_rows = 0
+                    take = min(n - start, TICKLOG_CHUNK_ROWS - chunk_rows)
+                    buf[start:start + take].tofile(f)
+                    chunk_rows += take
+                    start += take
+                f.flush()
+                self.rows += n
+                self.free.put(buf)
+        except Exception as e:
+            log.error("TICKLOG", f"Writer failed, tick log stopped: {e!r}")
+        finally:
+            if f is not None:
+                f.close()
+
+ticklog = TickLog()
+
+def open_ticks(run_dir):
+    """
+    (session dict, [np.memmap per chunk]) for a TickLog run folder, read-only.
+    A torn last record (crash mid-write) is left out.
+    """
+    with open(os.path.join(run_dir, "session.json"), "r") as f:
+        session = json.load(f)
+    # JSON turned the descr tuples (and sub-array shapes) into lists
+    dtype = np.lib.format.descr_to_dtype([tuple(tuple(x) if isinstance(x, list) else x for x in d)
+                                          for d in session["dtype"]])
+    chunks = []
+    for name in sorted(os.listdir(run_dir)):
+        if not name.endswith(".ticks"):
+            continue
+        path = os.path.join(run_dir, name)
+        rows = os.path.getsize(path) // dtype.itemsize
+        if rows:
+            chunks.append(np.memmap(path, dtype=dtype, mode="r", shape=(rows,)))
+    return session, chunks
+
+# ============================================================
+# VISION PROCESS
+# ============================================================
+
+# One ring slot: a Measurement (NaN / -1 for None) plus what the main process
+# needs from the worker's tracker (track view for the HUD and TRACKS) and counters.
+VISION_SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"), ("frame_ok", "?"), ("face_ok", "?"), ("held", "?"),
+    ("bbox", "<i4", (4,)), ("face_score", "<f4"), ("track_id", "<i4"), ("n_faces", "<i2"),
+    ("target_cx", "<f8"), ("target_cy", "<f8"), ("view_cx", "<f8"), ("view_cy", "<f8"),
+    ("ipd_px", "<f8"), ("raw_dist_cm", "<f8"), ("dist_cm", "<f8"),
+    ("ex", "<f8"), ("ey", "<f8"), ("ed_cm", "<f8"),
+    ("t_capture", "<f8"), ("t_infer_done", "<f8"),
+    ("locked_id", "<i4"), ("n_view", "<i2"),
+    ("view_id", "<i4", (TRACK_MAX_FACES,)), ("view_box", "<i4", (TRACK_MAX_FACES, 4)),
+    ("view_flags", "u1", (TRACK_MAX_FACES,)),            # bit 0 seen this frame, bit 1 locked
+    ("detector_calls", "<u8"), ("landmark_calls", "<u8"), ("target_switches", "<u8"),
+    ("governor_level", "u1"), ("governor_changes", "<u8"),
+])
+_MEAS_FLOATS = ("target_cx", "target_cy", "view_cx", "view_cy", "ipd_px", "raw_dist_cm", "dist_cm",
+                "ex", "ey", "ed_cm", "t_infer_done")
+_RING_HEADER = 64                  # bytes; the latest published seq lives at offset 0
+
+def _ring_layout(slots, frame_shape):
+    """(offset of the result slots, offset of the frames, total bytes) of the shared block."""
+    results = _RING_HEADER
+    frames = results + -(-slots * VISION_SLOT_DTYPE.itemsize // 64) * 64
+    return results, frames, frames + slots * int(np.prod(frame_shape))
+
+def _ring_views(buf, slots, frame_shape):
+    results, frames, _ = _ring_layout(slots, frame_shape)
+    latest = np.ndarray((1,), dtype="<u8", buffer=buf, offset=0)
+    ring = np.ndarray((slots,), dtype=VISION_SLOT_DTYPE, buffer=buf, offset=results)
+    images = np.ndarray((slots,) + tuple(frame_shape), dtype=np.uint8, buffer=buf, offset=frames)
+    return latest, ring, images
+
+def open_vision_source():
+    """Camera + models for the vision process, overlapped like boot_system does it. Returns (cap, tracker)."""
+    def load_models():
+        tracker = VisionTracker(FD_XML, LM_XML)
+        tracker.warmup()
+        return tracker
+
+    boot = BootSequence(parallel=STARTUP_PARALLEL)
+    boot.add("camera", init_camera)
+    boot.add("models", load_models)
+    boot.start()
+    try:
+        return boot.wait("camera"), boot.wait("models")
+    finally:
+        if STARTUP_TIMELINE:
+            boot.report()
+
+def vision_worker(settings, make_source, conn, commands, locks, slots):
+    """
+    Child process body: capture, mirror, tracker.process(), then publish frame +
+    Measurement into the next ring slot. Settings, params, filter resets and
+    TARGET requests come from the main process; it never waits on the main loop.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)     # Ctrl+C stops the main process, which sends "stop"
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))    # terminate() still unlinks the ring
+    module = sys.modules[__name__]
+    for key, value in settings.items():
+        setattr(module, key, value)
+    params.reset()
+    sched_thread("vision")
+    governor.name = "vision"
+
+    shm = None
+    cap = None
+    try:
+        cap, tracker = make_source()
+        ok, frame = (False, None) if cap is None else cap.read()
+        if not ok or frame is None:
+            conn.send(("error", "camera failed"))
+            return
+        if MIRROR_VIEW:
+            frame = cv2.flip(frame, 1)
+        size = _ring_layout(slots, frame.shape)[2]
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        latest, ring, images = _ring_views(shm.buf, slots, frame.shape)
+        latest[0] = 0
+        ring["seq"] = 0
+        conn.send(("ready", shm.name, frame.shape))
+
+        seq = 0
+        seen_params_version = -1
+        f_pixels = None
+        running = True
+        while running:
+            while True:
+                try:
+                    cmd = commands.get_nowait()
+                except queue.Empty:
+                    break
+                if cmd[0] == "stop":
+                    running = False
+                elif cmd[0] == "params":
+                    params.update(cmd[1], source="main process")
+                elif cmd[0] == "reset":
+                    tracker.reset_filters()
+                elif cmd[0] == "target" and tracker.faces is not None:
+                    tracker.faces.request(cmd[1])
+            if not running:
+                break
+
+            ok, frame = cap.read()
+            t_capture = time.monotonic()
+            t_work = time.perf_counter()
+            meas = None
+            if ok and frame is not None:
+                if MIRROR_VIEW:
+                    frame = cv2.flip(frame, 1)
+                p = params.snapshot
+                if p.version != seen_params_version:
+                    seen_params_version = p.version
+                    f_pixels = (frame.shape[1] / 2.0) / math.tan(math.radians(p.fov_deg) / 2.0)
+                meas = tracker.process(frame, f_pixels, t_capture, p)
+
+            seq += 1
+            k = seq % slots
+            with locks[k]:
+                rec = ring[k]
+                rec["frame_ok"] = meas is not None
+                if meas is not None:
+                    images[k] = frame
+                    _store_measurement(rec, meas, tracker.faces)
+                rec["seq"] = seq
+            latest[0] = seq
+            if meas is None:
+                time.sleep(CAMERA_FAIL_RETRY_SLEEP_SEC)
+            else:
+                governor.end_frame(1000.0 * (time.perf_counter() - t_work))
+    except Exception as e:
+        try:
+            conn.send(("error", repr(e)))
+        except (OSError, ValueError):
+            pass
+        raise
+    finally:
+        if cap is not None:
+            cap.release()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+def _store_measurement(rec, meas, tracks):
+    rec["face_ok"] = meas.face_ok
+    rec["held"] = meas.held
+    rec["bbox"] = meas.bbox if meas.bbox is not None else (-1, -1, -1, -1)
+    rec["face_score"] = meas.face_score
+    rec["track_id"] = -1 if meas.track_id is None else meas.track_id
+    rec["n_faces"] = meas.n_faces
+    for name in _MEAS_FLOATS:
+        rec[name] = _nan(getattr(meas, name))
+    rec["t_capture"] = meas.t_capture
+    if tracks is not None:
+        view = tracks.view[:TRACK_MAX_FACES]
+        n = len(view)
+        rec["locked_id"] = -1 if tracks.locked_id is None else tracks.locked_id
+        rec["n_view"] = n
+        if n:
+            rec["view_id"][:n] = [v[0] for v in view]
+            rec["view_box"][:n] = [v[1] for v in view]
+            rec["view_flags"][:n] = [int(v[2]) | (int(v[3]) << 1) for v in view]
+    rec["detector_calls"] = metrics.detector_calls
+    rec["landmark_calls"] = metrics.landmark_calls
+    rec["target_switches"] = metrics.target_switches
+    rec["governor_level"] = metrics.governor_level["vision"]
+    rec["governor_changes"] = metrics.governor_changes["vision"]
+
+def _load_measurement(rec):
+    meas = Measurement(face_ok=bool(rec["face_ok"]), face_score=float(rec["face_score"]),
+                       n_faces=int(rec["n_faces"]), t_capture=float(rec["t_capture"]), held=bool(rec["held"]))
+    if meas.face_ok:
+        meas.bbox = tuple(int(v) for v in rec["bbox"])
+    if rec["track_id"] >= 0:
+        meas.track_id = int(rec["track_id"])
+    for name in _MEAS_FLOATS:
+        v = float(rec[name])
+        if not math.isnan(v):
+            setattr(meas, name, v)
+    return meas
+
+class VisionProcess:
+    """
+    VISION_PROCESS: capture + inference in a child process (vision_worker), so
+    the main loop, socket threads and preview don't share the GIL with the
+    detector's Python pre/post-processing.
+
+    The child publishes into a shared-memory ring of VISION_RING_SLOTS slots,
+    each a frame plus a VISION_SLOT_DTYPE record, and then bumps the `latest`
+    sequence counter. read() takes the newest slot; a slot's lock is only held
+    for the copy in or out (never across inference), and the slot's own seq
+    shows whether it was overwritten in the meantime. Results the main loop
+    was too slow to read are counted, not queued.
+
+    Stands in for VisionTracker in the main loop: `faces` mirrors the child's
+    track view (so TARGET / TRACKS / the HUD work unchanged, requests are
+    forwarded), `lens` is there for the preview, reset_filters() is forwarded,
+    and params changes are sent along on the next read().
+    """
+
+    def __init__(self, make_source=open_vision_source, slots=None):
+        self.make_source = make_source
+        self.slots = VISION_RING_SLOTS if slots is None else slots
+        self.ctx = multiprocessing.get_context("spawn")    # no fork of a process with threads running
+        self.commands = self.ctx.Queue()
+        self.locks = [self.ctx.Lock() for _ in range(self.slots)]
+        self.proc = None
+        self.shm = None
+        self.frame_shape = None
+        self.seq = 0
+        self.params_version = -1
+        self.params_sent = {}           # the first read() sends everything (covers a loaded TUNING_FILE)
+        self.reset_sent = False
+        self.faces = faces if MULTI_FACE_TRACKING else None
+        self.lens = None
+
+    def start(self, timeout=None):
+        """Starts the child and waits until its camera and models are up. Returns True when ready."""
+        timeout = VISION_START_TIMEOUT_SEC if timeout is None else timeout
+        settings = {k: v for k, v in globals().items()
+                    if k.isupper() and isinstance(v, (bool, int, float, str, tuple, list, dict, type(None)))}
+        parent_conn, child_conn = self.ctx.Pipe(duplex=False)
+        self.proc = self.ctx.Process(target=vision_worker, name="roarm-vision", daemon=True,
+                                     args=(settings, self.make_source, child_conn, self.commands,
+                                           self.locks, self.slots))
+        self.proc.start()
+        child_conn.close()
+        if LENS_UNDISTORT:
+            self.lens = LensModel.from_profile(load_camera_profile(CAMERA_PROFILE))
+
+        if not parent_conn.poll(timeout):
+            print(f"[VISION] Worker not ready after {timeout:.0f}s")
+            self.close()
+            return False
+        try:
+            msg = parent_conn.recv()
+        except EOFError:
+            msg = ("error", f"worker exited with code {self.proc.exitcode}")
+        if msg[0] != "ready":
+            print(f"[VISION] Worker failed: {msg[1]}")
+            self.close()
+            return False
+        _, name, self.frame_shape = msg
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.latest, self.ring, self.images = _ring_views(self.shm.buf, self.slots, self.frame_shape)
+        print(f"[VISION] Worker pid {self.proc.pid}: {self.frame_shape[1]}x{self.frame_shape[0]}, "
+              f"{self.slots} ring slots ({self.shm.size / 1e6:.1f} MB)")
+        return True
+
+    def _send_updates(self):
+        p = params.snapshot
+        if p.version != self.params_version:
+            self.params_version = p.version
+            current = params.as_dict()
+            changed = {k: v for k, v in current.items() if self.params_sent.get(k) != v}
+            self.params_sent = current
+            if changed:
+                self.commands.put(("params", changed))
+        if self.faces is not None:
+            while True:
+                try:
+                    self.commands.put(("target", self.faces.requests.get_nowait()))
+                except queue.Empty:
+                    break
+
+    def reset_filters(self):
+        if not self.reset_sent:
+            self.commands.put(("reset",))
+            self.reset_sent = True
+
+    def read(self, timeout=None):
+        """
+        Next result after the last one read -> (ok, frame, meas). ok is False on
+        a failed camera read in the child or when nothing arrives within timeout
+        (VISION_STALL_SEC by default). The frame is a private copy. Raises
+        RuntimeError if the child has died.
+        """
+        timeout = VISION_STALL_SEC if timeout is None else timeout
+        self._send_updates()
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = int(self.latest[0])
+            if seq == self.seq:
+                if not self.proc.is_alive():
+                    raise RuntimeError(f"vision process exited with code {self.proc.exitcode}")
+                if time.monotonic() >= deadline:
+                    return False, None, None
+                time.sleep(VISION_POLL_SEC)
+                continue
+            k = seq % self.slots
+            with self.locks[k]:
+                rec = self.ring[k].copy()
+                if rec["seq"] != seq:
+                    continue                  # overwritten since `latest` was read; take the newer one
+                frame = self.images[k].copy() if rec["frame_ok"] else None
+            break
+
+        metrics.vision_skipped += seq - self.seq - 1
+        self.seq = seq
+        if not rec["frame_ok"]:
+            return False, None, None
+
+        meas = _load_measurement(rec)
+        if meas.face_ok:
+            self.reset_sent = False
+        metrics.detector_calls = int(rec["detector_calls"])
+        metrics.landmark_calls = int(rec["landmark_calls"])
+        metrics.target_switches = int(rec["target_switches"])
+        metrics.governor_level["vision"] = int(rec["governor_level"])
+        metrics.governor_changes["vision"] = int(rec["governor_changes"])
+        if self.faces is not None:
+            n = int(rec["n_view"])
+            self.faces.view = [(int(i), tuple(b), bool(f & 1), bool(f & 2))
+                               for i, b, f in zip(rec["view_id"][:n].tolist(), rec["view_box"][:n].tolist(),
+                                                  rec["view_flags"][:n].tolist())]
+            self.faces.locked_id = None if rec["locked_id"] < 0 else int(rec["locked_id"])
+        return True, frame, meas
+
+    def close(self):
+        if self.proc is not None and self.proc.is_alive():
+            self.commands.put(("stop",))
+            self.proc.join(timeout=5.0)
+            if self.proc.is_alive():
+                self.proc.terminate()
+                self.proc.join(timeout=2.0)
+        if self.shm is not None:
+            self.latest = self.ring = self.images = None
+            self.shm.close()
+            try:
+                self.shm.unlink()       # normally done by the child; not if it was killed
+            except FileNotFoundError:
+                pass
+            self.shm = None
+
+# ============================================================
+# PREVIEW
+# ============================================================
+
+@dataclass
+class HudState:
+    """Everything the preview draws besides the frame, captured by the main loop."""
+    meas: Measurement
+    tracks: list                   # MultiFaceTracker.view, or None
+    p: TuningParams
+    mode: str
+    locked: bool
+    paused: bool
+    gyro_cmd: str
+    xyz: tuple
+    fps: float
+    shed: int
+    tracking: bool
+    status: str
+    latency: str
+    t_capture: float
+
+class HudText:
+    """
+    HUD text lines that stay the same from frame to frame are rendered once
+    into a small patch + mask and stamped with a masked copy; a line whose text
+    just changed is drawn with putText as before, and becomes a patch once it
+    repeats. Same pixels as putText with LINE_8, the OpenCV 4 default. OpenCV 5
+    anti-aliases its text, which a stamped patch cannot blend, so there every
+    line goes straight to putText.
+    """
+
+    def __init__(self):
+        self.lines = {}                # name -> (key, patch, mask, x0, y0), patch None until the text repeats
+        self.stamp = None              # resolved on the first draw, so importing the engine doesn't load cv2
+
+    def draw(self, frame, name, text, org, scale, color, thickness):
+        if self.stamp is None:
+            self.stamp = not getattr(cv2, "__version__", "4").startswith("5")
+        key = (text, org, scale, color, thickness)
+        line = self.lines.get(name)
+        if not self.stamp or line is None or line[0] != key:
+            self.lines[name] = (key, None, None, 0, 0)
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_8)
+            return
+        if line[1] is None:
+            line = self.lines[name] = (key,) + self._render(text, org, scale, color, thickness)
+        _, patch, mask, x0, y0 = line
+        H, W = frame.shape[:2]
+        h, w = mask.shape
+        fx0, fy0, fx1, fy1 = max(x0, 0), max(y0, 0), min(x0 + w, W), min(y0 + h, H)
+        if fx0 < fx1 and fy0 < fy1:
+            sub = (slice(fy0 - y0, fy1 - y0), slice(fx0 - x0, fx1 - x0))
+            cv2.copyTo(patch[sub], mask[sub], frame[fy0:fy1, fx0:fx1])
+
+    @staticmethod
+    def _render(text, org, scale, color, thickness):
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        (w, h), baseline = cv2.getTextSize(text, font, scale, thickness)
+        pad = 2 * thickness + 2
+        mask = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+        cv2.putText(mask, text, (pad, pad + h), font, scale, 255, thickness, cv2.LINE_8)
+        patch = np.zeros(mask.shape + (3,), dtype=np.uint8)
+        patch[mask > 0] = color
+        return patch, mask, org[0] - pad, org[1] - h - pad
+
+class PreviewRenderer:
+    """
+    Draws the overlays + HUD and runs the preview window on its own thread, so
+    no putText / imshow / waitKey runs on the control loop. The main loop hands
+    over its newest frame (not copied: it is not touched again) and a HudState;
+    the thread takes the latest one whenever the window is due (PREVIEW_FPS) or
+    the black box wants a frame, draws on a copy, and queues window keys for
+    poll_key(). All HighGUI calls happen on this thread.
+    """
+
+    WINDOW = "RDK X5 - RoArm Controller"
+
+    def __init__(self):
+        self.pending = None
+        self.wake = threading.Event()
+        self.keys = queue.SimpleQueue()
+        self.thread = None
+        self.stopping = False
+        self.lens = None
+        self.hud = HudText()
+        self.t_shown = 0.0
+        self.shown = 0
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self, lens=None):
+        """After blackbox.start(): without a window or a recorder there is nothing to draw for."""
+        if self.thread is not None or not (SHOW_PREVIEW or blackbox.running):
+            return False
+        self.lens = lens
+        self.stopping = False
+        self.thread = threading.Thread(target=self._loop, name="preview", daemon=True)
+        self.thread.start()
+        return True
+
+    def submit(self, frame, hud):
+        """Main loop, once per frame. Never blocks; a frame not drawn yet is replaced."""
+        if self.thread is None:
+            return
+        self.pending = (frame, hud)    # single reference swap
+        self.wake.set()
+
+    def poll_key(self):
+        """Next key pressed in the preview window (0..255), or -1."""
+        try:
+            return self.keys.get_nowait()
+        except queue.Empty:
+            return -1
+
+    def close(self, timeout=2.0):
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.wake.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _loop(self):
+        sched_thread("io")
+        try:
+            while not self.stopping:
+                self.wake.wait(0.05)
+                self.wake.clear()
+                item, self.pending = self.pending, None
+                if item is None:
+                    if self.shown:
+                        self._poll_keys()     # keeps the window responsive while no frames come
+                    continue
+                frame, hud = item
+                now = time.monotonic()
+                show = SHOW_PREVIEW and now - self.t_shown >= 1.0 / PREVIEW_FPS
+                record = blackbox.due(hud.t_capture)
+                if not (show or record):
+                    continue
+
+                frame = self.draw(frame.copy(), hud)
+                if record:
+                    # after the HUD, so clips show what the preview showed
+                    blackbox.submit(frame, hud.meas, hud.xyz, hud.t_capture)
+                if show:
+                    self.t_shown = now
+                    if PREVIEW_SCALE != 1.0:
+                        frame = cv2.resize(frame, None, fx=PREVIEW_SCALE, fy=PREVIEW_SCALE,
+                                           interpolation=cv2.INTER_AREA)
+                    cv2.imshow(self.WINDOW, frame)
+                    self.shown += 1
+                    self._poll_keys()
+        finally:
+            if self.shown:
+                cv2.destroyAllWindows()
+
+    def _poll_keys(self):
+        key = cv2.waitKey(1) & 0xFF
+        if key != 0xFF:
+            self.keys.put(key)
+
+    def draw(self, frame, hud):
+        """Overlays + HUD; draws on frame and returns it (or the undistorted copy)."""
+        p, meas = hud.p, hud.meas
+        H, W = frame.shape[:2]
+        aim_x = int(W * p.aim_center_x_norm)
+        aim_y = int(H * p.aim_center_y_norm)
+
+        if hud.tracks is not None:
+            for track_id, (x0, y0, x1, y1), seen, locked in hud.tracks:
+                color = (0, 255, 0) if locked else ((160, 160, 160) if seen else (80, 80, 80))
+                if not locked:
+                    cv2.rectangle(frame, (x0, y0), (x1, y1), color, 1)
+                cv2.putText(frame, f"#{track_id}", (x0, max(12, y0 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+        if meas.face_ok and meas.bbox is not None:
+            x0, y0, x1, y1 = meas.bbox
+            cv2.rectangle(frame, (x0, y0), (x1, y1), (0, 255, 0), 2)
+
+        if meas.view_cx is not None and meas.view_cy is not None:
+            cv2.circle(frame, (int(meas.view_cx), int(meas.view_cy)), 6, (0, 255, 255), -1)
+
+        cv2.line(frame, (aim_x - 15, aim_y), (aim_x + 15, aim_y), (255, 0, 0), 2)
+        cv2.line(frame, (aim_x, aim_y - 15), (aim_x, aim_y + 15), (255, 0, 0), 2)
+
+        if PREVIEW_UNDISTORT and SHOW_PREVIEW and self.lens is not None:
+            # after the overlays (so they warp with the image), before the text
+            frame = self.lens.remap(frame, MIRROR_VIEW)
+
+        text = self.hud.draw
+        ui_color = (0, 255, 0) if hud.mode == "AUTO" else (0, 165, 255)
+        text(frame, "mode", f"MODE: {hud.mode}", (10, 30), 0.8, ui_color, 2)
+
+        if hud.locked:
+            text(frame, "locked", "LOCKED", (200, 30), 0.8, (0, 0, 255), 2)
+        if hud.paused:
+            text(frame, "paused", "PAUSED", (320, 30), 0.8, (0, 255, 255), 2)
+
+        if hud.mode == "MANUAL":
+            text(frame, "cmd", f"CMD: {hud.gyro_cmd}", (10, 60), 0.6, (255, 255, 255), 2)
+
+        x, y, z = hud.xyz
+        text(frame, "xyz", f"XYZ: {x:.0f}, {y:.0f}, {z:.0f}", (10, 90), 0.6, (255, 255, 255), 2)
+        text(frame, "fps", f"FPS: {hud.fps:.1f}" + (f"  SHED {hud.shed}" if hud.shed else ""),
+             (10, 120), 0.6, (255, 255, 0), 2)
+        text(frame, "track", f"TRACK: {'ON' if hud.tracking else 'OFF'}", (10, 150), 0.6,
+             (0, 255, 0) if hud.tracking else (0, 0, 255), 2)
+        text(frame, "status", f"STATUS: {hud.status}", (10, 180), 0.55, (200, 200, 200), 2)
+        text(frame, "aim", f"AIM: {p.aim_center_x_norm:.2f}, {p.aim_center_y_norm:.2f}",
+             (10, 210), 0.55, (200, 200, 200), 2)
+
+        if SHOW_DISTANCE_TEXT:
+            if meas.dist_cm is not None:
+                raw = "--" if meas.raw_dist_cm is None else f"{meas.raw_dist_cm:.1f}"
+                text(frame, "dist", f"DIST: {meas.dist_cm:.1f} cm (raw {raw})", (10, 240), 0.6, (0, 255, 255), 2)
+            else:
+                text(frame, "dist", "DIST: --", (10, 240), 0.6, (100, 100, 100), 2)
+
+        if hud.latency is not None:
+            text(frame, "latency", hud.latency, (10, 270), 0.55, (255, 200, 0), 2)
+
+        return frame
+
+preview = PreviewRenderer()
+
+# ============================================================
+# MAIN LOOP
+# ============================================================
+
+def main():
+    sock_thread = threading.Thread(target=command_server_thread, daemon=True)
+    sock_thread.start()
+
+    if METRICS_ENABLE:
+        start_metrics_server()
+
+    params.reset()    # pick up profile overrides
+    if TUNING_FILE:
+        params.watch_file()
+
+    cap, tracker, ser, controller = boot_system()
+    vision = tracker if VISION_PROCESS else None
+    if cap is None and vision is None:
+        set_status("CAMERA FAILED")
+        if ser is not None:
+            ser.close()
+        return
+
+    actual_w = vision.frame_shape[1] if vision is not None else int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+
+    capture_latency_ms = CAPTURE_LATENCY_MS
+    if LATENCY_CALIBRATION and vision is not None:
+        print("[LATENCY] Calibration needs the camera in this process; skipped with VISION_PROCESS")
+    elif LATENCY_CALIBRATION:
+        calibrated = calibrate_capture_latency(cap, ser)
+        if calibrated is not None:
+            capture_latency_ms = calibrated
+    latency = LatencyStats(capture_latency_ms=capture_latency_ms)
+
+    if BLACKBOX_ENABLE:
+        blackbox.start()
+    if TICKLOG_ENABLE:
+        ticklog.start()
+    if preview.start(lens=tracker.lens):
+        print(f"[PREVIEW] Drawing on its own thread, window at {PREVIEW_FPS:g} fps")
+
+    state.update(system_ready=True)
+    set_status("READY - HOLDING FOR FACE")
+
+    last_send = time.time()
+    face_missing_since = None
+    good_face_streak = 0
+    tracking_enabled = False
+    long_face_loss_home_done = False
+    fps_t0 = time.time()
+    fps_frames = 0
+    preview_fps = 0.0
+    camera_fail_streak = 0
+    seen_version = -1
+    seen_params_version = -1
+
+    sched_thread("control")     # after boot and after the background threads are started (they would inherit it)
+    print("\n[SYSTEM] Running. ESC quit, P pause/resume, N next face, F freeze black box.\n")
+
+    while True:
+        if vision is not None:
+            ok, frame, vision_meas = vision.read()
+            t_capture = vision_meas.t_capture if ok else time.monotonic()
+        else:
+            ok, frame = cap.read()
+            t_capture = time.monotonic()
+        if not ok or frame is None:
+            camera_fail_streak += 1
+            metrics.camera_failures += 1
+            log.info("CAMERA", f"Failed to read frame ({camera_fail_streak})")   # rate limited per tag
+            if camera_fail_streak >= MAX_CAMERA_FAIL_STREAK:
+                log.warn("CAMERA", f"{camera_fail_streak} failed reads in a row, holding position")
+                set_status("CAMERA UNSTABLE - HOLDING POSITION")
+                controller.reset_pid()
+                blackbox.fault("camera unstable")
+                camera_fail_streak = 0
+            time.sleep(CAMERA_FAIL_RETRY_SLEEP_SEC)
+            continue
+        camera_fail_streak = 0
+        metrics.frames += 1
+        t_work = time.perf_counter()
+
+        if MIRROR_VIEW and vision is None:    # the vision process hands over mirrored frames
+            frame = cv2.flip(frame, 1)
+
+        now = time.time()
+
+        fps_frames += 1
+        if now - fps_t0 >= 1.0:
+            preview_fps = fps_frames / (now - fps_t0)
+            fps_frames = 0
+            fps_t0 = now
+
+        p = params.snapshot
+        if p.version != seen_params_version:
+            seen_params_version = p.version
+            controller.apply_gains(p)
+            # Focal pixels from HFOV. 145 deg is very wide, so keep DIST_ESTIMATE_OFFSET_CM available for tuning.
+            f_pixels = (actual_w / 2.0) / math.tan(math.radians(p.fov_deg) / 2.0)
+
+        meas = vision_meas if vision is not None else tracker.process(frame, f_pixels, t_capture, p)
+
+        if meas.held:
+            pass                        # nothing new was seen: face streak and face-loss timers wait for a real detection
+        elif meas.face_ok:
+            good_face_streak += 1
+            face_missing_since = None
+            if good_face_streak >= TRACK_ENABLE_FACE_FRAMES:
+                tracking_enabled = True
+                long_face_loss_home_done = False
+        else:
+            if good_face_streak > 0:
+                metrics.face_lost_events += 1
+            good_face_streak = 0
+            if face_missing_since is None:
+                face_missing_since = now
+            missing_for = now - face_missing_since
+            if missing_for > TRACK_DISABLE_FACE_LOSS_SEC:
+                tracking_enabled = False
+                controller.reset_pid()
+            if missing_for > TRACK_RESET_FILTERS_SEC:
+                tracker.reset_filters()
+            if RETURN_HOME_ON_LONG_FACE_LOSS and missing_for > RETURN_HOME_FACE_LOSS_SEC and not long_face_loss_home_done:
+                controller.go_home(force_send=True)
+                long_face_loss_home_done = True
+
+        snap = state.snapshot
+        if snap.version != seen_version:
+            seen_version = snap.version
+            current_mode = snap.mode
+            current_locked = snap.locked
+            current_paused = snap.paused
+            current_gyro_cmd = snap.gyro_cmd
+            last_cmd_time = snap.last_cmd_time
+            system_ready = snap.system_ready
+
+        if current_mode == "MANUAL" and current_gyro_cmd != "STOP" and (time.time() - last_cmd_time > MANUAL_CMD_TIMEOUT_SEC):
+            current_gyro_cmd = "STOP"
+            # skipped if a fresh jog command landed since we read the snapshot
+            state.update(expect_version=snap.version, gyro_cmd="STOP")
+
+        # Zero-order hold while detection is shed: the last command stays and the send slot waits for
+        # the next real measurement (its dt then covers the held frames). Stepping the PID again on the
+        # same stale error would repeat its I / D action.
+        holding = meas.held and current_mode == "AUTO" and tracking_enabled and meas.face_ok
+        if now - last_send >= (1.0 / p.send_hz) and not holding:
+            dt = clamp(now - last_send, 1e-3, MAX_DT_SEC)
+            last_send = now
+
+            t_decision = t_written = None
+            if system_ready and not current_locked and not current_paused:
+                if current_mode == "AUTO":
+                    if tracking_enabled and meas.face_ok:
+                        controller.update_from_measurement(meas, dt)
+                        t_decision = time.monotonic()
+                        set_status("AUTO TRACKING")
+                    else:
+                        set_status("READY - HOLDING FOR FACE")
+                else:
+                    controller.reset_pid()
+                    controller.apply_manual_command(current_gyro_cmd)
+                    set_status(f"MANUAL - {current_gyro_cmd}")
+
+                t_written = controller.send_current(force=False)
+                if t_decision is not None and t_written is not None:
+                    latency.record(meas.t_capture, meas.t_infer_done, t_decision, t_written)
+                if blackbox.running:
+                    blackbox.check_jump((controller.x_cmd, controller.y_cmd, controller.z_cmd))
+            else:
+                controller.reset_pid()
+                if current_locked:
+                    set_status("LOCKED")
+                elif current_paused:
+                    set_status("PAUSED")
+
+            if ticklog.running:
+                ticklog.record(time.monotonic(), dt, meas, controller, p, current_mode, tracking_enabled,
+                               current_locked, current_paused, t_decision is not None, t_written)
+
+        latency.maybe_log(time.monotonic())
+        status_text = state.snapshot.status_text
+        publish_telemetry(controller, meas, tracking_enabled, preview_fps, current_mode, status_text)
+
+        # drawn and shown on the preview thread; handing over is all the control loop pays
+        if preview.running and governor.due("preview"):
+            t_preview = time.perf_counter()
+            preview.submit(frame, HudState(
+                meas=meas, tracks=None if tracker.faces is None else tracker.faces.view, p=p,
+                mode=current_mode, locked=current_locked, paused=current_paused, gyro_cmd=current_gyro_cmd,
+                xyz=(controller.x_cmd, controller.y_cmd, controller.z_cmd), fps=preview_fps,
+                shed=max(metrics.governor_level.values()), tracking=tracking_enabled, status=status_text,
+                latency=latency.hud_text() if SHOW_LATENCY_TEXT else None, t_capture=t_capture))
+            governor.record("preview", 1000.0 * (time.perf_counter() - t_preview))
+
+        if not SHOW_PREVIEW:
+            time.sleep(0.001)
+
+        key = preview.poll_key()
+        if key == 27:
+            break
+        elif key in [ord('p'), ord('P')]:
+            paused_now = state.toggle_paused().paused
+            controller.reset_pid()
+            if PAUSE_HOLDS_POSITION:
+                controller.send_current(force=True)
+            set_status("PAUSED" if paused_now else "RESUMED")
+        elif key in [ord('n'), ord('N')] and tracker.faces is not None:
+            tracker.faces.request("NEXT")
+        elif key in [ord('f'), ord('F')]:
+            blackbox.freeze("key F")
+
+        governor.end_frame(1000.0 * (time.perf_counter() - t_work))
+
+    if HOME_ON_EXIT:
+        controller.go_home(force_send=True)
+        time.sleep(0.5)
+
+    preview.close()
+    blackbox.close()
+    ticklog.close()
+    if vision is not None:
+        vision.close()
+    else:
+        cap.release()
+    if ser is not None:
+        ser.close()
+
+def install_log_dump_signal():
+    # kill -USR1 <pid> dumps the log ring without touching the arm; the handler runs on the
+    # control thread, so the file I/O goes to its own thread as with DUMPLOG
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(
+            target=log.dump, name="log-dump", daemon=True).start())
+
+def run():
+    install_log_dump_signal()
+    try:
+        main()
+    except BaseException as e:
+        if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+            log.error("MAIN", f"Crashed: {e!r}")
+            log.dump()
+            if blackbox.freeze(f"crash: {e!r}"):
+                blackbox.close()
+            ticklog.close()
+        raise
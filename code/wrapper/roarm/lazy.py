@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+Deferred imports for the heavy optional dependencies (cv2, openvino, serial).
+
+    cv2 = LazyModule("cv2")
+    cv2.VideoCapture(...)    # the real import happens here, once
+
+After the first lookup an attribute is cached on the proxy, so later
+cv2.putText / ov.Core calls cost the same as with a plain import.
+"""
+
+import importlib
+import threading
+import time
+
+# module name -> seconds spent importing it (first use only)
+import_times = {}
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()    # per module, so cv2 and openvino can import in parallel
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                t0 = time.perf_counter()
+                module = importlib.import_module(self._name)
+                import_times[self._name] = time.perf_counter() - t0
+                self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        # only called for names not cached yet
+        value = getattr(self._module or self._load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+def preload(*modules):
+    """Imports the given LazyModules now (e.g. during boot) and returns their import times."""
+    for m in modules:
+        m._load()
+    return {m._name: import_times.get(m._name, 0.0) for m in modules}
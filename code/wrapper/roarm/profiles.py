@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+Platform profiles: the settings that differ between the machines we run on.
+Anything not listed keeps the default from roarm/engine.py.
+
+Windows testing notes:
+- If your USB camera is not the default camera, try CAM_SOURCE = 1 or 2.
+- If COM3 is wrong, change SERIAL_PORT to your actual Arduino/RoArm COM port.
+- OpenVINO defaults to CPU here for laptop stability; you can switch later if needed.
+"""
+
+PROFILES = {
+    # RDK X5 on the arm
+    "rdk_x5": {
+        "DEVICE_FD": "NPU",
+        "DEVICE_LM": "NPU",
+        "SERIAL_PORT": "/dev/ttyUSB0",
+        "CAM_SOURCE": "/dev/v4l/by-path/platform-xhci-hcd.2.auto-usb-0:1.3:1.0-video-index0",
+        "CAM_BACKEND": "V4L2",
+        # 8 x A55; used with --set SCHED_ENABLE=True
+        "SCHED_PROFILE": {
+            "control": {"cpus": (7,), "fifo": 50, "nice": -10},
+            "vision": {"cpus": (4, 5, 6)},
+            "io": {"cpus": (0, 1, 2, 3), "nice": 5},
+        },
+    },
+    # Windows laptop + USB webcam
+    "windows": {
+        "DEVICE_FD": "CPU",
+        "DEVICE_LM": "CPU",
+        "SERIAL_PORT": "COM3",
+        "CAM_SOURCE": 0,               # webcam index
+        "CAM_BACKEND": "DSHOW",        # more stable on Windows
+    },
+    # any machine, no arm and no window: serial is never opened (or imported)
+    "headless": {
+        "TEST_MODE": True,
+        "SHOW_PREVIEW": False,
+        "DEVICE_FD": "CPU",
+        "DEVICE_LM": "CPU",
+        "CAM_SOURCE": 0,
+        "CAM_BACKEND": "ANY",
+    },
+}
+
+def apply_profile(name, **overrides):
+    """Sets the profile's values (plus any overrides) on roarm.engine. Returns the engine module."""
+    from . import engine
+
+    if name not in PROFILES:
+        raise ValueError(f"unknown profile {name!r}, expected one of {sorted(PROFILES)}")
+
+    settings = dict(PROFILES[name], **overrides)
+    for key, value in settings.items():
+        if not key.isupper() or not hasattr(engine, key):
+            raise ValueError(f"profile {name!r}: {key!r} is not an engine setting")
+        setattr(engine, key, value)
+
+    engine.PROFILE = name
+    return engine
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parameter sweep of the vision filters over cached network outputs.
+
+Replays the detector + landmark outputs saved by `batch_eval.py --detections`
+(no video decoding, no inference) through the same face pick (MultiFaceTracker
+or pick_best_face), VisionTracker's EMA / deadband chain and the main loop's
+face-loss logic (TRACK_ENABLE_FACE_FRAMES, TRACK_DISABLE_FACE_LOSS_SEC,
+TRACK_RESET_FILTERS_SEC), for every combination of a settings grid.
+
+Work is split so thousands of combinations stay cheap:
+  - settings that change which face is picked (FACE_CONF_THRESH, TRACK_IOU_MIN,
+    TARGET_LOST_SEC, ...) form groups; the pick is replayed once per group and file
+  - the filter / face-loss settings of a group are replayed together, one NumPy
+    array per state variable with a slot per combination
+  - (group, file) tasks run on a process pool
+
+Each combination is scored against a reference per file: the raw (unfiltered)
+target offset and distance, smoothed with a centered --ref-frames window (no lag).
+  lag     RMS of the filter output minus the reference while tracking
+  jitter  RMS of the second difference of the filter output (what the PID sees)
+for x (ex), y (ey) and distance (cm), plus the share of face frames that are
+tracked and tracking drops per minute. Ranking is by
+  score = mean(lag / baseline lag) + --jitter-weight * mean(jitter / baseline jitter)
+over the three axes, where the baseline is the recorded settings (score 2.0).
+"*" marks combinations on the lag / jitter Pareto front.
+
+Grid values: NAME=v1,v2,... or NAME=start:stop:count (inclusive linspace).
+
+Usage:
+    python batch_eval.py recordings/ --out cache.npz --detections 0.2
+    python vision_sweep.py cache.npz --grid EMA_TARGET_CX=0.1:0.6:11 --grid DEADBAND_EX=0,0.05,0.1
+    python vision_sweep.py cache.npz --grid EMA_DIST=0.1:0.5:9 --grid TARGET_LOST_SEC=0.5,1.5,3 --out sweep.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+import numpy as np
+
+from roarm import engine
+from roarm.engine import (
+    LENS_UNDISTORT, MULTI_FACE_TRACKING, TUNABLE_PARAMS, LensModel, MultiFaceTracker, load_camera_profile,
+    params, pick_best_face, radial_gain,
+)
+
+# module settings (not TUNABLE_PARAMS) the sweep can vary
+SETTINGS = {
+    "TRACK_ENABLE_FACE_FRAMES": int, "TRACK_DISABLE_FACE_LOSS_SEC": float, "TRACK_RESET_FILTERS_SEC": float,
+    "TRACK_IOU_MIN": float, "TRACK_CONFIRM_FRAMES": int, "TRACK_DROP_SEC": float, "TARGET_LOST_SEC": float,
+}
+# replayed side by side within a group; everything else changes the pick and makes a new group
+VECTOR = ["EMA_TARGET_CX", "EMA_TARGET_CY", "EMA_IPD", "EMA_DIST", "DEADBAND_EX", "DEADBAND_EY", "DEADBAND_ED_CM",
+          "TRACK_ENABLE_FACE_FRAMES", "TRACK_DISABLE_FACE_LOSS_SEC"]
+if MULTI_FACE_TRACKING:
+    VECTOR.append("TRACK_RESET_FILTERS_SEC")    # with the tracker, a filter reset does not touch the pick
+AXES = ("x", "y", "dist")
+ACCUMULATORS = [f"{kind}_{a}" for a in AXES for kind in ("lag_ss", "lag_n", "jit_ss", "jit_n")] + \
+               ["tracked", "drops"]
+
+# ============================================================
+# WORKER
+# ============================================================
+
+_files = None
+_base = None
+_lens = None
+_mirror = False
+_defaults = None
+
+def init_worker(cache, camera_profile):
+    """Loads the cache once per process and splits it into per-file columns."""
+    global _files, _base, _lens, _mirror, _defaults
+    _defaults = {name: getattr(engine, name) for name in SETTINGS}
+    data = np.load(cache)
+    meta = json.loads(str(data["meta"]))
+    _mirror = meta["settings"].get("mirror", engine.MIRROR_VIEW)
+    profile = load_camera_profile(camera_profile or meta["settings"].get("camera_profile"))
+    _lens = LensModel.from_profile(profile) if LENS_UNDISTORT else None
+    _base = replace(params.snapshot, **params.validate(meta["params"]))
+
+    file_id = data["file_id"]
+    offsets = np.concatenate([[0], np.cumsum(data["det_count"], dtype=np.int64)])
+    det = data["det"]
+    _files = []
+    for k in range(len(data["files"])):
+        rows = np.nonzero(file_id == k)[0]
+        if rows.size == 0:
+            _files.append(None)
+            continue
+        a, b = offsets[rows[0]], offsets[rows[-1] + 1]
+        W, H = (int(v) for v in data["frame_size"][k])
+        d = det[a:b]
+        _files.append({
+            "t": data["t_ms"][rows].astype(np.float64) / 1000.0, "size": (W, H), "fps": float(data["fps"][k]),
+            "offsets": offsets[rows[0]:rows[-1] + 2] - a, "det": d,
+            "boxes": np.clip((d[:, 3:7] * (W, H, W, H)).astype(np.int32), 0, (W - 1, H - 1, W - 1, H - 1)),
+            "cx": data["det_cx"][a:b].astype(np.float64), "cy": data["det_cy"][a:b].astype(np.float64),
+            "ipd": data["det_ipd"][a:b].astype(np.float64),
+        })
+
+def apply_settings(fixed):
+    """
+    Group-wide settings: TUNABLE_PARAMS go into a snapshot, the others into the
+    engine module. Names the group doesn't set go back to the values this worker
+    started with, not whatever the previous task left behind.
+    """
+    for name, cast in SETTINGS.items():
+        setattr(engine, name, cast(fixed.get(name, _defaults[name])))
+    return replace(_base, **params.validate({k: v for k, v in fixed.items() if k in TUNABLE_PARAMS}))
+
+def replay_picks(f, p):
+    """The face pick over one file's cached detections -> per-frame face_ok, cx, cy, ipd of the picked face."""
+    W, H = f["size"]
+    t, off, boxes = f["t"], f["offsets"], f["boxes"]
+    n = t.size
+    ok = np.zeros(n, dtype=bool)
+    pick = np.zeros(n, dtype=np.int64)
+    faces = MultiFaceTracker() if MULTI_FACE_TRACKING else None
+    prev_bbox = missing_since = None
+    for i in range(n):
+        rows = f["det"][off[i]:off[i + 1]]
+        if faces is not None:
+            best = faces.update(rows, W, H, p, t[i])
+        else:
+            best = pick_best_face(rows, W, H, p, prev_bbox) if len(rows) else None
+        if best is None:
+            if missing_since is None:
+                missing_since = t[i]
+            if t[i] - missing_since > engine.TRACK_RESET_FILTERS_SEC:
+                prev_bbox = None
+            continue
+        missing_since = None
+        prev_bbox = best[:4]
+        # the cached row the pick came from: same pixel box
+        k = np.nonzero((boxes[off[i]:off[i + 1]] == best[:4]).all(axis=1))[0]
+        ok[i] = True
+        pick[i] = off[i] + k[0]
+    nan = np.full(n, np.nan)
+    cx, cy, ipd = nan.copy(), nan.copy(), nan.copy()
+    cx[ok], cy[ok], ipd[ok] = f["cx"][pick[ok]], f["cy"][pick[ok]], f["ipd"][pick[ok]]
+    return ok, cx, cy, ipd
+
+def centered_mean(v, frames):
+    """Mean over a centered window; NaN wherever the window is not all valid."""
+    half = frames // 2
+    good = np.isfinite(v)
+    k = np.ones(2 * half + 1)
+    s = np.convolve(np.where(good, v, 0.0), k, mode="same")
+    c = np.convolve(good.astype(np.float64), k, mode="same")
+    return np.where(c == k.size, s / k.size, np.nan)
+
+def aim_point(W, H, p):
+    aim_x, aim_y = W * p.aim_center_x_norm, H * p.aim_center_y_norm
+    if _lens is not None:
+        aim_x, aim_y = _lens.undistort_points([(aim_x, aim_y)], W, H, _mirror)[0].tolist()
+    return aim_x, aim_y
+
+def replay_filters(f, picks, p, vec, ref_frames):
+    """
+    VisionTracker's filter chain and the main loop's face-loss logic for K
+    combinations at once (vec: name -> (K,) values). Returns the metric
+    accumulators, each (K,).
+    """
+    W, H = f["size"]
+    t = f["t"]
+    ok, cx, cy, ipd = picks
+    n, K = t.size, len(vec["EMA_TARGET_CX"])
+    f_pixels = (W / 2.0) / math.tan(math.radians(p.fov_deg) / 2.0)
+    aim_x, aim_y = aim_point(W, H, p)
+    geometry = engine.DIST_RADIAL_GEOMETRY
+
+    # reference: raw signals through a zero-lag centered window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_dist = (p.dist_scale * f_pixels * p.ipd_real_cm / ipd
+                    * radial_gain(cx, cy, W, H, f_pixels, p.dist_radial_k, geometry) + p.dist_estimate_offset_cm)
+    raw_dist[~(ipd > 1.0)] = np.nan
+    ref = {"x": centered_mean((cx - aim_x) / (W * 0.5), ref_frames),
+           "y": centered_mean((cy - aim_y) / (H * 0.5), ref_frames),
+           "dist": centered_mean(raw_dist, ref_frames)}
+
+    a_cx, a_cy, a_ipd, a_dist = vec["EMA_TARGET_CX"], vec["EMA_TARGET_CY"], vec["EMA_IPD"], vec["EMA_DIST"]
+    db = {"x": vec["DEADBAND_EX"], "y": vec["DEADBAND_EY"], "dist": vec["DEADBAND_ED_CM"]}
+    enable_frames = vec["TRACK_ENABLE_FACE_FRAMES"]
+    disable_sec = vec["TRACK_DISABLE_FACE_LOSS_SEC"]
+    reset_sec = vec.get("TRACK_RESET_FILTERS_SEC", np.full(K, engine.TRACK_RESET_FILTERS_SEC))
+
+    nan = np.full(K, np.nan)
+    cx_s, cy_s, ipd_s, raw_s, dist_s = nan.copy(), nan.copy(), nan.copy(), nan.copy(), nan.copy()
+    streak = np.zeros(K)
+    tracking = np.zeros(K, dtype=bool)
+    missing_since = nan.copy()
+    prev = {a: (nan.copy(), nan.copy()) for a in AXES}
+    acc = {k: np.zeros(K) for k in ACCUMULATORS}
+
+    def ema(prev_v, new, alpha):
+        return np.where(np.isnan(prev_v), new, (1.0 - alpha) * prev_v + alpha * new)
+
+    for i in range(n):
+        if not ok[i]:
+            streak[:] = 0
+            missing_since = np.where(np.isnan(missing_since), t[i], missing_since)
+            missing_for = t[i] - missing_since
+            drop = tracking & (missing_for > disable_sec)
+            acc["drops"] += drop
+            tracking &= ~drop
+            reset = missing_for > reset_sec
+            for s in (cx_s, cy_s, ipd_s, raw_s, dist_s):
+                s[reset] = np.nan
+            for a in AXES:
+                prev[a] = (nan, nan)
+            continue
+
+        missing_since = nan
+        streak += 1
+        tracking |= streak >= enable_frames
+        cx_s = ema(cx_s, cx[i], a_cx)
+        cy_s = ema(cy_s, cy[i], a_cy)
+        out = {"x": (cx_s - aim_x) / (W * 0.5), "y": (cy_s - aim_y) / (H * 0.5), "dist": nan}
+        if not math.isnan(ipd[i]):
+            ipd_s = ema(ipd_s, ipd[i], a_ipd)
+            fresh = ipd_s > 1.0
+            raw = p.dist_scale * f_pixels * p.ipd_real_cm / np.where(fresh, ipd_s, 1.0)
+            if geometry or p.dist_radial_k:
+                raw = raw * radial_gain(cx_s, cy_s, W, H, f_pixels, p.dist_radial_k, geometry)
+            raw_s = np.where(fresh, ema(raw_s, raw, a_dist), raw_s)
+            dist_s = np.where(fresh, ema(dist_s, raw_s + p.dist_estimate_offset_cm, a_dist), dist_s)
+            out["dist"] = np.where(fresh, dist_s, np.nan)
+        acc["tracked"] += tracking
+
+        for a in AXES:
+            # deadband on the error; the reference offset is added back so lag compares like with like
+            target = p.dist_target_cm if a == "dist" else 0.0
+            e = out[a] - target
+            v = np.where(np.abs(e) < db[a], 0.0, e) + target
+            r = ref[a][i]
+            if not math.isnan(r):
+                good = tracking & np.isfinite(v)
+                acc[f"lag_ss_{a}"] += np.where(good, (v - r) ** 2, 0.0)
+                acc[f"lag_n_{a}"] += good
+            p1, p2 = prev[a]
+            d2 = v - 2.0 * p1 + p2
+            good = tracking & np.isfinite(d2)
+            acc[f"jit_ss_{a}"] += np.where(good, d2 * d2, 0.0)
+            acc[f"jit_n_{a}"] += good
+            prev[a] = (v, p1)
+    return acc
+
+def run_task(file_idx, fixed, combos, ref_frames):
+    f = _files[file_idx]
+    if f is None:
+        return None
+    p = apply_settings(fixed)
+    picks = replay_picks(f, p)
+    base_vec = {name: getattr(p, name.lower()) if name in TUNABLE_PARAMS else getattr(engine, name) for name in VECTOR}
+    vec = {name: np.array([c.get(name, base_vec[name]) for c in combos], dtype=np.float64) for name in VECTOR}
+    acc = replay_filters(f, picks, p, vec, ref_frames)
+    acc["face_frames"] = np.full(len(combos), float(picks[0].sum()))
+    acc["seconds"] = np.full(len(combos), f["t"].size / max(f["fps"], 1e-9))
+    return acc
+
+# ============================================================
+# GRID + RANKING
+# ============================================================
+
+def parse_grid(items):
+    grid = {}
+    for item in items:
+        name, sep, spec = item.partition("=")
+        name = name.strip().upper()
+        if not sep:
+            raise SystemExit(f"--grid expects NAME=values, got {item!r}")
+        if name not in TUNABLE_PARAMS and name not in SETTINGS:
+            raise SystemExit(f"--grid: {name} is not a tunable parameter or one of {', '.join(SETTINGS)}")
+        if ":" in spec:
+            start, stop, count = spec.split(":")
+            values = np.linspace(float(start), float(stop), int(count)).tolist()
+        else:
+            values = [float(v) for v in spec.split(",")]
+        if name in SETTINGS:
+            values = [SETTINGS[name](v) for v in values]
+        else:
+            for v in values:
+                try:
+                    params.validate({name: v})
+                except ValueError as e:
+                    raise SystemExit(f"--grid: {e}") from None
+        grid[name] = values
+    return grid
+
+def combinations(grid):
+    names = list(grid)
+    return [{}] + [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+def finish(acc, jitter_weight):
+    """Per-combination metrics from the summed accumulators; combination 0 is the baseline."""
+    m = {}
+    for a in AXES:
+        m[f"lag_{a}"] = np.sqrt(acc[f"lag_ss_{a}"] / np.maximum(acc[f"lag_n_{a}"], 1))
+        m[f"jitter_{a}"] = np.sqrt(acc[f"jit_ss_{a}"] / np.maximum(acc[f"jit_n_{a}"], 1))
+    m["tracked_frac"] = acc["tracked"] / np.maximum(acc["face_frames"], 1)
+    m["drops_per_min"] = 60.0 * acc["drops"] / np.maximum(acc["seconds"], 1e-9)
+    def ratio(v):
+        return v / v[0] if v[0] > 0 else np.ones_like(v)    # an axis with nothing to measure does not rank
+    lag = np.mean([ratio(m[f"lag_{a}"]) for a in AXES], axis=0)
+    jit = np.mean([ratio(m[f"jitter_{a}"]) for a in AXES], axis=0)
+    m["lag_ratio"], m["jitter_ratio"] = lag, jit
+    m["score"] = lag + jitter_weight * jit
+    # Pareto front: nothing else is at least as good on both and better on one
+    better = ((lag[None, :] <= lag[:, None]) & (jit[None, :] <= jit[:, None])
+              & ((lag[None, :] < lag[:, None]) | (jit[None, :] < jit[:, None])))
+    m["pareto"] = ~better.any(axis=1)
+    return m
+
+def describe(combo):
+    return " ".join(f"{k}={v:g}" for k, v in combo.items()) or "(recorded settings)"
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep vision filter settings over cached network outputs")
+    parser.add_argument("cache", help="batch_eval.py --detections output (.npz)")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=values")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--ref-frames", type=int, default=7, help="centered window of the lag reference")
+    parser.add_argument("--jitter-weight", type=float, default=1.0)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--camera-profile", default=None, help="default: the one batch_eval.py used")
+    parser.add_argument("--out", default=None, help="all combinations and metrics as CSV")
+    args = parser.parse_args()
+
+    with np.load(args.cache) as data:
+        if "det" not in data.files:
+            raise SystemExit(f"{args.cache} has no cached detections; run batch_eval.py with --detections")
+        n_files = len(data["files"])
+        floor = json.loads(str(data["meta"]))["settings"].get("detections")
+    grid = parse_grid(args.grid)
+    if floor is not None and min(grid.get("FACE_CONF_THRESH", [floor])) < floor:
+        print(f"[SWEEP] FACE_CONF_THRESH below the cached floor {floor:g} sees only detections >= {floor:g}")
+    combos = combinations(grid)
+
+    # group by the settings that change the pick; the rest is replayed side by side
+    groups = {}
+    for k, c in enumerate(combos):
+        key = tuple(sorted((n, v) for n, v in c.items() if n not in VECTOR))
+        groups.setdefault(key, []).append(k)
+    print(f"[SWEEP] {len(combos)} combinations ({len(groups)} pick groups) x {n_files} files "
+          f"on {args.workers} workers")
+
+    t0 = time.time()
+    total = {}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.cache, args.camera_profile)) as pool:
+        futures = {}
+        for key, members in groups.items():
+            vec_combos = [{n: v for n, v in combos[k].items() if n in VECTOR} for k in members]
+            for file_idx in range(n_files):
+                fut = pool.submit(run_task, file_idx, dict(key), vec_combos, args.ref_frames)
+                futures[fut] = members
+        for fut in as_completed(futures):
+            acc = fut.result()
+            if acc is None:
+                continue
+            members = futures[fut]
+            for name, values in acc.items():
+                total.setdefault(name, np.zeros(len(combos)))[members] += values
+    elapsed = time.time() - t0
+
+    m = finish(total, args.jitter_weight)
+    order = np.argsort(m["score"], kind="stable")
+    print(f"[SWEEP] Done in {elapsed:.1f}s\n")
+    print(f"{'rank':>4s} {'score':>6s} {'lag':>5s} {'jit':>5s}  {'lag x/y':>11s} {'dist':>5s}  "
+          f"{'jit x/y':>11s} {'dist':>5s} {'track':>6s} {'drop/m':>6s}  settings")
+    shown = list(order[:args.top]) + ([0] if 0 not in order[:args.top] else [])
+    for rank, k in enumerate(shown, 1):
+        r = "base" if k == 0 and rank > args.top else str(rank)
+        print(f"{r:>4s} {m['score'][k]:6.3f} {m['lag_ratio'][k]:5.2f} {m['jitter_ratio'][k]:5.2f}  "
+              f"{m['lag_x'][k]:5.3f}/{m['lag_y'][k]:5.3f} {m['lag_dist'][k]:5.2f}  "
+              f"{m['jitter_x'][k]:5.3f}/{m['jitter_y'][k]:5.3f} {m['jitter_dist'][k]:5.2f} "
+              f"{m['tracked_frac'][k]:6.1%} {m['drops_per_min'][k]:6.2f} {'*' if m['pareto'][k] else ' '}"
+              f"{describe(combos[k])}")
+
+    if args.out:
+        columns = ["score", "lag_ratio", "jitter_ratio"] + [f"{kind}_{a}" for kind in ("lag", "jitter") for a in AXES] \
+                  + ["tracked_frac", "drops_per_min", "pareto"]
+        with open(args.out, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["rank"] + list(grid) + columns)
+            for rank, k in enumerate(order, 1):
+                w.writerow([rank] + [combos[k].get(n, "") for n in grid] + [m[c][k] for c in columns])
+        print(f"\n[SWEEP] Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()